@@ -3,7 +3,7 @@ Routes API FastAPI.
 """
 from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends, Header, Form, Body, Request
-from fastapi.responses import JSONResponse, Response, FileResponse
+from fastapi.responses import JSONResponse, Response, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from sqlmodel import Session, select
 from datetime import datetime
@@ -25,8 +25,9 @@ from app.services.compute import (
 )
 from app.services.contract_resolver import resolve_contract
 from app.services.rfa_calculator import calculate_rfa
-from app.services.pdf_export import generate_pdf_report
+from app.services.pdf_export import generate_pdf_report, invalidate_pdf_asset_cache, iter_bulk_pdf_zip
 from app.storage import (
+    ImportData,
     create_import,
     get_import,
     list_imports,
@@ -51,6 +52,7 @@ from app.schemas import (
     LoginRequest,
     LoginResponse,
     EntityPdfExportBody,
+    EntityPdfBulkBody,
     CotisationSettingBody,
     UserCreate,
     UserUpdate,
@@ -64,8 +66,8 @@ router = APIRouter()
 
 
 @router.post("/upload", response_model=UploadResponse)
-async def upload_excel(file: UploadFile = File(...)):
-    """Upload et import d'un fichier Excel."""
+async def upload_excel(file: UploadFile = File(...), session: Session = Depends(get_session)):
+    """Upload et import d'un fichier Excel (persisté : instantané disque + base, survit aux redémarrages)."""
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Le fichier doit être un .xlsx ou .xls")
     
@@ -103,6 +105,8 @@ async def upload_excel(file: UploadFile = File(...)):
                     status_code=500,
                     detail=f"Erreur lors de l'agrégation des données: {str(agg_error)}"
                 )
+            from app.services.import_cache import import_cache
+            import_cache.put(import_data, session)
         
         return UploadResponse(
             import_id=import_id,
@@ -134,7 +138,7 @@ async def upload_excel(file: UploadFile = File(...)):
 
 
 @router.post("/sync-from-sheets", response_model=UploadResponse)
-async def sync_from_sheets(body: SyncFromSheetsRequest):
+async def sync_from_sheets(body: SyncFromSheetsRequest, session: Session = Depends(get_session)):
     """
     Synchronise les données RFA depuis un Google Sheet (même structure que l'Excel).
     Nécessite les dépendances optionnelles (pip install -r requirements-sheets.txt)
@@ -173,6 +177,8 @@ async def sync_from_sheets(body: SyncFromSheetsRequest):
                 status_code=500,
                 detail=f"Erreur lors de l'agrégation: {str(agg_error)}",
             )
+        from app.services.import_cache import import_cache
+        import_cache.put(import_data, session)
     return UploadResponse(
         import_id=import_id,
         meta={"source": "google_sheets", "spreadsheet_id": body.spreadsheet_id, "nb_lignes": len(data)},
@@ -201,113 +207,24 @@ def _get_rfa_sheets_config(session: Optional[Session] = None) -> tuple:
     return (sid or None, sname or None)
 
 
-_CACHE_KEY_DATA   = "sheets_live_raw_data"
-_CACHE_KEY_COLS   = "sheets_live_raw_columns"
-_CACHE_KEY_MAP    = "sheets_live_col_mapping"
-_CACHE_KEY_CLIENT = "sheets_live_by_client"
-_CACHE_KEY_GROUP  = "sheets_live_by_group"
-_CACHE_KEY_GENIE  = "sheets_live_genie_analysis"
-
-
-def _upsert_setting(session: Session, key: str, value: str):
-    st = session.exec(select(AppSettings).where(AppSettings.key == key)).first()
-    if st:
-        st.value = value
-        st.updated_at = datetime.now()
-    else:
-        session.add(AppSettings(key=key, value=value))
-
-
-def _save_live_cache(session: Session, data_list: list, raw_columns: list, column_mapping: dict):
-    """Sauvegarde le cache complet (raw + agrégations) dans Supabase."""
-    try:
-        import json as _json
-        # 1. Données brutes + colonnes
-        _upsert_setting(session, _CACHE_KEY_DATA, _json.dumps(data_list))
-        _upsert_setting(session, _CACHE_KEY_COLS, _json.dumps(raw_columns))
-        _upsert_setting(session, _CACHE_KEY_MAP,  _json.dumps(column_mapping))
-        # 2. Données agrégées (by_client, by_group) — calculées maintenant pour éviter de le refaire à chaque requête
-        set_live_import(raw_columns, column_mapping, data_list)
-        import_data = get_live_import()
-        if import_data:
-            try:
-                compute_aggregations(import_data)
-                _upsert_setting(session, _CACHE_KEY_CLIENT, _json.dumps(import_data.by_client))
-                _upsert_setting(session, _CACHE_KEY_GROUP,  _json.dumps(import_data.by_group))
-            except Exception as e:
-                print(f"[CACHE] Erreur agrégations: {e}")
-        session.commit()
-    except Exception as e:
-        print(f"[CACHE] Erreur sauvegarde: {e}")
-
-
-def _load_live_cache(session: Optional[Session]):
-    """Charge le cache depuis Supabase — agrégations pré-calculées incluses."""
-    if not session:
-        return None
-    try:
-        import json as _json
-        def _get(key):
-            st = session.exec(select(AppSettings).where(AppSettings.key == key)).first()
-            return _json.loads(st.value) if st and st.value else None
-
-        data_list      = _get(_CACHE_KEY_DATA)
-        raw_columns    = _get(_CACHE_KEY_COLS)
-        column_mapping = _get(_CACHE_KEY_MAP)
-        by_client      = _get(_CACHE_KEY_CLIENT)
-        by_group       = _get(_CACHE_KEY_GROUP)
-
-        if not data_list or not raw_columns:
-            return None
-        set_live_import(raw_columns, column_mapping or {}, data_list)
-        import_data = get_live_import()
-        if import_data:
-            if by_client:
-                import_data.by_client = by_client
-            if by_group:
-                import_data.by_group = by_group
-            # Si pas d'agrégations en cache, les calculer (lent, mais seulement 1 fois)
-            if not by_client or not by_group:
-                try:
-                    compute_aggregations(import_data)
-                except Exception:
-                    pass
-        return import_data
-    except Exception as e:
-        print(f"[CACHE] Erreur lecture: {e}")
-        return None
-
-
 def _resolve_import_data(import_id: str, session: Optional[Session] = None):
     """
-    Résout import_id en ImportData.
-    Pour sheets_live : mémoire → table rfa_data (Supabase) → rechargement depuis Sheets.
+    Résout import_id en ImportData : mémoire → instantané disque → base partagée (rfa_data pour
+    sheets_live, AppSettings pour un import chargé) → Google Sheets (sheets_live, dernier recours).
+    Voir app.services.import_cache ; un seul chargement à la fois par import, partagé par les
+    requêtes concurrentes (ex. plusieurs commerciaux juste après un rafraîchissement).
     """
-    if import_id != LIVE_IMPORT_ID:
-        return get_import(import_id)
-    # 1. Mémoire (même process Vercel)
-    data = get_live_import()
+    from app.services.import_cache import import_cache
+    data = import_cache.get_memory(import_id)
     if data:
         return data
-    # 2. Table rfa_data Supabase (rapide, survit aux cold starts)
-    if session:
-        try:
-            from app.services.rfa_supabase import read_rfa_from_supabase, build_column_mapping
-            data_list = read_rfa_from_supabase(session)
-            if data_list:
-                column_mapping = build_column_mapping()
-                raw_columns = list(column_mapping.keys())
-                set_live_import(raw_columns, column_mapping, data_list)
-                import_data = get_live_import()
-                if import_data:
-                    try:
-                        compute_aggregations(import_data)
-                    except Exception:
-                        pass
-                return import_data
-        except Exception as e:
-            print(f"[RESOLVE] Erreur lecture rfa_data: {e}")
-    # 3. Rechargement depuis Google Sheets (lent, dernier recours)
+    from app.services.single_flight import import_flight
+    origin = (lambda: _load_live_origin(session)) if import_id == LIVE_IMPORT_ID else None
+    return import_flight.do(import_id, import_cache.load, import_id, session, origin)
+
+
+def _load_live_origin(session: Optional[Session] = None):
+    """Origine de sheets_live : la feuille Google Sheets configurée, (data, colonnes, mapping) ou None."""
     spreadsheet_id, sheet_name = _get_rfa_sheets_config(session)
     if not spreadsheet_id:
         return None
@@ -316,28 +233,12 @@ def _resolve_import_data(import_id: str, session: Optional[Session] = None):
     except ImportError:
         return None
     try:
-        data_list, raw_columns, column_mapping = load_from_sheets(
+        return load_from_sheets(
             spreadsheet_id=spreadsheet_id,
             sheet_name_or_range=sheet_name,
         )
     except Exception:
         return None
-    if not data_list:
-        return None
-    set_live_import(raw_columns, column_mapping, data_list)
-    if session:
-        try:
-            from app.services.rfa_supabase import write_rfa_to_supabase
-            write_rfa_to_supabase(session, data_list)
-        except Exception as e:
-            print(f"[RESOLVE] Erreur écriture rfa_data: {e}")
-    import_data = get_live_import()
-    if import_data:
-        try:
-            compute_aggregations(import_data)
-        except Exception:
-            pass
-    return import_data
 
 
 @router.get("/rfa-sheets/kpis")
@@ -449,15 +350,23 @@ async def refresh_rfa_sheets(
             status_code=400,
             detail="Aucune donnée valide dans le Sheet.",
         )
-    # Sauvegarde dans la table rfa_data Supabase (source de vérité pour les cold starts)
+    import_data = ImportData(LIVE_IMPORT_ID, raw_columns, column_mapping, data)
     try:
-        from app.services.rfa_supabase import write_rfa_to_supabase
-        nb = write_rfa_to_supabase(session, data)
-        print(f"[REFRESH] {nb} lignes écrites dans rfa_data")
-    except Exception as e:
-        print(f"[REFRESH] Erreur écriture rfa_data: {e}")
-        # Fallback : ancien cache JSON
-        _save_live_cache(session, data, raw_columns, column_mapping)
+        compute_aggregations(import_data)
+    except Exception as agg_error:
+        import traceback
+        print(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur agrégation: {str(agg_error)}",
+        )
+    # Nouvelle génération du fichier partagé (lignes + agrégations) : les autres workers la reprennent
+    set_live_import(raw_columns, column_mapping, data, import_data.by_client, import_data.by_group)
+    import_data = get_live_import()
+    # Écriture dans tous les niveaux : table rfa_data Supabase (source de vérité pour les cold
+    # starts, ancien cache JSON en repli), instantané disque local, mémoire
+    from app.services.import_cache import import_cache
+    import_cache.put(import_data, session)
 
     if body and body.get("spreadsheet_id"):
         for key, value in [
@@ -471,30 +380,19 @@ async def refresh_rfa_sheets(
             else:
                 session.add(AppSettings(key=key, value=value))
         session.commit()
-    import_data = get_live_import()
-    if import_data:
-        try:
-            compute_aggregations(import_data)
-        except Exception as agg_error:
-            import traceback
-            print(traceback.format_exc())
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erreur agrégation: {str(agg_error)}",
-            )
-        # Invalide le cache Génie (mémoire + Supabase) quand les données changent
-        try:
-            from app.services.genie_engine import invalidate_genie_cache
-            invalidate_genie_cache(LIVE_IMPORT_ID)
-            # Invalide aussi dans Supabase
-            cached = session.exec(
-                select(AppSettings).where(AppSettings.key == f"genie_cache_{LIVE_IMPORT_ID}")
-            ).first()
-            if cached:
-                session.delete(cached)
-                session.commit()
-        except Exception:
-            pass
+    # Invalide le cache Génie (mémoire + Supabase) quand les données changent
+    try:
+        from app.services.genie_engine import invalidate_genie_cache
+        invalidate_genie_cache(LIVE_IMPORT_ID)
+        # Invalide aussi dans Supabase
+        cached = session.exec(
+            select(AppSettings).where(AppSettings.key == f"genie_cache_{LIVE_IMPORT_ID}")
+        ).first()
+        if cached:
+            session.delete(cached)
+            session.commit()
+    except Exception:
+        pass
     return UploadResponse(
         import_id=LIVE_IMPORT_ID,
         meta={"source": "google_sheets", "spreadsheet_id": spreadsheet_id, "nb_lignes": len(data)},
@@ -665,15 +563,15 @@ async def get_entity_full(
         )
     if mode not in ["client", "group"]:
         raise HTTPException(status_code=400, detail="mode doit etre 'client' ou 'group'")
+    from app.services.compute import build_entity_detail
     try:
-        entity = get_entity_detail_with_rfa(import_data, mode, id, contract_id=contract_id)
+        entity = build_entity_detail(import_data, mode, id, contract_id=contract_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
     rules = []
     overrides = []
-    cap = getattr(entity, "contract_applied", None) or {}
-    cid = cap.get("id") if isinstance(cap, dict) else getattr(cap, "id", None)
+    cid = (entity.get("contract_applied") or {}).get("id")
     if cid:
         rules = list(session.exec(select(ContractRule).where(ContractRule.contract_id == cid)).all())
         target_type = TargetType.CODE_UNION if mode == "client" else TargetType.GROUPE_CLIENT
@@ -694,7 +592,7 @@ async def get_entity_full(
         return {"field_key": o.field_key, "custom_tiers": o.custom_tiers, "tier_type": o.tier_type.value if hasattr(o.tier_type, "value") else str(o.tier_type)}
 
     return {
-        "entity": entity.model_dump(by_alias=True, mode="json"),
+        "entity": entity,
         "rules": [rule_to_dict(r) for r in rules],
         "overrides": [override_to_dict(o) for o in overrides],
     }
@@ -733,209 +631,119 @@ async def get_union_entity(import_id: str, session: Session = Depends(get_sessio
 
 @router.get("/imports/{import_id}/union/export-excel")
 async def export_union_excel(import_id: str, session: Session = Depends(get_session)):
-    """Export Excel des donnees Union RFA."""
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from io import BytesIO
+    """Export Excel des donnees Union RFA (classeur write_only, envoyé en streaming)."""
+    from openpyxl.styles import Font
+    from app.services.excel_export import (
+        BASE_STYLES, MONEY_FMT, PCT_FMT, XLSX_MEDIA_TYPE, StreamingWorkbook, solid_fill, style, xlsx_headers,
+    )
     
     import_data = _resolve_import_data(import_id, session)
     if not import_data:
         raise HTTPException(status_code=404, detail="Import non trouve")
     
     try:
-        from app.services.compute import get_union_detail_with_rfa
-        result = get_union_detail_with_rfa(import_data)
+        from app.services.compute import build_union_detail
+        result = build_union_detail(import_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur calcul: {str(e)}")
     
-    wb = openpyxl.Workbook()
-    
-    # --- Feuille 1 : Synthese ---
-    ws = wb.active
-    ws.title = "Synthese Union"
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-    subtotal_fill = PatternFill(start_color="D6E4F0", end_color="D6E4F0", fill_type="solid")
-    money_fmt = '#,##0.00 "EUR"'
-    pct_fmt = '0.00%'
-    thin_border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
-    
-    # Titre
-    ws.merge_cells('A1:G1')
-    ws['A1'] = "RAPPORT RFA UNION - GROUPEMENT"
-    ws['A1'].font = Font(bold=True, size=14, color="1F4E79")
-    ws['A2'] = f"Import ID: {import_id}"
-    ws['A2'].font = Font(italic=True, color="808080")
-    ws['A3'] = f"Nombre de comptes: {result.nb_comptes}"
-    
-    # En-tetes RFA Globale
-    row = 5
-    headers = ["Fournisseur", "CA Global", "Taux RFA", "Montant RFA", "Taux Bonus", "Montant Bonus", "Total Ligne"]
-    for col, h in enumerate(headers, 1):
-        cell = ws.cell(row=row, column=col, value=h)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
-        cell.border = thin_border
-    
-    # Donnees globales
-    row = 6
-    rfa_data = result.rfa
-    if hasattr(rfa_data, 'global_items'):
-        global_items = rfa_data.global_items
-    elif hasattr(rfa_data, 'dict'):
-        d = rfa_data.dict(by_alias=True) if hasattr(rfa_data, 'dict') else rfa_data.model_dump(by_alias=True)
-        global_items = d.get('global', {})
-    else:
-        global_items = {}
+    global_items = result["rfa"]["global"]
+    tri_items = result["rfa"]["tri"]
+    ca_total = result["ca"].get('totals', {}).get('grand_total', 0)
     
-    total_rfa_global = 0
-    for key, item in (global_items.items() if isinstance(global_items, dict) else []):
-        if isinstance(item, dict):
-            ca = item.get('ca', 0)
-            rfa_rate = item.get('rfa', {}).get('rate', 0)
-            rfa_value = item.get('rfa', {}).get('value', 0)
-            bonus_rate = item.get('bonus', {}).get('rate', 0)
-            bonus_value = item.get('bonus', {}).get('value', 0)
-            label = item.get('label', key)
-        else:
-            ca = item.ca
-            rfa_rate = item.rfa.rate if item.rfa else 0
-            rfa_value = item.rfa.value if item.rfa else 0
-            bonus_rate = item.bonus.rate if item.bonus else 0
-            bonus_value = item.bonus.value if item.bonus else 0
-            label = item.label
+    def _build(book: StreamingWorkbook):
+        # --- Feuille 1 : Synthese ---
+        ws = book.add_sheet("Synthese Union", widths=[30, 18, 14, 18, 14, 18, 18], merge="A1:G1")
         
-        total_ligne = rfa_value + bonus_value
-        total_rfa_global += total_ligne
+        # Titre
+        book.append(ws, ["RAPPORT RFA UNION - GROUPEMENT"], "title")
+        book.append(ws, [f"Import ID: {import_id}"], "subtitle")
+        book.append(ws, [f"Nombre de comptes: {result['nb_comptes']}"])
+        book.blank(ws)
         
-        if ca == 0 and total_ligne == 0:
-            continue
+        # En-tetes RFA Globale
+        book.append(ws, ["Fournisseur", "CA Global", "Taux RFA", "Montant RFA", "Taux Bonus", "Montant Bonus", "Total Ligne"], "header")
         
-        ws.cell(row=row, column=1, value=label).border = thin_border
-        ws.cell(row=row, column=2, value=ca).number_format = money_fmt
-        ws.cell(row=row, column=2).border = thin_border
-        ws.cell(row=row, column=3, value=rfa_rate).number_format = pct_fmt
-        ws.cell(row=row, column=3).border = thin_border
-        ws.cell(row=row, column=4, value=rfa_value).number_format = money_fmt
-        ws.cell(row=row, column=4).border = thin_border
-        ws.cell(row=row, column=5, value=bonus_rate).number_format = pct_fmt
-        ws.cell(row=row, column=5).border = thin_border
-        ws.cell(row=row, column=6, value=bonus_value).number_format = money_fmt
-        ws.cell(row=row, column=6).border = thin_border
-        ws.cell(row=row, column=7, value=total_ligne).number_format = money_fmt
-        ws.cell(row=row, column=7).border = thin_border
-        row += 1
-    
-    # Sous-total Global
-    ws.cell(row=row, column=1, value="TOTAL RFA GLOBALE").font = Font(bold=True)
-    ws.cell(row=row, column=1).fill = subtotal_fill
-    ws.cell(row=row, column=1).border = thin_border
-    ws.cell(row=row, column=7, value=total_rfa_global).number_format = money_fmt
-    ws.cell(row=row, column=7).font = Font(bold=True)
-    ws.cell(row=row, column=7).fill = subtotal_fill
-    ws.cell(row=row, column=7).border = thin_border
-    for c in range(2, 7):
-        ws.cell(row=row, column=c).fill = subtotal_fill
-        ws.cell(row=row, column=c).border = thin_border
-    row += 2
-    
-    # En-tetes Tri-partites
-    tri_headers = ["Tri-partite", "CA", "Seuil Min", "Taux", "Montant RFA"]
-    for col, h in enumerate(tri_headers, 1):
-        cell = ws.cell(row=row, column=col, value=h)
-        cell.font = header_font
-        cell.fill = PatternFill(start_color="548235", end_color="548235", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-        cell.border = thin_border
-    row += 1
-    
-    # Donnees tri-partites
-    if hasattr(rfa_data, 'tri_items'):
-        tri_items = rfa_data.tri_items
-    elif hasattr(rfa_data, 'dict'):
-        d = rfa_data.dict(by_alias=True) if hasattr(rfa_data, 'dict') else rfa_data.model_dump(by_alias=True)
-        tri_items = d.get('tri', {})
-    else:
-        tri_items = {}
-    
-    total_rfa_tri = 0
-    for key, item in (tri_items.items() if isinstance(tri_items, dict) else []):
-        if isinstance(item, dict):
-            ca = item.get('ca', 0)
-            rate = item.get('rate', 0)
-            value = item.get('value', 0)
-            label = item.get('label', key)
-            sel_min = item.get('selected_min', None)
-        else:
-            ca = item.ca
-            rate = item.rate
-            value = item.value
-            label = item.label
-            sel_min = item.selected_min
+        # Donnees globales
+        line_styles = ["text", "money", "pct", "money", "pct", "money", "money"]
+        total_rfa_global = 0
+        for key, item in (global_items.items() if isinstance(global_items, dict) else []):
+            if isinstance(item, dict):
+                ca = item.get('ca', 0)
+                rfa_rate = item.get('rfa', {}).get('rate', 0)
+                rfa_value = item.get('rfa', {}).get('value', 0)
+                bonus_rate = item.get('bonus', {}).get('rate', 0)
+                bonus_value = item.get('bonus', {}).get('value', 0)
+                label = item.get('label', key)
+            else:
+                ca = item.ca
+                rfa_rate = item.rfa.rate if item.rfa else 0
+                rfa_value = item.rfa.value if item.rfa else 0
+                bonus_rate = item.bonus.rate if item.bonus else 0
+                bonus_value = item.bonus.value if item.bonus else 0
+                label = item.label
+            
+            total_ligne = rfa_value + bonus_value
+            total_rfa_global += total_ligne
+            
+            if ca == 0 and total_ligne == 0:
+                continue
+            
+            book.append(ws, [label, ca, rfa_rate, rfa_value, bonus_rate, bonus_value, total_ligne], line_styles)
         
-        if ca == 0 and value == 0:
-            continue
+        # Sous-total Global
+        book.append(ws, ["TOTAL RFA GLOBALE", None, None, None, None, None, total_rfa_global], ["subtotal"] * 6 + ["subtotal_money"])
+        book.blank(ws)
         
-        total_rfa_tri += value
-        ws.cell(row=row, column=1, value=label).border = thin_border
-        ws.cell(row=row, column=2, value=ca).number_format = money_fmt
-        ws.cell(row=row, column=2).border = thin_border
-        ws.cell(row=row, column=3, value=sel_min or 0).number_format = money_fmt
-        ws.cell(row=row, column=3).border = thin_border
-        ws.cell(row=row, column=4, value=rate).number_format = pct_fmt
-        ws.cell(row=row, column=4).border = thin_border
-        ws.cell(row=row, column=5, value=value).number_format = money_fmt
-        ws.cell(row=row, column=5).border = thin_border
-        row += 1
-    
-    # Sous-total Tri
-    ws.cell(row=row, column=1, value="TOTAL TRI-PARTITES").font = Font(bold=True)
-    ws.cell(row=row, column=1).fill = subtotal_fill
-    ws.cell(row=row, column=1).border = thin_border
-    ws.cell(row=row, column=5, value=total_rfa_tri).number_format = money_fmt
-    ws.cell(row=row, column=5).font = Font(bold=True)
-    ws.cell(row=row, column=5).fill = subtotal_fill
-    ws.cell(row=row, column=5).border = thin_border
-    for c in range(2, 5):
-        ws.cell(row=row, column=c).fill = subtotal_fill
-        ws.cell(row=row, column=c).border = thin_border
-    row += 2
-    
-    # Grand Total
-    grand_total = total_rfa_global + total_rfa_tri
-    ca_total = result.ca.get('totals', {}).get('grand_total', 0) if isinstance(result.ca, dict) else 0
-    ws.cell(row=row, column=1, value="GRAND TOTAL RFA UNION").font = Font(bold=True, size=12, color="1F4E79")
-    ws.cell(row=row, column=1).border = thin_border
-    ws.cell(row=row, column=2, value=ca_total).number_format = money_fmt
-    ws.cell(row=row, column=2).font = Font(bold=True)
-    ws.cell(row=row, column=2).border = thin_border
-    taux_global = grand_total / ca_total if ca_total > 0 else 0
-    ws.cell(row=row, column=3, value=taux_global).number_format = pct_fmt
-    ws.cell(row=row, column=3).font = Font(bold=True)
-    ws.cell(row=row, column=3).border = thin_border
-    ws.cell(row=row, column=4, value=grand_total).number_format = money_fmt
-    ws.cell(row=row, column=4).font = Font(bold=True, size=12, color="006600")
-    ws.cell(row=row, column=4).border = thin_border
-    
-    # Ajuster largeurs
-    for col_letter, width in [('A', 30), ('B', 18), ('C', 14), ('D', 18), ('E', 14), ('F', 18), ('G', 18)]:
-        ws.column_dimensions[col_letter].width = width
-    
-    # Sauvegarder
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+        # En-tetes Tri-partites
+        book.append(ws, ["Tri-partite", "CA", "Seuil Min", "Taux", "Montant RFA"], "header_tri")
+        
+        # Donnees tri-partites
+        total_rfa_tri = 0
+        for key, item in (tri_items.items() if isinstance(tri_items, dict) else []):
+            if isinstance(item, dict):
+                ca = item.get('ca', 0)
+                rate = item.get('rate', 0)
+                value = item.get('value', 0)
+                label = item.get('label', key)
+                sel_min = item.get('selected_min', None)
+            else:
+                ca = item.ca
+                rate = item.rate
+                value = item.value
+                label = item.label
+                sel_min = item.selected_min
+            
+            if ca == 0 and value == 0:
+                continue
+            
+            total_rfa_tri += value
+            book.append(ws, [label, ca, sel_min or 0, rate, value], ["text", "money", "money", "pct", "money"])
+        
+        # Sous-total Tri
+        book.append(ws, ["TOTAL TRI-PARTITES", None, None, None, total_rfa_tri], ["subtotal"] * 4 + ["subtotal_money"])
+        book.blank(ws)
+        
+        # Grand Total
+        grand_total = total_rfa_global + total_rfa_tri
+        taux_global = grand_total / ca_total if ca_total > 0 else 0
+        book.append(
+            ws,
+            ["GRAND TOTAL RFA UNION", ca_total, taux_global, grand_total],
+            ["grand_label", "bold_money", "bold_pct", "grand_total"],
+        )
     
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="RFA_Union_{import_id[:8]}.xlsx"'}
+    book = StreamingWorkbook({
+        "header_tri": {**BASE_STYLES["header"], "fill": solid_fill("548235")},
+        "grand_label": style(font=Font(bold=True, size=12, color="1F4E79")),
+        "bold_money": style(font=Font(bold=True), number_format=MONEY_FMT),
+        "bold_pct": style(font=Font(bold=True), number_format=PCT_FMT),
+        "grand_total": style(font=Font(bold=True, size=12, color="006600"), number_format=MONEY_FMT),
+    })
+    return StreamingResponse(
+        book.stream(_build),
+        media_type=XLSX_MEDIA_TYPE,
+        headers=xlsx_headers(f"RFA_Union_{import_id[:8]}.xlsx"),
     )
 
 
@@ -953,8 +761,8 @@ async def export_union_pdf(import_id: str, session: Session = Depends(get_sessio
         raise HTTPException(status_code=404, detail="Import non trouve")
     
     try:
-        from app.services.compute import get_union_detail_with_rfa
-        result = get_union_detail_with_rfa(import_data)
+        from app.services.compute import build_union_detail
+        result = build_union_detail(import_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur calcul: {str(e)}")
     
@@ -971,18 +779,11 @@ async def export_union_pdf(import_id: str, session: Session = Depends(get_sessio
             return "0 %"
     
     # Extraire les donnees
-    rfa_data = result.rfa
-    if hasattr(rfa_data, 'model_dump'):
-        rfa_dict = rfa_data.model_dump(by_alias=True)
-    elif hasattr(rfa_data, 'dict'):
-        rfa_dict = rfa_data.dict(by_alias=True)
-    else:
-        rfa_dict = {"global": {}, "tri": {}, "totals": {}}
-    
+    rfa_dict = result["rfa"]
     global_items = rfa_dict.get('global', {})
     tri_items = rfa_dict.get('tri', {})
     totals = rfa_dict.get('totals', {})
-    ca_data = result.ca if isinstance(result.ca, dict) else {}
+    ca_data = result["ca"]
     ca_total = ca_data.get('totals', {}).get('grand_total', 0)
     grand_total_rfa = totals.get('grand_total', 0)
     taux_global = grand_total_rfa / ca_total if ca_total > 0 else 0
@@ -1051,7 +852,7 @@ async def export_union_pdf(import_id: str, session: Session = Depends(get_sessio
     </head>
     <body>
         <h1>RAPPORT RFA UNION - GROUPEMENT</h1>
-        <p style="color:#888;font-size:9px">Import: {import_id[:8]} | Comptes: {result.nb_comptes} | Contrats: {result.contract_applied.get('name', '') if isinstance(result.contract_applied, dict) else ''}</p>
+        <p style="color:#888;font-size:9px">Import: {import_id[:8]} | Comptes: {result['nb_comptes']} | Contrats: {(result['contract_applied'] or {}).get('name', '')}</p>
         
         <div style="margin: 15px 0">
             <div class="kpi-box">
@@ -1150,51 +951,17 @@ async def get_global_recap(
         dissolved_set = {g.strip().upper() for g in dissolved_groups.split(",") if g.strip()}
 
     try:
-        import json as _json
-        from app.services.contract_resolver import BatchContractResolver
-        from app.models import ContractRule, ContractOverride
-        import app.services.contract_resolver as _resolver_mod
-        import app.services.rfa_calculator as _rfa_calc
-
-        # ── Batch 1 : résolution des contrats (3 requêtes) ──────────────
-        _batch = BatchContractResolver()
-        _orig_resolve = _resolver_mod.resolve_contract
-        _resolver_mod.resolve_contract = lambda code_union=None, groupe_client=None: _batch.resolve(code_union, groupe_client)
-
-        # ── Batch 2 : toutes les règles de contrats (1 requête) ─────────
-        _all_rules     = session.exec(select(ContractRule)).all()
-        _all_overrides = session.exec(select(ContractOverride).where(ContractOverride.is_active == True)).all()
-
-        _rules_cache = {}
-        for _r in _all_rules:
-            _rules_cache.setdefault(_r.contract_id, {})[_r.key] = _r
-
-        # ── Batch 3 : tous les overrides (1 requête) ────────────────────
-        _ov_cache = {}
-        for _ov in _all_overrides:
-            _tt = _ov.target_type.value if hasattr(_ov.target_type, 'value') else str(_ov.target_type)
-            _k  = (_tt, (_ov.target_value or "").strip().upper())
-            _ov_cache.setdefault(_k, {}).setdefault(_ov.field_key, {})
-            try:
-                _ov_cache[_k][_ov.field_key][_ov.tier_type.value if hasattr(_ov.tier_type,'value') else str(_ov.tier_type)] = _json.loads(_ov.custom_tiers)
-            except Exception:
-                pass
+        # Contrats, règles et overrides chargés en une série de requêtes, servis depuis la mémoire
+        from app.services.rfa_context import RfaContext
+        from app.services.single_flight import recap_flight
 
-        _orig_rules    = _rfa_calc.load_contract_rules
-        _orig_overrides = _rfa_calc.load_entity_overrides
-        _rfa_calc.load_contract_rules    = lambda c: _rules_cache.get(c.id, {})
-        _rfa_calc.load_entity_overrides  = lambda tt, tv: _ov_cache.get(
-            (str(tt) if not hasattr(tt,'value') else tt.value, (tv or "").strip().upper()), {}
-        )
-
-        try:
-            result = get_global_recap_rfa(import_data, dissolved_groups=dissolved_set)
-        finally:
-            _resolver_mod.resolve_contract   = _orig_resolve
-            _rfa_calc.load_contract_rules    = _orig_rules
-            _rfa_calc.load_entity_overrides  = _orig_overrides
+        def _compute():
+            with RfaContext(session).activate():
+                return get_global_recap_rfa(import_data, dissolved_groups=dissolved_set)
 
-        return result
+        # Calcul dans un thread, partagé par les requêtes identiques concurrentes
+        flight_key = (import_id, id(import_data), tuple(sorted(dissolved_set)))
+        return await recap_flight.do_async(flight_key, _compute)
     except Exception as e:
         import traceback
         print(f"Erreur lors du calcul du récapitulatif: {e}")
@@ -1206,16 +973,19 @@ async def get_global_recap(
 async def export_global_recap_excel(
     import_id: str,
     dissolved_groups: Optional[str] = Query(None, description="Liste des groupes dissous (séparés par des virgules)"),
+    export_format: str = Query("xlsx", alias="format", pattern="^(xlsx|csv|parquet)$"),
+    dataset: str = Query("clients", pattern="^(clients|details)$", description="csv/parquet : clients ou details (plateformes)"),
     session: Session = Depends(get_session),
 ):
     """
     Export Excel du récapitulatif clients RFA, avec séparation stricte :
     - onglet Magasins indépendants
     - onglet Groupes consolidés
+    Classeur write_only envoyé en streaming.
+    format=csv|parquet : table brute (dataset=clients ou details), sans classeur intermédiaire.
     """
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from io import BytesIO
+    from app.services.excel_export import XLSX_MEDIA_TYPE, StreamingWorkbook, xlsx_headers
+    from app.services.rfa_context import RfaContext
 
     import_data = _resolve_import_data(import_id, session)
     if not import_data:
@@ -1226,22 +996,19 @@ async def export_global_recap_excel(
         dissolved_set = {g.strip().upper() for g in dissolved_groups.split(",") if g.strip()}
 
     try:
-        export_data = build_client_rfa_export_rows(import_data, dissolved_groups=dissolved_set)
+        with RfaContext(session).activate():
+            export_data = build_client_rfa_export_rows(import_data, dissolved_groups=dissolved_set)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur calcul export recap: {str(e)}")
 
-    wb = openpyxl.Workbook()
+    if export_format != "xlsx":
+        from app.services import tabular_export
+        if dataset == "details":
+            columns, rows = tabular_export.RECAP_DETAIL_COLUMNS, tabular_export.recap_detail_rows(export_data)
+        else:
+            columns, rows = tabular_export.RECAP_CLIENT_COLUMNS, tabular_export.recap_client_rows(export_data)
+        return _tabular_export_response(export_format, columns, rows, f"RFA_Clients_{dataset}_{import_id[:8]}")
 
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(start_color="1F4E79", end_color="1F4E79", fill_type="solid")
-    subtotal_fill = PatternFill(start_color="D6E4F0", end_color="D6E4F0", fill_type="solid")
-    thin_border = Border(
-        left=Side(style="thin"),
-        right=Side(style="thin"),
-        top=Side(style="thin"),
-        bottom=Side(style="thin"),
-    )
-    money_fmt = '#,##0.00 "EUR"'
     headers = [
         "Code Union",
         "Nom Client",
@@ -1263,23 +1030,14 @@ async def export_global_recap_excel(
         "Type de contrat",
     ]
 
-    def _fill_sheet(ws, title: str, rows: List[Dict[str, Any]]):
-        ws.title = title
-        ws.merge_cells("A1:E1")
-        ws["A1"] = f"EXPORT RFA CLIENTS - {title.upper()}"
-        ws["A1"].font = Font(bold=True, size=14, color="1F4E79")
-        ws["A2"] = f"Import ID: {import_id}"
-        ws["A2"].font = Font(italic=True, color="808080")
-
-        row_idx = 4
-        for col, label in enumerate(headers, 1):
-            cell = ws.cell(row=row_idx, column=col, value=label)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center")
-            cell.border = thin_border
-
-        row_idx += 1
+    def _fill_sheet(book: StreamingWorkbook, title: str, rows: List[Dict[str, Any]]):
+        ws = book.add_sheet(title, widths=[22, 36, 24, 20, 38], merge="A1:E1")
+        book.append(ws, [f"EXPORT RFA CLIENTS - {title.upper()}"], "title")
+        book.append(ws, [f"Import ID: {import_id}"], "subtitle")
+        book.blank(ws)
+        book.append(ws, headers, "header")
+
+        line_styles = ["text", "text", "money", "money", "text"]
         total_ca = 0.0
         total_rfa = 0.0
         for item in rows:
@@ -1287,55 +1045,26 @@ async def export_global_recap_excel(
             rfa_total = float(item.get("rfa_client", 0.0) or 0.0)
             total_ca += ca_total
             total_rfa += rfa_total
+            book.append(
+                ws,
+                [item.get("code_union", ""), item.get("nom_client", ""), ca_total, rfa_total, item.get("type_contrat", "")],
+                line_styles,
+            )
+
+        book.append(
+            ws,
+            ["TOTAL", None, total_ca, total_rfa, None],
+            ["subtotal", "subtotal", "subtotal_money", "subtotal_money", "subtotal"],
+        )
+
+    def _fill_detail_sheet(book: StreamingWorkbook, sheet_name: str, title: str, rows: List[Dict[str, Any]]):
+        ws = book.add_sheet(sheet_name, widths=[14, 18, 30, 16, 24, 28, 20, 16, 16, 16, 34], merge="A1:K1")
+        book.append(ws, [f"DETAIL RFA PAR PLATEFORME - {title.upper()}"], "title")
+        book.append(ws, [f"Import ID: {import_id}"], "subtitle")
+        book.blank(ws)
+        book.append(ws, detail_headers, "header")
 
-            ws.cell(row=row_idx, column=1, value=item.get("code_union", "")).border = thin_border
-            ws.cell(row=row_idx, column=2, value=item.get("nom_client", "")).border = thin_border
-
-            ws.cell(row=row_idx, column=3, value=ca_total).number_format = money_fmt
-            ws.cell(row=row_idx, column=3).border = thin_border
-
-            ws.cell(row=row_idx, column=4, value=rfa_total).number_format = money_fmt
-            ws.cell(row=row_idx, column=4).border = thin_border
-
-            ws.cell(row=row_idx, column=5, value=item.get("type_contrat", "")).border = thin_border
-            row_idx += 1
-
-        ws.cell(row=row_idx, column=1, value="TOTAL").font = Font(bold=True)
-        ws.cell(row=row_idx, column=1).fill = subtotal_fill
-        ws.cell(row=row_idx, column=1).border = thin_border
-
-        for c in range(2, 6):
-            ws.cell(row=row_idx, column=c).fill = subtotal_fill
-            ws.cell(row=row_idx, column=c).border = thin_border
-
-        ws.cell(row=row_idx, column=3, value=total_ca).number_format = money_fmt
-        ws.cell(row=row_idx, column=3).font = Font(bold=True)
-        ws.cell(row=row_idx, column=4, value=total_rfa).number_format = money_fmt
-        ws.cell(row=row_idx, column=4).font = Font(bold=True)
-
-        ws.column_dimensions["A"].width = 22
-        ws.column_dimensions["B"].width = 36
-        ws.column_dimensions["C"].width = 24
-        ws.column_dimensions["D"].width = 20
-        ws.column_dimensions["E"].width = 38
-
-    def _fill_detail_sheet(ws, title: str, rows: List[Dict[str, Any]]):
-        ws.title = title
-        ws.merge_cells("A1:K1")
-        ws["A1"] = f"DETAIL RFA PAR PLATEFORME - {title.upper()}"
-        ws["A1"].font = Font(bold=True, size=14, color="1F4E79")
-        ws["A2"] = f"Import ID: {import_id}"
-        ws["A2"].font = Font(italic=True, color="808080")
-
-        row_idx = 4
-        for col, label in enumerate(detail_headers, 1):
-            cell = ws.cell(row=row_idx, column=col, value=label)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center")
-            cell.border = thin_border
-
-        row_idx += 1
+        line_styles = ["text"] * 6 + ["money"] * 4 + ["text"]
         total_ca = 0.0
         total_rfa = 0.0
         total_bonus = 0.0
@@ -1352,76 +1081,70 @@ async def export_global_recap_excel(
             total_bonus += bonus_value
             total_line += line_total
 
-            ws.cell(row=row_idx, column=1, value=item.get("entity_type", "")).border = thin_border
-            ws.cell(row=row_idx, column=2, value=item.get("code_union", "")).border = thin_border
-            ws.cell(row=row_idx, column=3, value=item.get("nom_client", "")).border = thin_border
-            ws.cell(row=row_idx, column=4, value=item.get("platform_scope", "")).border = thin_border
-            ws.cell(row=row_idx, column=5, value=item.get("platform_key", "")).border = thin_border
-            ws.cell(row=row_idx, column=6, value=item.get("platform_label", "")).border = thin_border
-
-            ws.cell(row=row_idx, column=7, value=ca_value).number_format = money_fmt
-            ws.cell(row=row_idx, column=7).border = thin_border
-            ws.cell(row=row_idx, column=8, value=rfa_value).number_format = money_fmt
-            ws.cell(row=row_idx, column=8).border = thin_border
-            ws.cell(row=row_idx, column=9, value=bonus_value).number_format = money_fmt
-            ws.cell(row=row_idx, column=9).border = thin_border
-            ws.cell(row=row_idx, column=10, value=line_total).number_format = money_fmt
-            ws.cell(row=row_idx, column=10).border = thin_border
-
-            ws.cell(row=row_idx, column=11, value=item.get("type_contrat", "")).border = thin_border
-            row_idx += 1
-
-        ws.cell(row=row_idx, column=1, value="TOTAL").font = Font(bold=True)
-        ws.cell(row=row_idx, column=1).fill = subtotal_fill
-        ws.cell(row=row_idx, column=1).border = thin_border
-        for c in range(2, 12):
-            ws.cell(row=row_idx, column=c).fill = subtotal_fill
-            ws.cell(row=row_idx, column=c).border = thin_border
-
-        ws.cell(row=row_idx, column=7, value=total_ca).number_format = money_fmt
-        ws.cell(row=row_idx, column=7).font = Font(bold=True)
-        ws.cell(row=row_idx, column=8, value=total_rfa).number_format = money_fmt
-        ws.cell(row=row_idx, column=8).font = Font(bold=True)
-        ws.cell(row=row_idx, column=9, value=total_bonus).number_format = money_fmt
-        ws.cell(row=row_idx, column=9).font = Font(bold=True)
-        ws.cell(row=row_idx, column=10, value=total_line).number_format = money_fmt
-        ws.cell(row=row_idx, column=10).font = Font(bold=True)
-
-        ws.column_dimensions["A"].width = 14
-        ws.column_dimensions["B"].width = 18
-        ws.column_dimensions["C"].width = 30
-        ws.column_dimensions["D"].width = 16
-        ws.column_dimensions["E"].width = 24
-        ws.column_dimensions["F"].width = 28
-        ws.column_dimensions["G"].width = 20
-        ws.column_dimensions["H"].width = 16
-        ws.column_dimensions["I"].width = 16
-        ws.column_dimensions["J"].width = 16
-        ws.column_dimensions["K"].width = 34
-
-    ws_indep = wb.active
-    _fill_sheet(ws_indep, "Magasins independants", export_data.get("independents", []))
-
-    ws_groups = wb.create_sheet("Groupes")
-    _fill_sheet(ws_groups, "Groupes", export_data.get("groups", []))
-
-    ws_detail_indep = wb.create_sheet("Detail indep plateformes")
-    _fill_detail_sheet(ws_detail_indep, "Independants", export_data.get("independents_details", []))
-
-    ws_detail_groups = wb.create_sheet("Detail groupes plateformes")
-    _fill_detail_sheet(ws_detail_groups, "Groupes", export_data.get("groups_details", []))
+            book.append(
+                ws,
+                [
+                    item.get("entity_type", ""),
+                    item.get("code_union", ""),
+                    item.get("nom_client", ""),
+                    item.get("platform_scope", ""),
+                    item.get("platform_key", ""),
+                    item.get("platform_label", ""),
+                    ca_value,
+                    rfa_value,
+                    bonus_value,
+                    line_total,
+                    item.get("type_contrat", ""),
+                ],
+                line_styles,
+            )
+
+        book.append(
+            ws,
+            ["TOTAL", None, None, None, None, None, total_ca, total_rfa, total_bonus, total_line, None],
+            ["subtotal"] * 6 + ["subtotal_money"] * 4 + ["subtotal"],
+        )
 
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    def _build(book: StreamingWorkbook):
+        _fill_sheet(book, "Magasins independants", export_data.get("independents", []))
+        _fill_sheet(book, "Groupes", export_data.get("groups", []))
+        _fill_detail_sheet(book, "Detail indep plateformes", "Independants", export_data.get("independents_details", []))
+        _fill_detail_sheet(book, "Detail groupes plateformes", "Groupes", export_data.get("groups_details", []))
 
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="RFA_Clients_{import_id[:8]}.xlsx"'},
+    return StreamingResponse(
+        StreamingWorkbook().stream(_build),
+        media_type=XLSX_MEDIA_TYPE,
+        headers=xlsx_headers(f"RFA_Clients_{import_id[:8]}.xlsx"),
     )
 
 
+def _tabular_export_response(export_format: str, columns, rows, filename_base: str) -> StreamingResponse:
+    """Réponse CSV / Parquet en streaming (voir app.services.tabular_export)."""
+    from app.services.tabular_export import PARQUET_AVAILABLE, iter_export, media_type
+    if export_format == "parquet" and not PARQUET_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Export Parquet non disponible dans cet environnement (pyarrow absent).")
+    import re
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", filename_base)
+    return StreamingResponse(
+        iter_export(export_format, columns, rows),
+        media_type=media_type(export_format),
+        headers={"Content-Disposition": f'attachment; filename="{safe_name}.{export_format}"'},
+    )
+
+
+def _pure_data_tabular_response(export_format: str, dataset: Optional[str], tables: Dict[str, Any], filename_base: str):
+    """
+    Export CSV / Parquet d'une liste d'un résultat Pure Data.
+    tables : dataset -> (jeu de colonnes de PURE_DATA_COLUMNS, lignes) ; défaut = premier dataset.
+    """
+    from app.services.tabular_export import PURE_DATA_COLUMNS
+    dataset = dataset or next(iter(tables))
+    if dataset not in tables:
+        raise HTTPException(status_code=400, detail=f"dataset invalide : {dataset} (attendu : {', '.join(tables)})")
+    columns_key, rows = tables[dataset]
+    return _tabular_export_response(export_format, PURE_DATA_COLUMNS[columns_key], rows, f"{filename_base}_{dataset}")
+
+
 def _parse_query_bool01(raw: Optional[str]) -> Optional[bool]:
     """Parse cotisation_* query (0/1, true/false) — évite les ambiguïtés bool sur certains clients HTTP."""
     if raw is None or raw == "":
@@ -1641,6 +1364,70 @@ async def get_entity_pdf(
         raise HTTPException(status_code=500, detail=f"Erreur lors de la generation du PDF: {str(e)}")
 
 
+@router.post("/imports/{import_id}/entity/pdf/bulk")
+async def post_entity_pdf_bulk(
+    import_id: str,
+    body: EntityPdfBulkBody,
+    session: Session = Depends(get_session),
+):
+    """
+    Export PDF en lot : un PDF par adhérent et/ou groupe, renvoyé en ZIP (flux).
+    mode = client | group | all ; entity_ids = sous-ensemble (sinon toutes les entités).
+    Cotisation de chaque entité lue dans CotisationSetting (une seule requête).
+    """
+    import_data = _resolve_import_data(import_id, session)
+    if not import_data:
+        raise HTTPException(status_code=404, detail=f"Import non trouve (ID: {import_id})")
+    if body.mode not in ("client", "group", "all"):
+        raise HTTPException(status_code=400, detail="mode doit etre 'client', 'group' ou 'all'")
+
+    if not import_data.by_client:
+        from app.services.compute import compute_aggregations
+        compute_aggregations(import_data)
+
+    modes = ["client", "group"] if body.mode == "all" else [body.mode]
+    wanted = {e.strip() for e in body.entity_ids if e and e.strip()} if body.entity_ids else None
+    cotisations = {
+        (c.entity_type, c.entity_key): c
+        for c in session.exec(select(CotisationSetting)).all()
+    }
+
+    jobs = []
+    for mode in modes:
+        entities = import_data.by_client if mode == "client" else import_data.by_group
+        for entity_id in sorted(entities):
+            if wanted is not None and entity_id not in wanted:
+                continue
+            cot = cotisations.get((mode, entity_id.strip().upper()))
+            c_amt, c_kind, c_fact, c_ded = _normalize_entity_pdf_cotisation(
+                mode,
+                cot.amount if cot else None,
+                None,
+                cot.facturee if cot else None,
+                cot.deduite if cot else None,
+                None,
+            )
+            jobs.append({
+                "mode": mode,
+                "entity_id": entity_id,
+                "cotisation_amount": c_amt,
+                "cotisation_kind": c_kind,
+                "cotisation_facturee": c_fact,
+                "cotisation_deduite": c_ded,
+            })
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Aucune entité à exporter")
+
+    from app.services.pdf_export import XHTML2PDF_AVAILABLE
+    if not XHTML2PDF_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Export PDF non disponible dans cet environnement (xhtml2pdf non installé).")
+    return StreamingResponse(
+        iter_bulk_pdf_zip(import_data, jobs, contract_id=body.contract_id),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="RFA_PDF_{import_id[:8]}.zip"'},
+    )
+
+
 # ==================== ENDPOINTS COTISATION (DB — partagé browser/Tauri/prod) ====================
 
 @router.get("/cotisations")
@@ -1719,6 +1506,31 @@ async def delete_cotisation(
 
 # ==================== ENDPOINTS CONTRATS ====================
 
+def _invalidate_genie_parts(
+    session: Session,
+    target_type=None,
+    target_value: Optional[str] = None,
+    contract_id: Optional[int] = None,
+    resolution_changed: bool = False,
+):
+    """
+    Contrat / affectation / override modifié : nouvelle version des contrats (les analyses Génie
+    en cache, mémoire et persistantes, ne sont plus servies) et retrait des seules entités concernées
+    du cache par entité (recalculées au prochain appel).
+    """
+    try:
+        from app.services.genie_cache import bump_contracts_version, contracts_version
+        from app.services.genie_engine import invalidate_genie_contract, invalidate_genie_entities
+        previous = contracts_version(session)
+        versions = (previous, bump_contracts_version(session))
+        if target_type is not None:
+            invalidate_genie_entities(target_type, target_value, versions)
+        else:
+            invalidate_genie_contract(contract_id, resolution_changed=resolution_changed, versions=versions)
+    except Exception as e:
+        print(f"[GENIE] Invalidation du cache impossible: {e}")
+
+
 @router.get("/contracts")
 async def list_contracts(session: Session = Depends(get_session)):
     """Liste tous les contrats."""
@@ -1745,6 +1557,8 @@ async def create_contract(contract: Contract, session: Session = Depends(get_ses
     session.add(contract)
     session.commit()
     session.refresh(contract)
+    if contract.is_default:
+        _invalidate_genie_parts(session, contract_id=contract.id, resolution_changed=True)
     return contract
 
 
@@ -1796,6 +1610,7 @@ async def update_contract(contract_id: int, contract_update: Contract, session:
     session.add(contract)
     session.commit()
     session.refresh(contract)
+    _invalidate_genie_parts(session, contract_id=contract_id, resolution_changed=True)
     return contract
 
 
@@ -1821,6 +1636,7 @@ async def set_default_contract(contract_id: int, session: Session = Depends(get_
     session.add(contract)
     session.commit()
     session.refresh(contract)
+    _invalidate_genie_parts(session, contract_id=contract_id, resolution_changed=True)
     return contract
 
 
@@ -1837,6 +1653,7 @@ async def toggle_active_contract(contract_id: int, session: Session = Depends(ge
     session.add(contract)
     session.commit()
     session.refresh(contract)
+    _invalidate_genie_parts(session, contract_id=contract_id, resolution_changed=True)
     return contract
 
 
@@ -1911,6 +1728,7 @@ async def delete_contract(contract_id: int, session: Session = Depends(get_sessi
     # Supprimer le contrat
     session.delete(contract)
     session.commit()
+    _invalidate_genie_parts(session, contract_id=contract_id, resolution_changed=True)
     
     return {"message": f"Contrat '{contract.name}' supprimé avec succès"}
 
@@ -1961,6 +1779,7 @@ async def update_contract_rule(
     session.add(rule)
     session.commit()
     session.refresh(rule)
+    _invalidate_genie_parts(session, contract_id=contract_id)
     return rule
 
 
@@ -2010,6 +1829,7 @@ async def create_contract_rule(
     session.add(rule)
     session.commit()
     session.refresh(rule)
+    _invalidate_genie_parts(session, contract_id=contract_id)
     return rule
 
 
@@ -2055,6 +1875,7 @@ async def create_assignment(assignment: ContractAssignment, session: Session = D
     session.add(assignment)
     session.commit()
     session.refresh(assignment)
+    _invalidate_genie_parts(session, assignment.target_type, assignment.target_value)
     return assignment
 
 
@@ -2067,6 +1888,7 @@ async def delete_assignment(assignment_id: int, session: Session = Depends(get_s
     
     session.delete(assignment)
     session.commit()
+    _invalidate_genie_parts(session, assignment.target_type, assignment.target_value)
     return {"message": "Affectation supprimée"}
 
 
@@ -2157,6 +1979,7 @@ async def create_override(override: ContractOverride, session: Session = Depends
     session.add(override)
     session.commit()
     session.refresh(override)
+    _invalidate_genie_parts(session, override.target_type, override.target_value)
     return override
 
 
@@ -2193,6 +2016,7 @@ async def update_override(
     session.add(override)
     session.commit()
     session.refresh(override)
+    _invalidate_genie_parts(session, override.target_type, override.target_value)
     return override
 
 
@@ -2205,6 +2029,7 @@ async def delete_override(override_id: int, session: Session = Depends(get_sessi
     
     session.delete(override)
     session.commit()
+    _invalidate_genie_parts(session, override.target_type, override.target_value)
     return {"message": "Override supprime avec succes"}
 
 
@@ -2229,6 +2054,7 @@ async def delete_all_entity_overrides(target_type: str, target_value: str, sessi
         session.delete(override)
     
     session.commit()
+    _invalidate_genie_parts(session, target_type_enum, normalized)
     return {"message": f"{count} override(s) supprime(s) pour {target_type}/{normalized}"}
 
 
@@ -2262,6 +2088,7 @@ async def create_ad(ad: AdCreate, session: Session = Depends(get_session)):
     session.add(ad_model)
     session.commit()
     session.refresh(ad_model)
+    invalidate_pdf_asset_cache()
     return ad_model
 
 
@@ -2278,6 +2105,7 @@ async def update_ad(ad_id: int, ad_update: AdUpdate, session: Session = Depends(
     session.add(ad)
     session.commit()
     session.refresh(ad)
+    invalidate_pdf_asset_cache()
     return ad
 
 
@@ -2289,6 +2117,7 @@ async def delete_ad(ad_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Annonce non trouvee")
     session.delete(ad)
     session.commit()
+    invalidate_pdf_asset_cache()
     return {"message": "Annonce supprimee"}
 
 
@@ -2333,6 +2162,7 @@ async def import_contracts_json(
     
     try:
         result = import_contracts_from_json(json_data, mode=mode, session=session)
+        _invalidate_genie_parts(session, resolution_changed=True)
         return {
             "message": "Import terminé",
             "imported": result["imported"],
@@ -2629,6 +2459,7 @@ async def upload_ad_image(
         url = upload_image(content, filename, "ads", file.content_type or "image/jpeg")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur upload: {str(e)}")
+    invalidate_pdf_asset_cache()
     return {"filename": filename, "url": url}
 
 
@@ -2661,6 +2492,7 @@ async def upload_avatar(
         url = upload_image(content, filename, "avatars", file.content_type or "image/jpeg")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur upload: {str(e)}")
+    invalidate_pdf_asset_cache()
     return {"filename": filename, "url": url}
 
 
@@ -2693,6 +2525,7 @@ async def upload_logo(
         url = upload_image(content, filename, "logos", file.content_type or "image/jpeg")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur upload: {str(e)}")
+    invalidate_pdf_asset_cache()
     return {"filename": filename, "url": url}
 
 
@@ -2754,6 +2587,7 @@ async def create_supplier_logo(
         session.add(existing)
         session.commit()
         session.refresh(existing)
+        invalidate_pdf_asset_cache()
         return {"id": existing.id, "supplier_key": existing.supplier_key, "supplier_name": existing.supplier_name, "image_url": existing.image_url, "is_active": existing.is_active}
     else:
         logo = SupplierLogo(
@@ -2765,6 +2599,7 @@ async def create_supplier_logo(
         session.add(logo)
         session.commit()
         session.refresh(logo)
+        invalidate_pdf_asset_cache()
         return {"id": logo.id, "supplier_key": logo.supplier_key, "supplier_name": logo.supplier_name, "image_url": logo.image_url, "is_active": logo.is_active}
 
 
@@ -2784,6 +2619,7 @@ async def delete_supplier_logo(logo_id: int, session: Session = Depends(get_sess
     
     session.delete(logo)
     session.commit()
+    invalidate_pdf_asset_cache()
     return {"ok": True}
 
 
@@ -2828,6 +2664,7 @@ async def set_setting(
     session.add(setting)
     session.commit()
     session.refresh(setting)
+    invalidate_pdf_asset_cache()
     
     return {"key": setting.key, "value": setting.value}
 
@@ -3843,24 +3680,35 @@ def _resolve_pure_data(pure_data_id: str):
     """
     Résout un import Pure Data : depuis la mémoire d'abord, puis Supabase si sheets_live.
     """
-    from app.storage import get_pure_data_import, create_pure_data_import, _pure_data_imports
+    from app.storage import get_pure_data_import
     # 1. Mémoire (cache)
     pd_import = get_pure_data_import(pure_data_id)
     if pd_import:
         return pd_import
-    # 2. Supabase (pour sheets_live ou après redémarrage)
+    # 2. Supabase (pour sheets_live ou après redémarrage), un seul chargement à la fois
     if pure_data_id == "sheets_live":
-        try:
-            from app.services.pure_data_supabase import read_pure_data_from_supabase
-            # Charger TOUTES les données (le filtrage se fait ensuite en Python)
-            # sys.setrecursionlimit est géré dans l'endpoint appelant
-            rows, columns, mapping = read_pure_data_from_supabase()
-            if rows:
-                _id = create_pure_data_import(columns, mapping, rows)
-                _pure_data_imports["sheets_live"] = _pure_data_imports[_id]
-                return _pure_data_imports["sheets_live"]
-        except Exception as e:
-            print(f"[PURE DATA] Erreur lecture Supabase: {e}")
+        from app.services.single_flight import pure_data_flight
+        return pure_data_flight.do(pure_data_id, _load_live_pure_data)
+    return None
+
+
+def _load_live_pure_data():
+    """Charge Pure Data sheets_live depuis Supabase."""
+    from app.storage import get_pure_data_import, create_pure_data_import, _pure_data_imports
+    pd_import = get_pure_data_import("sheets_live")
+    if pd_import:
+        return pd_import
+    try:
+        from app.services.pure_data_supabase import read_pure_data_from_supabase
+        # Charger TOUTES les données (le filtrage se fait ensuite en Python)
+        # sys.setrecursionlimit est géré dans l'endpoint appelant
+        rows, columns, mapping = read_pure_data_from_supabase()
+        if rows:
+            _id = create_pure_data_import(columns, mapping, rows)
+            _pure_data_imports["sheets_live"] = _pure_data_imports[_id]
+            return _pure_data_imports["sheets_live"]
+    except Exception as e:
+        print(f"[PURE DATA] Erreur lecture Supabase: {e}")
     return None
 
 
@@ -3928,10 +3776,13 @@ async def get_pure_data_comparison(
     year_previous: Optional[int] = None,
     month: Optional[int] = None,
     fournisseur: Optional[str] = None,
+    export_format: str = Query("json", alias="format", pattern="^(json|csv|parquet)$"),
+    dataset: Optional[str] = None,
 ):
     """
     Recalcule la comparaison N vs N-1 à partir des lignes stockées, avec filtre fournisseur optionnel.
     Utilisé pour afficher Pure Data filtré par plateforme (ACR, DCA, etc.).
+    format=csv|parquet : dataset clients (défaut), platforms ou commercials.
     """
     pure_data = _resolve_pure_data(pure_data_id)
     if not pure_data:
@@ -3950,6 +3801,12 @@ async def get_pure_data_comparison(
     current_agg = aggregate_rows(current_filtered)
     previous_agg = aggregate_rows(previous_filtered)
     comparison = build_comparison(current_agg, previous_agg)
+    if export_format != "json":
+        return _pure_data_tabular_response(export_format, dataset, {
+            "clients": ("clients", comparison["clients"]),
+            "platforms": ("platforms", comparison["platforms"]),
+            "commercials": ("commercials", comparison["commercials"]),
+        }, "PureData_comparaison")
     return {"comparison": comparison}
 
 
@@ -3961,10 +3818,13 @@ async def pure_data_client_detail(
     year_previous: Optional[int] = None,
     month: Optional[int] = None,
     fournisseur: Optional[str] = None,
+    export_format: str = Query("json", alias="format", pattern="^(json|csv|parquet)$"),
+    dataset: Optional[str] = None,
 ):
     """
     Détail N vs N-1 pour un client (fournisseur -> marque -> famille -> sous-famille).
     Si fournisseur est fourni, seul ce fournisseur est inclus.
+    format=csv|parquet : arbre aplati (une ligne par sous-famille).
     """
     pure_data = _resolve_pure_data(pure_data_id)
     if not pure_data:
@@ -3980,11 +3840,16 @@ async def pure_data_client_detail(
             month=month,
             fournisseur=fournisseur,
         )
-        return detail
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Erreur détail client: {str(e)}")
+    if export_format != "json":
+        from app.services.tabular_export import flatten_breakdown
+        return _pure_data_tabular_response(export_format, dataset, {
+            "breakdown": ("breakdown", flatten_breakdown(detail["breakdown"])),
+        }, f"PureData_client_{code_union}")
+    return detail
 
 
 @router.get("/pure-data/platform-detail")
@@ -3993,10 +3858,13 @@ async def pure_data_platform_detail(
     platform: str,
     year_current: Optional[int] = None,
     year_previous: Optional[int] = None,
-    month: Optional[int] = None
+    month: Optional[int] = None,
+    export_format: str = Query("json", alias="format", pattern="^(json|csv|parquet)$"),
+    dataset: Optional[str] = None,
 ):
     """
     Détail N vs N-1 pour une plateforme (liste clients).
+    format=csv|parquet : dataset clients (défaut) ou marques.
     """
     pure_data = _resolve_pure_data(pure_data_id)
     if not pure_data:
@@ -4011,11 +3879,16 @@ async def pure_data_platform_detail(
             year_previous=year_previous,
             month=month
         )
-        return detail
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Erreur détail plateforme: {str(e)}")
+    if export_format != "json":
+        return _pure_data_tabular_response(export_format, dataset, {
+            "clients": ("clients", detail["clients"]),
+            "marques": ("marques", detail["marques"]),
+        }, f"PureData_plateforme_{platform}")
+    return detail
 
 
 @router.get("/pure-data/marque-detail")
@@ -4026,9 +3899,12 @@ async def pure_data_marque_detail(
     year_current: Optional[int] = None,
     year_previous: Optional[int] = None,
     month: Optional[int] = None,
+    export_format: str = Query("json", alias="format", pattern="^(json|csv|parquet)$"),
+    dataset: Optional[str] = None,
 ):
     """
     Pour une plateforme et une marque, retourne les magasins (clients) qui contribuent à cette marque.
+    format=csv|parquet : liste des magasins.
     """
     pure_data = _resolve_pure_data(pure_data_id)
     if not pure_data:
@@ -4044,11 +3920,15 @@ async def pure_data_marque_detail(
             year_previous=year_previous,
             month=month,
         )
-        return detail
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Erreur détail marque: {str(e)}")
+    if export_format != "json":
+        return _pure_data_tabular_response(export_format, dataset, {
+            "magasins": ("clients", detail["magasins"]),
+        }, f"PureData_marque_{platform}_{marque}")
+    return detail
 
 
 @router.get("/pure-data/commercial-detail")
@@ -4059,9 +3939,12 @@ async def pure_data_commercial_detail(
     year_previous: Optional[int] = None,
     month: Optional[int] = None,
     fournisseur: Optional[str] = None,
+    export_format: str = Query("json", alias="format", pattern="^(json|csv|parquet)$"),
+    dataset: Optional[str] = None,
 ):
     """
     Détail N vs N-1 pour un commercial (global + plateformes + clients).
+    format=csv|parquet : dataset clients (défaut) ou platforms.
     """
     pure_data = _resolve_pure_data(pure_data_id)
     if not pure_data:
@@ -4077,15 +3960,50 @@ async def pure_data_commercial_detail(
             month=month,
             fournisseur=fournisseur,
         )
-        return detail
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Erreur détail commercial: {str(e)}")
+    if export_format != "json":
+        return _pure_data_tabular_response(export_format, dataset, {
+            "clients": ("clients", detail["clients"]),
+            "platforms": ("platforms", detail["platforms"]),
+        }, f"PureData_commercial_{detail['commercial']}")
+    return detail
 
 
 # ==================== GENIE RFA (Assistant commercial IA) ====================
 
+async def _get_genie_analysis(import_data) -> Dict:
+    """
+    Analyse Génie complète pour tous les endpoints Génie (query, smart-plans, export) :
+    1. cache mémoire puis persistant (AppSettings compressé, survit aux redémarrages),
+       clé versionnée : import + version des contrats ;
+    2. sinon calcul, puis écriture dans les deux niveaux du cache.
+    Clé (agrégats, empreinte), lecture du cache et calcul s'exécutent dans un thread (ne bloquent
+    PAS l'event loop), une seule fois par import pour les requêtes concurrentes (genie_flight).
+    """
+    from app.database import engine
+    from app.services.genie_engine import genie_full_analysis
+    from app.services.genie_cache import analysis_key, genie_cache
+    from app.services.single_flight import genie_flight
+
+    import_id = getattr(import_data, "import_id", None)
+
+    def _load_or_compute() -> Dict:
+        if not import_id:
+            return genie_full_analysis(import_data)
+        with Session(engine) as session:
+            version_key = analysis_key(import_data, session)
+            analysis = genie_cache.get(version_key, session)
+            if analysis is None:
+                analysis = genie_full_analysis(import_data)
+                genie_cache.put(version_key, analysis, session)
+            return analysis
+
+    return await genie_flight.do_async(f"import:{import_id}" if import_id else f"object:{id(import_data)}", _load_or_compute)
+
+
 @router.get("/genie/query")
 async def genie_query_endpoint(
     import_id: str,
@@ -4122,60 +4040,51 @@ async def genie_query_endpoint(
             result["_note"] = "Analyse CA (cloud). Ouvrez l'application locale pour l'analyse complète."
             return result
         else:
-            from app.services.genie_engine import genie_query, genie_full_analysis, invalidate_genie_cache
-            from app.services.genie_engine import _full_analysis_cache, _apply_query_to_analysis
-            import asyncio
-            from concurrent.futures import ThreadPoolExecutor
+            from app.services.genie_engine import _apply_query_to_analysis
+            analysis = await _get_genie_analysis(import_data)
+            return _apply_query_to_analysis(analysis, query_type, params, import_data)
 
-            cache_key = getattr(import_data, "import_id", None)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Erreur Génie: {str(e)}")
 
-            # 1. Cache mémoire (Railway persistant — instantané)
-            if cache_key and cache_key in _full_analysis_cache:
-                return _apply_query_to_analysis(_full_analysis_cache[cache_key], query_type, params, import_data)
 
-            # 2. Cache Supabase (survit aux redémarrages — <200ms)
-            supabase_cache_key = f"genie_cache_{cache_key}"
-            try:
-                cached_setting = session.exec(
-                    select(AppSettings).where(AppSettings.key == supabase_cache_key)
-                ).first()
-                if cached_setting and cached_setting.value:
-                    analysis = json.loads(cached_setting.value)
-                    if cache_key:
-                        _full_analysis_cache[cache_key] = analysis
-                    return _apply_query_to_analysis(analysis, query_type, params, import_data)
-            except Exception:
-                pass
+@router.delete("/imports/{import_id}")
+async def delete_import_endpoint(import_id: str, session: Session = Depends(get_session), admin: User = Depends(require_admin)):
+    """Supprime un import : mémoire, instantané disque, instantané en base et analyses Génie."""
+    if import_id == LIVE_IMPORT_ID:
+        raise HTTPException(status_code=400, detail="L'import de la feuille Sheets ne peut pas être supprimé")
+    from app.services.import_cache import import_cache
+    from app.services.genie_engine import invalidate_genie_cache
+    import_cache.delete(import_id, session)
+    invalidate_genie_cache(import_id)
+    return {"ok": True}
 
-            # 3. Calcul complet dans un thread (ne bloque PAS l'event loop FastAPI)
-            loop = asyncio.get_event_loop()
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                analysis = await loop.run_in_executor(executor, genie_full_analysis, import_data)
 
-            # Sauvegarder en cache Supabase (non bloquant)
-            try:
-                analysis_json = json.dumps(analysis, ensure_ascii=False, default=str)
-                # Limiter la taille (max ~1MB pour AppSettings)
-                if len(analysis_json) < 1_000_000:
-                    existing = session.exec(
-                        select(AppSettings).where(AppSettings.key == supabase_cache_key)
-                    ).first()
-                    if existing:
-                        existing.value = analysis_json
-                        existing.updated_at = datetime.now()
-                        session.add(existing)
-                    else:
-                        session.add(AppSettings(key=supabase_cache_key, value=analysis_json))
-                    session.commit()
-            except Exception as e:
-                print(f"[GENIE] Erreur sauvegarde cache Supabase: {e}")
+@router.get("/import-cache/stats")
+async def import_cache_stats(admin: User = Depends(require_admin)):
+    """Occupation et hits / misses par niveau du cache des imports (mémoire, disque, base, origine) et des Pure Data."""
+    from app.services.import_cache import import_cache
+    from app.services.single_flight import import_flight
+    from app.services.import_cache import pure_data_disk
+    from app.services.columnar_snapshot import live_import_snapshot
+    from app.storage import _pure_data_imports
+    stats = import_cache.stats()
+    stats["pure_data"] = {"memory": _pure_data_imports.stats(), "disk": pure_data_disk.stats()}
+    stats["single_flight"] = import_flight.stats()
+    stats["shared_snapshot"] = live_import_snapshot.stats()
+    return stats
 
-            return _apply_query_to_analysis(analysis, query_type, params, import_data)
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Erreur Génie: {str(e)}")
+@router.get("/genie/cache-stats")
+async def genie_cache_stats(admin: User = Depends(require_admin)):
+    """Occupation du cache Génie (entrées, octets, hits / misses, taux de succès) pour le dimensionner."""
+    from app.services.genie_cache import genie_cache
+    from app.services.genie_engine import _entity_cache
+    stats = genie_cache.stats()
+    stats["entities"] = {import_id: len(parts) for import_id, (_, parts) in _entity_cache.items()}
+    return stats
 
 
 @router.get("/genie/smart-plans")
@@ -4188,13 +4097,13 @@ async def genie_smart_plans(import_id: str, entity_id: Optional[str] = None, ses
     import_data = _resolve_import_data(import_id, session)
     if not import_data:
         raise HTTPException(status_code=404, detail="Import non trouvé")
-    from app.services.genie_engine import genie_full_analysis
+    from app.services.genie_search import search_index_for
     try:
-        analysis = genie_full_analysis(import_data)
+        analysis = await _get_genie_analysis(import_data)
         plans = analysis.get("smart_plans", [])
         if entity_id:
-            search = entity_id.upper()
-            plans = [p for p in plans if search in p["entity_id"].upper() or search in p["entity_label"].upper()]
+            index = search_index_for(analysis, import_data)
+            plans = index.filter_rows("smart_plans", lambda: plans, entity_id)
         return plans
     except Exception as e:
         import traceback
@@ -4204,137 +4113,102 @@ async def genie_smart_plans(import_id: str, entity_id: Optional[str] = None, ses
 
 @router.get("/genie/smart-plans/export-excel")
 async def genie_export_excel(import_id: str, session: Session = Depends(get_session)):
-    """Export Excel structuré de tous les plans d'achat optimisés."""
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from io import BytesIO
+    """Export Excel structuré de tous les plans d'achat optimisés (classeur write_only en streaming)."""
+    from openpyxl.styles import Alignment, Font
+    from app.services.excel_export import (
+        INT_FMT, XLSX_MEDIA_TYPE, StreamingWorkbook, solid_fill, style, xlsx_headers,
+    )
 
     import_data = _resolve_import_data(import_id, session)
     if not import_data:
         raise HTTPException(status_code=404, detail="Import non trouvé")
-    from app.services.genie_engine import genie_full_analysis
     try:
-        analysis = genie_full_analysis(import_data)
+        analysis = await _get_genie_analysis(import_data)
         plans = analysis.get("smart_plans", [])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur analyse: {str(e)}")
 
-    wb = openpyxl.Workbook()
-
-    # --- Feuille 1 : Synthèse Plans ---
-    ws = wb.active
-    ws.title = "Plans d'achat"
     hdr_font = Font(bold=True, color="FFFFFF", size=11)
-    hdr_fill = PatternFill(start_color="4F46E5", end_color="4F46E5", fill_type="solid")
-    bonus_fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-    green_font = Font(bold=True, color="047857")
-    thin = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
+    hdr_align = Alignment(horizontal='center', wrap_text=True)
+
+    def _build(book: StreamingWorkbook):
+        # --- Feuille 1 : Synthèse Plans ---
+        ws = book.add_sheet("Plans d'achat", widths=[12, 30, 20, 15, 15, 12, 10, 10, 14, 14, 14, 14, 12, 60])
+        headers = [
+            "Code Union", "Nom Client", "Fournisseur", "CA Global actuel",
+            "Palier Global visé", "Manque Global",
+            "Paliers débloqués", "Paliers avec bonus", "CA à investir",
+            "CA avec bonus", "Gain RFA Option A", "Gain RFA Option B",
+            "Bonus effort", "Tri-partites à pousser"
+        ]
+        book.append(ws, headers, "genie_header")
 
-    headers = [
-        "Code Union", "Nom Client", "Fournisseur", "CA Global actuel",
-        "Palier Global visé", "Manque Global",
-        "Paliers débloqués", "Paliers avec bonus", "CA à investir",
-        "CA avec bonus", "Gain RFA Option A", "Gain RFA Option B",
-        "Bonus effort", "Tri-partites à pousser"
-    ]
-    for col, h in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=h)
-        cell.font = hdr_font
-        cell.fill = hdr_fill
-        cell.alignment = Alignment(horizontal='center', wrap_text=True)
-        cell.border = thin
-
-    row_num = 2
-    for plan in plans:
-        tri_detail = " | ".join(
-            f"{it['label']}: +{it['ca_to_push']:,.0f}€ → +{it['projected_gain']:,.0f}€ RFA"
-            for it in plan["plan_items"]
-        )
-        vals = [
-            plan["entity_id"],
-            plan["entity_label"].split(" - ", 1)[1] if " - " in plan["entity_label"] else plan["entity_label"],
-            plan["global_label"],
-            plan["global_ca"],
-            plan["global_ca"] + plan["global_missing"],
-            plan["global_missing"],
-            plan["tiers_unlocked"],
-            plan.get("tiers_with_bonus", plan["tiers_unlocked"]),
-            plan["total_ca_needed"],
-            plan.get("total_with_bonus", plan["total_ca_needed"]),
-            plan.get("gain_option_a", 0),
-            plan.get("gain_option_b", 0),
-            plan.get("bonus_effort", 0),
-            tri_detail,
+        plan_styles = [
+            "text", "text", "text", "int", "int", "int", "text", "text",
+            "int", "int", "gain_a", "gain_b", "int", "text",
         ]
-        for col, v in enumerate(vals, 1):
-            cell = ws.cell(row=row_num, column=col, value=v)
-            cell.border = thin
-            if col in (4, 5, 6, 9, 10, 11, 12, 13):
-                cell.number_format = '#,##0'
-            if col == 11:
-                cell.font = green_font
-            if col == 12:
-                cell.font = Font(bold=True, color="0E7490")
-        row_num += 1
-
-    # Ajuster largeur
-    col_widths = [12, 30, 20, 15, 15, 12, 10, 10, 14, 14, 14, 14, 12, 60]
-    for i, w in enumerate(col_widths, 1):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(i)].width = w
-
-    # --- Feuille 2 : Détail tri-partites ---
-    ws2 = wb.create_sheet("Détail tri-partites")
-    headers2 = [
-        "Code Union", "Nom Client", "Fournisseur",
-        "Tri-partite", "CA actuel tri", "Progression %",
-        "CA à pousser", "Gain RFA tri",
-        "Contribue au global", "Global débloqué?"
-    ]
-    for col, h in enumerate(headers2, 1):
-        cell = ws2.cell(row=1, column=col, value=h)
-        cell.font = hdr_font
-        cell.fill = PatternFill(start_color="7C3AED", end_color="7C3AED", fill_type="solid")
-        cell.alignment = Alignment(horizontal='center', wrap_text=True)
-        cell.border = thin
-
-    row_num = 2
-    for plan in plans:
-        nom = plan["entity_label"].split(" - ", 1)[1] if " - " in plan["entity_label"] else plan["entity_label"]
-        for item in plan["plan_items"]:
-            vals2 = [
+        for plan in plans:
+            tri_detail = " | ".join(
+                f"{it['label']}: +{it['ca_to_push']:,.0f}€ → +{it['projected_gain']:,.0f}€ RFA"
+                for it in plan["plan_items"]
+            )
+            vals = [
                 plan["entity_id"],
-                nom,
+                plan["entity_label"].split(" - ", 1)[1] if " - " in plan["entity_label"] else plan["entity_label"],
                 plan["global_label"],
-                item["label"],
-                item["ca"],
-                round(item["progress"], 1),
-                item["ca_to_push"],
-                item["projected_gain"],
-                "Oui",
-                "Oui" if plan["global_unlocked"] else ("Avec bonus" if plan.get("bonus_reasonable") else "Non"),
+                plan["global_ca"],
+                plan["global_ca"] + plan["global_missing"],
+                plan["global_missing"],
+                plan["tiers_unlocked"],
+                plan.get("tiers_with_bonus", plan["tiers_unlocked"]),
+                plan["total_ca_needed"],
+                plan.get("total_with_bonus", plan["total_ca_needed"]),
+                plan.get("gain_option_a", 0),
+                plan.get("gain_option_b", 0),
+                plan.get("bonus_effort", 0),
+                tri_detail,
             ]
-            for col, v in enumerate(vals2, 1):
-                cell = ws2.cell(row=row_num, column=col, value=v)
-                cell.border = thin
-                if col in (5, 7, 8):
-                    cell.number_format = '#,##0'
-            row_num += 1
-
-    col_widths2 = [12, 30, 20, 25, 14, 10, 14, 14, 15, 15]
-    for i, w in enumerate(col_widths2, 1):
-        ws2.column_dimensions[openpyxl.utils.get_column_letter(i)].width = w
-
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-
-    return Response(
-        content=buf.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="Plans_Achat_RFA.xlsx"'}
+            book.append(ws, vals, plan_styles)
+
+        # --- Feuille 2 : Détail tri-partites ---
+        ws2 = book.add_sheet("Détail tri-partites", widths=[12, 30, 20, 25, 14, 10, 14, 14, 15, 15])
+        headers2 = [
+            "Code Union", "Nom Client", "Fournisseur",
+            "Tri-partite", "CA actuel tri", "Progression %",
+            "CA à pousser", "Gain RFA tri",
+            "Contribue au global", "Global débloqué?"
+        ]
+        book.append(ws2, headers2, "genie_header_tri")
+
+        item_styles = ["text", "text", "text", "text", "int", "text", "int", "int", "text", "text"]
+        for plan in plans:
+            nom = plan["entity_label"].split(" - ", 1)[1] if " - " in plan["entity_label"] else plan["entity_label"]
+            for item in plan["plan_items"]:
+                vals2 = [
+                    plan["entity_id"],
+                    nom,
+                    plan["global_label"],
+                    item["label"],
+                    item["ca"],
+                    round(item["progress"], 1),
+                    item["ca_to_push"],
+                    item["projected_gain"],
+                    "Oui",
+                    "Oui" if plan["global_unlocked"] else ("Avec bonus" if plan.get("bonus_reasonable") else "Non"),
+                ]
+                book.append(ws2, vals2, item_styles)
+
+    book = StreamingWorkbook({
+        "genie_header": style(font=hdr_font, fill=solid_fill("4F46E5"), alignment=hdr_align),
+        "genie_header_tri": style(font=hdr_font, fill=solid_fill("7C3AED"), alignment=hdr_align),
+        "int": style(number_format=INT_FMT),
+        "gain_a": style(font=Font(bold=True, color="047857"), number_format=INT_FMT),
+        "gain_b": style(font=Font(bold=True, color="0E7490"), number_format=INT_FMT),
+    })
+    return StreamingResponse(
+        book.stream(_build),
+        media_type=XLSX_MEDIA_TYPE,
+        headers=xlsx_headers("Plans_Achat_RFA.xlsx"),
     )
 
 
@@ -4395,10 +4269,7 @@ async def nathalie_generate_emails(body: Dict[str, Any] = Body(...)):
         if not client:
             raise HTTPException(status_code=404, detail=f"Client {code_union} introuvable")
 
-        all_suppliers = nathalie_service.get_suppliers()
-        sup_map: Dict[str, Any] = {
-            s["entreprise"].upper(): s for s in all_suppliers if s.get("entreprise")
-        }
+        sup_map = nathalie_service.get_supplier_index()
 
         emails = []
         for name in supplier_names:
@@ -43,6 +43,12 @@ AVATARS_DIR        = os.path.join(_UPLOAD_BASE, "avatars")
 LOGOS_DIR          = os.path.join(_UPLOAD_BASE, "logos")
 SUPPLIER_LOGOS_DIR = os.path.join(_UPLOAD_BASE, "supplier_logos")
 
+# Dossier des caches disque (pièces jointes Drive, PDF, snapshots…)
+CACHE_DIR = os.environ.get(
+    "RFA_CACHE_DIR",
+    "/tmp/rfa_cache" if _IS_VERCEL else os.path.join(os.path.dirname(__file__), "..", "cache"),
+)
+
 # Créer le moteur
 if _PG:
     # Connexion directe psycopg2 — contourne tout parsing d'URL
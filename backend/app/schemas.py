@@ -32,6 +32,13 @@ class EntityPdfExportBody(BaseModel):
     cotisation_mode: Optional[str] = None
 
 
+class EntityPdfBulkBody(BaseModel):
+    """Export PDF en lot (ZIP) — cotisations lues en base (CotisationSetting) pour chaque entité."""
+    mode: str = Field("all", description="'client', 'group' ou 'all'")
+    entity_ids: Optional[List[str]] = Field(default=None, description="None = toutes les entités du mode")
+    contract_id: Optional[int] = None
+
+
 class CotisationSettingBody(BaseModel):
     """Corps PUT cotisation (upsert)."""
     amount: float
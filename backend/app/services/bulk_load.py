@@ -0,0 +1,307 @@
+"""
+Chargement en masse (bulk load) des tables Pure Data.
+
+- PostgreSQL / Supabase : COPY FROM STDIN via psycopg2 (copy_expert), alimenté par un
+  encodeur CSV en streaming (aucun buffer complet en mémoire, 1 seul aller-retour réseau).
+- SQLite (dev local) : executemany directement sur le curseur DBAPI.
+
+Utilisé par l'API (/pure-data/sync-sheets, /pure-data/monthly/import-excel)
+et par le script autonome sync_pure_data.py (qui n'importe pas app.database).
+"""
+import re
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+def _encode_field(value: Any) -> str:
+    """
+    Encode une valeur au format CSV de COPY (tabulation). None et chaîne vide donnent un champ
+    vide non quoté, stocké NULL comme avec les anciens INSERT par lots.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, int):
+        return str(value)
+    s = str(value)
+    if any(c in s for c in ('\t', '"', '\n', '\r')):
+        return '"' + s.replace('"', '""') + '"'
+    return s
+
+
+def encode_csv_line(values: Sequence[Any]) -> str:
+    """Encode une ligne (valeurs dans l'ordre des colonnes) en ligne CSV terminée par \\n."""
+    return "\t".join(_encode_field(v) for v in values) + "\n"
+
+
+class CsvStream:
+    """
+    Objet "fichier" en lecture seule qui encode les lignes à la demande.
+    copy_expert appelle read(size) en boucle : seules quelques lignes sont en mémoire à la fois.
+    """
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        self._rows: Iterator[Sequence[Any]] = iter(rows)
+        self._buffer = ""
+        self.count = 0
+
+    def read(self, size: int = -1) -> str:
+        if size is None or size < 0:
+            parts = [self._buffer]
+            for row in self._rows:
+                parts.append(encode_csv_line(row))
+                self.count += 1
+            self._buffer = ""
+            return "".join(parts)
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = encode_csv_line(row)
+            self.count += 1
+            parts.append(line)
+            length += len(line)
+        data = "".join(parts)
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def _quote_columns(columns: Sequence[str]) -> str:
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+def copy_rows(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """
+    COPY FROM STDIN sur un curseur psycopg2. rows = tuples dans l'ordre de `columns`.
+    Ne fait pas de commit (la transaction appartient à l'appelant). Retourne le nombre de lignes.
+    """
+    stream = CsvStream(rows)
+    copy_sql = (
+        f'COPY "{table}" ({_quote_columns(columns)}) FROM STDIN '
+        f"WITH (FORMAT CSV, DELIMITER E'\\t', NULL '', QUOTE '\"')"
+    )
+    cursor.copy_expert(copy_sql, stream)
+    return stream.count
+
+
+def _counted(rows: Iterable[Sequence[Any]], counter: list) -> Iterator[Sequence[Any]]:
+    for row in rows:
+        counter[0] += 1
+        yield tuple(row)
+
+
+def executemany_rows(
+    cursor,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    paramstyle: str = "qmark",
+) -> int:
+    """INSERT via executemany sur un curseur DBAPI (SQLite par défaut). Retourne le nombre de lignes."""
+    marker = "?" if paramstyle == "qmark" else "%s"
+    placeholders = ", ".join(marker for _ in columns)
+    sql = f'INSERT INTO "{table}" ({_quote_columns(columns)}) VALUES ({placeholders})'
+    counter = [0]
+    cursor.executemany(sql, _counted(rows, counter))
+    return counter[0]
+
+
+def bulk_insert(conn, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """
+    Insère `rows` dans `table` via la connexion SQLAlchemy `conn` (dans sa transaction courante).
+    PostgreSQL : COPY ; autres moteurs : executemany DBAPI.
+    """
+    dbapi_conn = conn.connection
+    cursor = dbapi_conn.cursor()
+    try:
+        if conn.dialect.name == "postgresql":
+            return copy_rows(cursor, table, columns, rows)
+        return executemany_rows(cursor, table, columns, rows, paramstyle=conn.dialect.paramstyle)
+    finally:
+        cursor.close()
+
+
+def bulk_load(
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    truncate: bool = False,
+    engine: Optional[Any] = None,
+) -> int:
+    """
+    Point d'entrée côté API : ouvre une transaction, vide éventuellement la table, puis insère.
+    engine par défaut = app.database.engine.
+    """
+    from sqlalchemy import text
+    if engine is None:
+        from app.database import engine as _engine
+        engine = _engine
+    with engine.begin() as conn:
+        if truncate:
+            conn.execute(text(f'DELETE FROM "{table}"'))
+        return bulk_insert(conn, table, columns, rows)
+
+
+def _transfer_owned_sequences(cursor, from_table: str, to_table: str) -> None:
+    """
+    Les colonnes SERIAL de la table fantôme (LIKE ... INCLUDING DEFAULTS) utilisent la séquence
+    de la table d'origine : on lui transfère la propriété avant de supprimer l'ancienne table.
+    """
+    cursor.execute(
+        """
+        SELECT s.relname, a.attname
+        FROM pg_depend d
+        JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+        JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+        WHERE d.refobjid = %s::regclass AND d.deptype = 'a'
+        """,
+        (f'"{from_table}"',),
+    )
+    for seq_name, col_name in cursor.fetchall():
+        cursor.execute(f'ALTER SEQUENCE "{seq_name}" OWNED BY "{to_table}"."{col_name}"')
+
+
+def _has_dependents(cursor, table: str) -> bool:
+    """Vue ou clé étrangère qui référence la table (elle suivrait l'ancienne table et bloquerait son DROP)."""
+    cursor.execute(
+        """
+        SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE confrelid = %(t)s::regclass)
+            OR EXISTS (
+                SELECT 1 FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+                WHERE d.refobjid = %(t)s::regclass AND r.ev_class <> %(t)s::regclass
+            )
+        """,
+        {"t": f'"{table}"'},
+    )
+    return bool(cursor.fetchone()[0])
+
+
+_INDEXDEF_RE = re.compile(r"^(CREATE (?:UNIQUE )?INDEX )\S+( ON (?:ONLY )?)\S+( .*)$", re.S)
+
+
+def _index_definitions(cursor, table: str) -> List[Tuple[str, str, Optional[str]]]:
+    """(nom, définition de l'index, définition de la contrainte PK/UNIQUE associée ou None)."""
+    cursor.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(i.oid), pg_get_constraintdef(c.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        LEFT JOIN pg_constraint c ON c.conindid = x.indexrelid AND c.conrelid = x.indrelid
+        WHERE x.indrelid = %s::regclass
+        ORDER BY i.relname
+        """,
+        (f'"{table}"',),
+    )
+    return [(name, indexdef, constraintdef) for name, indexdef, constraintdef in cursor.fetchall()]
+
+
+def _build_indexes(cursor, shadow: str, definitions, prefix: str) -> List[Tuple[str, str, bool]]:
+    """
+    Recrée sur la table fantôme (déjà remplie) les index / contraintes de la table d'origine,
+    sous des noms temporaires. Retourne (nom temporaire, nom canonique, est une contrainte).
+    """
+    built = []
+    for i, (name, indexdef, constraintdef) in enumerate(definitions):
+        tmp = f"{prefix}_{i}"
+        if constraintdef:
+            cursor.execute(f'ALTER TABLE "{shadow}" ADD CONSTRAINT "{tmp}" {constraintdef}')
+        else:
+            match = _INDEXDEF_RE.match(indexdef)
+            if match is None:
+                raise ValueError(f"Définition d'index non reconnue : {indexdef}")
+            cursor.execute(f'{match.group(1)}"{tmp}"{match.group(2)}"{shadow}"{match.group(3)}')
+        built.append((tmp, name, bool(constraintdef)))
+    return built
+
+
+def _reload_in_place(dbapi_conn, cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """DELETE + COPY dans une seule transaction (lecteurs : ancien jeu jusqu'au commit)."""
+    cursor.execute(f'DELETE FROM "{table}"')
+    n = copy_rows(cursor, table, columns, rows)
+    dbapi_conn.commit()
+    return n
+
+
+def pg_swap_reload(dbapi_conn, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """
+    Rechargement complet sans fenêtre vide (PostgreSQL, connexion psycopg2 brute) :
+    1. COPY dans une table fantôme sans index (invisible pour les lecteurs), puis création des
+       index et contraintes PK/UNIQUE de la table d'origine (plus rapide qu'après chaque ligne),
+       ANALYZE, commit ;
+    2. courte transaction de bascule : renommages, DROP de l'ancienne table, puis index et
+       contraintes renommés sous leurs noms d'origine (ex. idx_pure_data_annee).
+    Les lecteurs voient l'ancien jeu complet puis le nouveau ; pas de DELETE, donc pas de tuples morts.
+    Verrou consultatif de transaction uniquement (compatible pooler Supabase en mode transaction) :
+    deux bascules simultanées de la même table sont sérialisées.
+    Si une vue ou une clé étrangère référence la table, elle suivrait l'ancienne table et
+    empêcherait son DROP : on recharge alors sur place (DELETE + COPY dans une transaction).
+    Note : les GRANT ne sont pas copiés par LIKE (l'application se connecte avec le propriétaire).
+    """
+    import uuid
+    suffix = uuid.uuid4().hex[:8]
+    shadow = f"{table}__shadow_{suffix}"
+    old = f"{table}__old"
+    cur = dbapi_conn.cursor()
+    try:
+        if _has_dependents(cur, table):
+            print(f"[BULK LOAD] {table}: vue ou clé étrangère dépendante, rechargement sur place")
+            return _reload_in_place(dbapi_conn, cur, table, columns, rows)
+
+        # 1. Chargement dans la table fantôme, index construits après le COPY
+        definitions = _index_definitions(cur, table)
+        cur.execute(f'CREATE TABLE "{shadow}" (LIKE "{table}" INCLUDING ALL EXCLUDING INDEXES)')
+        n = copy_rows(cur, shadow, columns, rows)
+        built = _build_indexes(cur, shadow, definitions, f"{table}__idx_{suffix}")
+        cur.execute(f'ANALYZE "{shadow}"')
+        dbapi_conn.commit()
+
+        # 2. Bascule atomique
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (table,))
+        cur.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+        cur.execute(f'ALTER TABLE "{shadow}" RENAME TO "{table}"')
+        _transfer_owned_sequences(cur, old, table)
+        cur.execute(f'DROP TABLE "{old}"')
+        for tmp, name, is_constraint in built:
+            if is_constraint:
+                cur.execute(f'ALTER TABLE "{table}" RENAME CONSTRAINT "{tmp}" TO "{name}"')
+            else:
+                cur.execute(f'ALTER INDEX "{tmp}" RENAME TO "{name}"')
+        dbapi_conn.commit()
+        return n
+    except Exception:
+        dbapi_conn.rollback()
+        try:
+            cur.execute(f'DROP TABLE IF EXISTS "{shadow}"')
+            dbapi_conn.commit()
+        except Exception:
+            dbapi_conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def swap_reload(
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    engine: Optional[Any] = None,
+) -> int:
+    """
+    Remplace tout le contenu de `table` de façon atomique pour les lecteurs.
+    PostgreSQL : table fantôme + renommage (pg_swap_reload).
+    SQLite : DELETE + INSERT dans une seule transaction (déjà atomique pour les lecteurs).
+    """
+    if engine is None:
+        from app.database import engine as _engine
+        engine = _engine
+    if engine.dialect.name != "postgresql":
+        return bulk_load(table, columns, rows, truncate=True, engine=engine)
+    raw = engine.raw_connection()
+    try:
+        return pg_swap_reload(raw, table, columns, rows)
+    finally:
+        raw.close()
@@ -0,0 +1,464 @@
+"""
+Instantanés en colonnes, projetés en mémoire (mmap), des imports RFA et Pure Data.
+
+Format d'un fichier (ordre natif des octets, blocs alignés sur 8 octets) :
+- en-tête : MAGIC (8 octets), longueur (uint32) puis JSON (identifiant, génération, colonnes avec
+  type et position de leur bloc) ;
+- dictionnaire de chaînes : positions (uint64, nombre + 1) puis textes UTF-8 concaténés, chaque
+  chaîne distincte une seule fois ;
+- un bloc par colonne : float64 (« f8 », NaN = None), int64 (« i8 », INT64_MIN = None) ou index
+  int32 dans le dictionnaire (« str », « json » pour les colonnes de types mixtes ; -1 = None) ;
+- agrégations by_client / by_group des imports RFA : JSON compressé (décodé seulement s'il le faut).
+
+Les lignes (ColumnarRows) restent dans le fichier projeté en lecture seule : les workers qui ouvrent
+le même fichier partagent ses pages (cache du système) au lieu d'en garder chacun une copie ; un dict
+n'est construit qu'à la lecture d'une ligne.
+
+SharedSnapshot publie sheets_live : fichier « <nom>.<génération>.col » écrit puis renommé, puis
+pointeur « <nom>.current » (génération, fichier, version source) remplacé de même. Un worker qui a
+déjà une génération rouvre le fichier du pointeur dès que sa génération change (refresh()) ; au
+démarrage, adopt() n'accepte le fichier que si sa version source (rfa_data) est toujours la bonne.
+"""
+from __future__ import annotations
+
+import glob
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from app.storage import ImportData, PureDataImport
+
+_LOG = logging.getLogger(__name__)
+
+MAGIC = b"RFACOLS1"
+COLUMNAR_FORMAT = 1
+_ALIGN = 8
+_INT_NULL = -(1 << 63)
+_NO_STRING = -1
+
+# type de colonne -> (code array / memoryview, taille d'un élément)
+_COLUMN_CODES = {"f8": ("d", 8), "i8": ("q", 8), "str": ("i", 4), "json": ("i", 4)}
+
+Snapshotable = Union[ImportData, PureDataImport]
+
+
+def _aligned(n: int) -> int:
+    return n + (-n % _ALIGN)
+
+
+def _column_type(values: List[Any]) -> str:
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds or kinds == {float}:
+        return "f8"
+    if kinds == {int}:
+        return "i8" if all(_INT_NULL < v < (1 << 63) for v in values if v is not None) else "json"
+    if kinds == {int, float}:
+        return "f8"
+    if kinds == {str}:
+        return "str"
+    return "json"
+
+
+# ── Écriture ──────────────────────────────────────────────────────────────────
+
+def encode_columnar(obj: Snapshotable, generation: int = 0) -> bytes:
+    """Fichier colonnes d'un ImportData (lignes + agrégations) ou d'un PureDataImport (lignes)."""
+    is_pure_data = isinstance(obj, PureDataImport)
+    rows = obj.rows if is_pure_data else obj.data
+    if not isinstance(rows, list):
+        rows = list(rows)  # lignes projetées : reconstruites une seule fois
+    names = list(dict.fromkeys(key for row in rows for key in row))
+
+    strings: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    column_blocks: List[Tuple[Dict[str, Any], bytes]] = []
+    for name in names:
+        values = [row.get(name) for row in rows]
+        ctype = _column_type(values)
+        if ctype == "f8":
+            block = array("d", (float("nan") if v is None else float(v) for v in values))
+        elif ctype == "i8":
+            block = array("q", (_INT_NULL if v is None else v for v in values))
+        elif ctype == "str":
+            block = array("i", (_NO_STRING if v is None else intern(v) for v in values))
+        else:
+            block = array("i", (
+                _NO_STRING if v is None else intern(json.dumps(v, ensure_ascii=False, default=str)) for v in values
+            ))
+        column_blocks.append(({"name": name, "type": ctype}, block.tobytes()))
+
+    texts = [s.encode("utf-8") for s in strings]
+    positions = array("Q", [0])
+    for text in texts:
+        positions.append(positions[-1] + len(text))
+
+    body = bytearray()
+
+    def add(raw: bytes) -> int:
+        offset = len(body)
+        body.extend(raw)
+        body.extend(b"\0" * (-len(raw) % _ALIGN))
+        return offset
+
+    string_meta = {"count": len(texts), "offset": add(positions.tobytes())}
+    string_meta["text_offset"] = add(b"".join(texts))
+    string_meta["text_length"] = int(positions[-1])
+    columns = []
+    for meta, raw in column_blocks:
+        meta["offset"] = add(raw)
+        columns.append(meta)
+    extra = None
+    if not is_pure_data and (obj.by_client or obj.by_group):
+        raw = zlib.compress(json.dumps(
+            {"by_client": obj.by_client, "by_group": obj.by_group}, ensure_ascii=False, default=str
+        ).encode("utf-8"), 6)
+        extra = {"offset": add(raw), "length": len(raw)}
+
+    header = json.dumps({
+        "format": COLUMNAR_FORMAT,
+        "kind": "pure_data" if is_pure_data else "rfa",
+        "byteorder": sys.byteorder,
+        "import_id": obj.import_id,
+        "generation": generation,
+        "created_at": obj.created_at.isoformat(),
+        "raw_columns": obj.raw_columns,
+        "column_mapping": obj.column_mapping,
+        "nb_rows": len(rows),
+        "strings": string_meta,
+        "columns": columns,
+        "extra": extra,
+    }, ensure_ascii=False, default=str).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    return prefix + b"\0" * (_aligned(len(prefix)) - len(prefix)) + bytes(body)
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Écrit data dans path via un fichier temporaire renommé (un lecteur ne voit jamais de fichier partiel)."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# ── Lecture ───────────────────────────────────────────────────────────────────
+
+class ColumnarSnapshot:
+    """Fichier colonnes projeté en lecture seule ; lève ValueError s'il est illisible."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if len(view) < len(MAGIC) + 4 or bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path}: pas un instantané colonnes")
+        (header_length,) = struct.unpack_from("<I", view, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(view[start:start + header_length]))
+        if header.get("format") != COLUMNAR_FORMAT or header.get("byteorder") != sys.byteorder:
+            raise ValueError(f"{path}: format {header.get('format')} / {header.get('byteorder')} non pris en charge")
+        self.header = header
+        self.nb_rows = header["nb_rows"]
+        self.generation = header["generation"]
+        base = _aligned(start + header_length)
+
+        meta = header["strings"]
+        count = meta["count"]
+        positions = view[base + meta["offset"]:base + meta["offset"] + 8 * (count + 1)].cast("Q")
+        text = view[base + meta["text_offset"]:base + meta["text_offset"] + meta["text_length"]]
+        if len(positions) != count + 1 or len(text) != meta["text_length"]:
+            raise ValueError(f"{path}: dictionnaire tronqué")
+        # Le dictionnaire (chaînes distinctes) est décodé une fois ; les colonnes restent projetées
+        self.strings = [str(text[positions[i]:positions[i + 1]], "utf-8") for i in range(count)]
+
+        self.columns: List[Tuple[str, Callable[[Any], Any], memoryview]] = []
+        for column in header["columns"]:
+            code, size = _COLUMN_CODES[column["type"]]
+            offset = base + column["offset"]
+            values = view[offset:offset + size * self.nb_rows].cast(code)
+            if len(values) != self.nb_rows:
+                raise ValueError(f"{path}: colonne {column['name']} tronquée")
+            self.columns.append((column["name"], self._decoder(column["type"]), values))
+
+        extra = header.get("extra")
+        self._extra = view[base + extra["offset"]:base + extra["offset"] + extra["length"]] if extra else None
+
+    def _decoder(self, ctype: str) -> Callable[[Any], Any]:
+        strings = self.strings
+        if ctype == "f8":
+            return lambda v: None if v != v else v
+        if ctype == "i8":
+            return lambda v: None if v == _INT_NULL else v
+        if ctype == "str":
+            return lambda i: None if i < 0 else strings[i]
+        return lambda i: None if i < 0 else json.loads(strings[i])
+
+    @property
+    def has_aggregations(self) -> bool:
+        return self._extra is not None
+
+    def aggregations(self) -> Tuple[Dict, Dict]:
+        if self._extra is None:
+            return {}, {}
+        payload = json.loads(zlib.decompress(self._extra))
+        return payload["by_client"], payload["by_group"]
+
+    def private_bytes(self) -> int:
+        """Mémoire propre au processus (dictionnaire de chaînes décodé) ; les colonnes sont partagées."""
+        return sys.getsizeof(self.strings) + sum(sys.getsizeof(s) for s in self.strings)
+
+
+class ColumnarRows(Sequence):
+    """Lignes d'un ColumnarSnapshot, reconstruites en dict à chaque lecture (liste en lecture seule)."""
+
+    def __init__(self, snapshot: ColumnarSnapshot):
+        self.snapshot = snapshot
+        self.generation = snapshot.generation
+
+    def __len__(self) -> int:
+        return self.snapshot.nb_rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("index de ligne hors limites")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        columns = self.snapshot.columns
+        if not columns:
+            for _ in range(len(self)):
+                yield {}
+            return
+        names = [name for name, _, _ in columns]
+        for values in zip(*(map(decode, values) for _, decode, values in columns)):
+            yield dict(zip(names, values))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(other) == len(self) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def _row(self, index: int) -> Dict[str, Any]:
+        return {name: decode(values[index]) for name, decode, values in self.snapshot.columns}
+
+    def private_bytes(self) -> int:
+        return self.snapshot.private_bytes()
+
+
+def is_mapped(rows: Any) -> bool:
+    return isinstance(rows, ColumnarRows)
+
+
+def open_columnar(path: str, aggregations: Optional[Tuple[Dict, Dict]] = None) -> Snapshotable:
+    """
+    ImportData / PureDataImport dont les lignes restent dans le fichier projeté. aggregations :
+    (by_client, by_group) déjà en mémoire, pour ne pas décoder ceux du fichier.
+    """
+    snapshot = ColumnarSnapshot(path)
+    header = snapshot.header
+    rows = ColumnarRows(snapshot)
+    if header["kind"] == "pure_data":
+        obj: Snapshotable = PureDataImport(header["import_id"], header["raw_columns"], header["column_mapping"], rows)
+    else:
+        obj = ImportData(header["import_id"], header["raw_columns"], header["column_mapping"], rows)
+        obj.by_client, obj.by_group = aggregations if aggregations is not None else snapshot.aggregations()
+    obj.created_at = datetime.fromisoformat(header["created_at"])
+    return obj
+
+
+# ── Publication entre workers ────────────────────────────────────────────────
+
+class SharedSnapshot:
+    """Dernière version publiée d'un import, partagée (mmap) par les workers d'une même machine."""
+
+    def __init__(self, name: str, directory: Optional[str] = None):
+        self.name = name
+        self._directory = directory
+        self._lock = threading.RLock()
+        self.generation: Optional[int] = None  # génération projetée par ce processus
+        self._published: Optional[Tuple[weakref.ref, ImportData]] = None  # (original, version projetée)
+        self._pointer_stamp: Optional[Tuple[int, int, int]] = None
+        self._pointer: Optional[Dict[str, Any]] = None
+        self.publications = 0
+        self.adoptions = 0
+        self.stale = 0
+        self.failures = 0
+
+    def _dir(self) -> str:
+        if self._directory is None:
+            from app.database import CACHE_DIR
+            self._directory = os.path.join(CACHE_DIR, "shared")
+        return self._directory
+
+    def _pointer_path(self) -> str:
+        return os.path.join(self._dir(), f"{self.name}.current")
+
+    def _read_pointer(self) -> Optional[Dict[str, Any]]:
+        """Pointeur courant (relu seulement si le fichier a changé)."""
+        path = self._pointer_path()
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if stamp != self._pointer_stamp:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._pointer = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._pointer_stamp = stamp
+        return self._pointer
+
+    def _write_pointer(self, generation: int, filename: str, source_version: Optional[str]) -> None:
+        pointer = {"generation": generation, "file": filename, "source_version": source_version}
+        write_atomic(self._pointer_path(), json.dumps(pointer).encode("utf-8"))
+
+    def publish(self, import_data: ImportData, source_version: Optional[str] = None) -> Optional[ImportData]:
+        """
+        Écrit import_data dans une nouvelle génération et retourne sa version projetée (None si
+        l'écriture échoue). Sans effet si import_data est déjà la génération courante, ou son
+        original : seule la version source est alors enregistrée si elle est fournie.
+        """
+        with self._lock:
+            current = self._current_for(import_data)
+            if current is not None:
+                if source_version is not None:
+                    self._stamp(current, source_version)
+                return current
+            generation = max(time.time_ns(), (self.generation or 0) + 1)
+            filename = f"{self.name}.{generation}.col"
+            path = os.path.join(self._dir(), filename)
+            try:
+                write_atomic(path, encode_columnar(import_data, generation))
+                mapped = open_columnar(path, (import_data.by_client, import_data.by_group))
+                self._write_pointer(generation, filename, source_version)
+            except (OSError, ValueError) as e:
+                self.failures += 1
+                _LOG.warning("Instantané partagé %s non publié: %s", self.name, e)
+                return None
+            previous = self.generation
+            self.generation = generation
+            self._published = (weakref.ref(import_data), mapped)
+            self.publications += 1
+            self._remove_old(keep={generation, previous})
+            print(f"[SNAPSHOT] {self.name}: génération {generation} publiée ({len(mapped.data)} lignes)")
+            return mapped
+
+    def _current_for(self, import_data: ImportData) -> Optional[ImportData]:
+        rows = import_data.data
+        if is_mapped(rows) and rows.generation == self.generation:
+            # Agrégations calculées après la publication : il faut une nouvelle génération
+            if import_data.by_client and not rows.snapshot.has_aggregations:
+                return None
+            return import_data
+        if self._published is not None and self._published[0]() is import_data:
+            mapped = self._published[1]
+            if mapped.data.generation == self.generation:
+                return mapped
+        return None
+
+    def _stamp(self, mapped: ImportData, source_version: str) -> None:
+        pointer = self._read_pointer()
+        if pointer and pointer.get("generation") == mapped.data.generation and pointer.get("source_version") != source_version:
+            try:
+                self._write_pointer(mapped.data.generation, pointer["file"], source_version)
+            except OSError as e:
+                _LOG.warning("Instantané partagé %s: pointeur non mis à jour: %s", self.name, e)
+
+    def refresh(self) -> Optional[ImportData]:
+        """Génération publiée par un autre worker si elle a changé depuis la nôtre (None sinon)."""
+        with self._lock:
+            if self.generation is None:
+                return None
+            pointer = self._read_pointer()
+            if not pointer or pointer.get("generation") == self.generation:
+                return None
+            return self._open(pointer)
+
+    def adopt(self, source_version: Optional[str] = None) -> Optional[ImportData]:
+        """Génération courante au démarrage, si elle correspond à source_version (quand elle est connue)."""
+        with self._lock:
+            pointer = self._read_pointer()
+            if not pointer:
+                return None
+            if source_version is not None and pointer.get("source_version") != source_version:
+                self.stale += 1
+                return None
+            if pointer.get("generation") == self.generation and self._published is not None:
+                return self._published[1]
+            return self._open(pointer)
+
+    def _open(self, pointer: Dict[str, Any]) -> Optional[ImportData]:
+        try:
+            mapped = open_columnar(os.path.join(self._dir(), pointer["file"]))
+        except (OSError, ValueError, KeyError, TypeError, zlib.error) as e:
+            self.failures += 1
+            _LOG.warning("Instantané partagé %s illisible: %s", self.name, e)
+            return None
+        self.generation = mapped.data.generation
+        self._published = None
+        self.adoptions += 1
+        return mapped
+
+    def _remove_old(self, keep: set) -> None:
+        """Supprime les anciennes générations (un worker qui les projette encore garde ses pages)."""
+        for path in glob.glob(os.path.join(self._dir(), f"{self.name}.*.col")):
+            try:
+                generation = int(os.path.basename(path).split(".")[-2])
+            except ValueError:
+                continue
+            if generation not in keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pointer = self._read_pointer()
+            return {
+                "name": self.name,
+                "generation": self.generation,
+                "published_generation": pointer.get("generation") if pointer else None,
+                "publications": self.publications,
+                "adoptions": self.adoptions,
+                "stale": self.stale,
+                "failures": self.failures,
+            }
+
+
+live_import_snapshot = SharedSnapshot("rfa_sheets_live")
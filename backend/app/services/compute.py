@@ -160,14 +160,120 @@ def get_entity_rfa_grand_total(
         return None
 
 
-def get_entity_detail_with_rfa(
-    import_data: ImportData, 
-    mode: str, 
+# ── Résultat RFA interne (dicts) ──────────────────────────────────────────────
+# Forme identique à EntityDetailWithRfa.model_dump(by_alias=True, mode="json") : consommée telle
+# quelle par Génie, PDF et exports ; le modèle Pydantic n'est construit qu'à la frontière HTTP.
+
+def _opt_float(v) -> Optional[float]:
+    return None if v is None else float(v)
+
+
+def _tier_dict(t: Dict) -> Dict:
+    """TierResult sérialisé."""
+    return {
+        "ca": float(t["ca"]),
+        "selected_min": _opt_float(t["selected_min"]),
+        "min_threshold": _opt_float(t["min_threshold"]),
+        "rate": float(t["rate"]),
+        "triggered": bool(t["triggered"]),
+        "value": float(t["value"]),
+        "has_override": t.get("has_override", False),
+    }
+
+
+def _global_item_dict(rfa_data: Dict) -> Dict:
+    """GlobalRfaItem sérialisé."""
+    return {
+        "label": rfa_data["label"],
+        "ca": float(rfa_data["ca"]),
+        "rfa": _tier_dict(rfa_data["rfa"]),
+        "bonus": _tier_dict(rfa_data["bonus"]),
+        "total": {k: float(v) for k, v in rfa_data["total"].items()},
+        "triggered": bool(rfa_data["triggered"]),
+        "has_override": rfa_data.get("has_override", False),
+    }
+
+
+def _tri_item_dict(tri_data: Dict) -> Dict:
+    """TriRfaItem sérialisé."""
+    return {
+        "label": tri_data["label"],
+        "ca": float(tri_data["ca"]),
+        "selected_min": _opt_float(tri_data["selected_min"]),
+        "min_threshold": _opt_float(tri_data.get("min_threshold")),
+        "rate": float(tri_data["rate"]),
+        "value": float(tri_data["value"]),
+        "triggered": bool(tri_data["triggered"]),
+        "has_override": tri_data.get("has_override", False),
+    }
+
+
+def _marketing_item_dict(m_data: Dict) -> Dict:
+    """MarketingItem sérialisé."""
+    return {
+        "label": m_data["label"],
+        "amount": float(m_data["amount"]),
+        "calculation_type": m_data["calculation_type"],
+        "rate": _opt_float(m_data.get("rate")),
+        "base_amount": _opt_float(m_data.get("base_amount")),
+    }
+
+
+def _rfa_dict(rfa_result: Dict, marketing: Optional[Dict] = None, bonus_groups: Optional[List[Dict]] = None) -> Dict:
+    """RfaResult sérialisé (clés par alias : global / tri / marketing)."""
+    return {
+        "global": {key: _global_item_dict(v) for key, v in rfa_result["global"].items()},
+        "tri": {key: _tri_item_dict(v) for key, v in rfa_result["tri"].items()},
+        "marketing": {key: _marketing_item_dict(v) for key, v in (marketing or {}).items()},
+        "totals": {k: float(v) for k, v in rfa_result["totals"].items()},
+        "bonus_groups": bonus_groups,
+    }
+
+
+def _entity_dict(
+    rfa: Dict,
+    ca: Dict,
+    contract_applied: Dict,
+    code_union: Optional[str] = None,
+    nom_client: Optional[str] = None,
+    groupe_client: Optional[str] = None,
+    nb_comptes: Optional[int] = None,
+    codes_union: Optional[List[str]] = None,
+) -> Dict:
+    """EntityDetailWithRfa sérialisé (mêmes clés, même ordre)."""
+    return {
+        "code_union": code_union,
+        "nom_client": nom_client,
+        "groupe_client": groupe_client,
+        "nb_comptes": nb_comptes,
+        "codes_union": list(codes_union) if codes_union is not None else None,
+        "ca": ca,
+        "rfa": rfa,
+        "contract_applied": contract_applied,
+    }
+
+
+def _ca_dict(data: Dict) -> Dict:
+    """CA de l'entité (copies : le résultat ne partage rien avec les agrégations de l'import)."""
+    return {
+        "global": dict(data["global"]),
+        "tri": dict(data["tri"]),
+        "totals": {
+            "global_total": data["global_total"],
+            "tri_total": data["tri_total"],
+            "grand_total": data["grand_total"]
+        }
+    }
+
+
+def build_entity_detail(
+    import_data: ImportData,
+    mode: str,
     entity_id: str,
     contract_id: Optional[int] = None
-) -> EntityDetailWithRfa:
+) -> Dict:
     """
-    Retourne le détail d'une entité (client ou groupe) avec calcul RFA.
+    Détail d'une entité (client ou groupe) avec calcul RFA, sous forme de dict.
     
     Args:
         import_data: Données de l'import
@@ -209,56 +315,13 @@ def get_entity_detail_with_rfa(
         # Calculer RFA avec le contrat ET les overrides du client
         rfa_result = calculate_rfa(recap_ca, contract=contract, code_union=entity_id)
         
-        # Convertir en schemas Pydantic
-        global_rfa_items = {}
-        for key, rfa_data in rfa_result["global"].items():
-            global_rfa_items[key] = GlobalRfaItem(
-                label=rfa_data["label"],
-                ca=rfa_data["ca"],
-                rfa=TierResult(**rfa_data["rfa"]),
-                bonus=TierResult(**rfa_data["bonus"]),
-                total=rfa_data["total"],
-                triggered=rfa_data["triggered"],
-                has_override=rfa_data.get("has_override", False)
-            )
-        
-        tri_rfa_items = {}
-        for key, tri_data in rfa_result["tri"].items():
-            tri_rfa_items[key] = TriRfaItem(
-                label=tri_data["label"],
-                ca=tri_data["ca"],
-                selected_min=tri_data["selected_min"],
-                min_threshold=tri_data.get("min_threshold"),
-                rate=tri_data["rate"],
-                value=tri_data["value"],
-                triggered=tri_data["triggered"],
-                has_override=tri_data.get("has_override", False)
-            )
-        
-        rfa_schema = RfaResult(
-            global_items=global_rfa_items,
-            tri_items=tri_rfa_items,
-            totals=rfa_result["totals"]
-        )
-        
-        return EntityDetailWithRfa(
+        return _entity_dict(
+            _rfa_dict(rfa_result),
+            _ca_dict(data),
+            {"id": contract.id, "name": contract.name},
             code_union=entity_id,
             nom_client=data.get("nom_client"),
             groupe_client=data.get("groupe_client"),
-            ca={
-                "global": data["global"],
-                "tri": data["tri"],
-                "totals": {
-                    "global_total": data["global_total"],
-                    "tri_total": data["tri_total"],
-                    "grand_total": data["grand_total"]
-                }
-            },
-            rfa=rfa_schema,
-            contract_applied={
-                "id": contract.id,
-                "name": contract.name
-            }
         )
     
     else:  # mode == "group"
@@ -290,59 +353,26 @@ def get_entity_detail_with_rfa(
         # Calculer RFA avec le contrat ET les overrides du groupe
         rfa_result = calculate_rfa(recap_ca, contract=contract, groupe_client=groupe_client)
         
-        # Convertir en schemas Pydantic
-        global_rfa_items = {}
-        for key, rfa_data in rfa_result["global"].items():
-            global_rfa_items[key] = GlobalRfaItem(
-                label=rfa_data["label"],
-                ca=rfa_data["ca"],
-                rfa=TierResult(**rfa_data["rfa"]),
-                bonus=TierResult(**rfa_data["bonus"]),
-                total=rfa_data["total"],
-                triggered=rfa_data["triggered"],
-                has_override=rfa_data.get("has_override", False)
-            )
-        
-        tri_rfa_items = {}
-        for key, tri_data in rfa_result["tri"].items():
-            tri_rfa_items[key] = TriRfaItem(
-                label=tri_data["label"],
-                ca=tri_data["ca"],
-                selected_min=tri_data["selected_min"],
-                min_threshold=tri_data.get("min_threshold"),
-                rate=tri_data["rate"],
-                value=tri_data["value"],
-                triggered=tri_data["triggered"],
-                has_override=tri_data.get("has_override", False)
-            )
-        
-        rfa_schema = RfaResult(
-            global_items=global_rfa_items,
-            tri_items=tri_rfa_items,
-            totals=rfa_result["totals"]
-        )
-        
-        return EntityDetailWithRfa(
+        return _entity_dict(
+            _rfa_dict(rfa_result),
+            _ca_dict(data),
+            {"id": contract.id, "name": contract.name},
             groupe_client=entity_id,
             nb_comptes=data["nb_comptes"],
             codes_union=data["codes_union"],
-            ca={
-                "global": data["global"],
-                "tri": data["tri"],
-                "totals": {
-                    "global_total": data["global_total"],
-                    "tri_total": data["tri_total"],
-                    "grand_total": data["grand_total"]
-                }
-            },
-            rfa=rfa_schema,
-            contract_applied={
-                "id": contract.id,
-                "name": contract.name
-            }
         )
 
 
+def get_entity_detail_with_rfa(
+    import_data: ImportData, 
+    mode: str, 
+    entity_id: str,
+    contract_id: Optional[int] = None
+) -> EntityDetailWithRfa:
+    """Détail d'une entité avec calcul RFA (modèle Pydantic, pour les réponses de l'API)."""
+    return EntityDetailWithRfa.model_validate(build_entity_detail(import_data, mode, entity_id, contract_id=contract_id))
+
+
 def get_global_recap_rfa(import_data: ImportData, dissolved_groups: Optional[set] = None) -> RecapGlobalRfa:
     """
     Calcule le récapitulatif global RFA sans double comptage.
@@ -649,9 +679,9 @@ def build_client_rfa_export_rows(import_data: ImportData, dissolved_groups: Opti
     }
 
 
-def get_union_detail_with_rfa(import_data: ImportData) -> EntityDetailWithRfa:
+def build_union_detail(import_data: ImportData) -> Dict:
     """
-    Calcule le détail Union (agrégation globale tous clients) avec calcul RFA.
+    Calcule le détail Union (agrégation globale tous clients) avec calcul RFA, sous forme de dict.
     Applique les contrats Union (scope="union") par fournisseur.
     """
     if len(import_data.by_client) == 0:
@@ -692,24 +722,22 @@ def get_union_detail_with_rfa(import_data: ImportData) -> EntityDetailWithRfa:
         # Pas de contrat Union configuré : retourner les données brutes sans RFA
         print("[UNION] ATTENTION : Aucun contrat Union actif trouve !")
         print("[UNION] Allez dans Contrats > Contrats Union (DAF) et importez les contrats fournisseurs")
-        return EntityDetailWithRfa(
-            groupe_client="GROUPEMENT UNION",
-            nb_comptes=len(import_data.by_client),
-            ca={
-                "global": aggregated_global,
-                "tri": aggregated_tri,
-                "totals": {
-                    "global_total": global_total,
-                    "tri_total": tri_total,
-                    "grand_total": grand_total
-                }
-            },
-            rfa={
+        return _entity_dict(
+            _rfa_dict({
                 "global": {},
                 "tri": {},
                 "totals": {"global_rfa": 0, "global_bonus": 0, "tri_total": 0, "grand_total": 0}
-            },
-            contract_applied={"id": 0, "name": "Aucun contrat configuré"}
+            }),
+            _ca_dict({
+                "global": aggregated_global,
+                "tri": aggregated_tri,
+                "global_total": global_total,
+                "tri_total": tri_total,
+                "grand_total": grand_total,
+            }),
+            {"id": 0, "name": "Aucun contrat configuré"},
+            groupe_client="GROUPEMENT UNION",
+            nb_comptes=len(import_data.by_client),
         )
     
     print(f"[UNION] {len(union_contracts)} contrat(s) Union trouve(s)")
@@ -726,86 +754,49 @@ def get_union_detail_with_rfa(import_data: ImportData) -> EntityDetailWithRfa:
     # Calculer RFA avec tous les contrats Union
     rfa_result = calculate_rfa_multi_contracts(recap_ca, contracts=union_contracts, ca_by_groupe=ca_by_groupe)
     
-    # Convertir en schemas Pydantic
-    global_rfa_items = {}
-    for key, rfa_data in rfa_result["global"].items():
-        global_rfa_items[key] = GlobalRfaItem(
-            label=rfa_data["label"],
-            ca=rfa_data["ca"],
-            rfa=TierResult(**rfa_data["rfa"]),
-            bonus=TierResult(**rfa_data["bonus"]),
-            total=rfa_data["total"],
-            triggered=rfa_data["triggered"],
-            has_override=rfa_data.get("has_override", False)
-        )
-    
-    tri_rfa_items = {}
-    for key, tri_data in rfa_result["tri"].items():
-        tri_rfa_items[key] = TriRfaItem(
-            label=tri_data["label"],
-            ca=tri_data["ca"],
-            selected_min=tri_data["selected_min"],
-            min_threshold=tri_data.get("min_threshold"),
-            rate=tri_data["rate"],
-            value=tri_data["value"],
-            triggered=tri_data["triggered"],
-            has_override=tri_data.get("has_override", False)
-        )
+    rfa = _rfa_dict(
+        rfa_result,
+        marketing=rfa_result.get("marketing", {}),
+        bonus_groups=rfa_result.get("bonus_groups", []),
+    )
     # Garantir que toutes les clés tri (dont ACR Machine tournante / Liaison au sol) sont présentes
     for key in get_tri_fields():
-        if key not in tri_rfa_items:
+        if key not in rfa["tri"]:
             _, default_label = get_field_by_key(key)
-            ca_val = aggregated_tri.get(key, 0.0)
-            tri_rfa_items[key] = TriRfaItem(
-                label=default_label,
-                ca=ca_val,
-                selected_min=None,
-                min_threshold=None,
-                rate=0.0,
-                value=0.0,
-                triggered=False,
-                has_override=False
-            )
-    
-    marketing_items = {}
-    for key, m_data in rfa_result.get("marketing", {}).items():
-        marketing_items[key] = MarketingItem(
-            label=m_data["label"],
-            amount=m_data["amount"],
-            calculation_type=m_data["calculation_type"],
-            rate=m_data.get("rate"),
-            base_amount=m_data.get("base_amount")
-        )
-
-    rfa_schema = RfaResult(
-        global_items=global_rfa_items,
-        tri_items=tri_rfa_items,
-        marketing_items=marketing_items,
-        totals=rfa_result["totals"],
-        bonus_groups=rfa_result.get("bonus_groups", [])
-    )
+            rfa["tri"][key] = _tri_item_dict({
+                "label": default_label,
+                "ca": aggregated_tri.get(key, 0.0),
+                "selected_min": None,
+                "min_threshold": None,
+                "rate": 0.0,
+                "value": 0.0,
+                "triggered": False,
+                "has_override": False,
+            })
     
     # Nom du contrat : liste des contrats actifs
     contract_names = [c.name for c in union_contracts]
     contract_name_display = ", ".join(contract_names) if len(contract_names) <= 3 else f"{len(contract_names)} contrats actifs"
     
-    return EntityDetailWithRfa(
-        groupe_client="GROUPEMENT UNION",
-        nb_comptes=len(import_data.by_client),
-        ca={
+    return _entity_dict(
+        rfa,
+        _ca_dict({
             "global": aggregated_global,
             "tri": aggregated_tri,
-            "totals": {
-                "global_total": global_total,
-                "tri_total": tri_total,
-                "grand_total": grand_total
-            }
-        },
-        rfa=rfa_schema,
-        contract_applied={
+            "global_total": global_total,
+            "tri_total": tri_total,
+            "grand_total": grand_total,
+        }),
+        {
             "id": union_contracts[0].id if union_contracts else 0,
             "ids": [c.id for c in union_contracts],
             "name": contract_name_display
-        }
+        },
+        groupe_client="GROUPEMENT UNION",
+        nb_comptes=len(import_data.by_client),
     )
 
+
+def get_union_detail_with_rfa(import_data: ImportData) -> EntityDetailWithRfa:
+    """Détail Union avec calcul RFA (modèle Pydantic, pour les réponses de l'API)."""
+    return EntityDetailWithRfa.model_validate(build_union_detail(import_data))
@@ -31,6 +31,10 @@ def resolve_contract(
     Returns:
         Contract applicable
     """
+    from app.services.rfa_context import current_context
+    ctx = current_context()
+    if ctx is not None:
+        return ctx.resolve_contract(code_union, groupe_client)
     with Session(engine) as session:
         # Résolution uniquement parmi les contrats ADHERENT (pas les contrats Union/DAF)
         # 1) Chercher assignment Code Union (priorité la plus haute = 100)
@@ -138,6 +142,15 @@ class BatchContractResolver:
                         self._default = c
                         break
 
+    @classmethod
+    def from_maps(cls, by_code_union: dict, by_groupe: dict, default: Optional[Contract]) -> "BatchContractResolver":
+        """Résolveur construit sans base (tables déjà chargées, ex. dans un processus du pool Génie)."""
+        resolver = cls.__new__(cls)
+        resolver._by_code_union = by_code_union
+        resolver._by_groupe = by_groupe
+        resolver._default = default
+        return resolver
+
     def resolve(self, code_union: Optional[str] = None, groupe_client: Optional[str] = None) -> Optional[Contract]:
         if code_union:
             c = self._by_code_union.get(normalize_value(code_union))
@@ -152,6 +165,10 @@ class BatchContractResolver:
 
 def get_contract_by_id(contract_id: int) -> Optional[Contract]:
     """Récupère un contrat par son ID."""
+    from app.services.rfa_context import current_context
+    ctx = current_context()
+    if ctx is not None:
+        return ctx.get_contract_by_id(contract_id)
     with Session(engine) as session:
         return session.get(Contract, contract_id)
 
@@ -0,0 +1,193 @@
+"""
+Cache disque adressé par contenu, borné en taille, éviction LRU.
+
+Chaque entrée = <sha256(clé)>.bin (contenu) + <sha256(clé)>.json (métadonnées libres).
+- écriture atomique (fichier temporaire + os.replace) : un lecteur ne voit jamais d'entrée partielle ;
+- LRU par date de modification : un accès « touche » l'entrée, l'éviction supprime les plus anciennes ;
+- épinglage (<sha256(clé)>.pin) : entrée jamais évincée, même par un autre processus, tant qu'elle
+  n'est pas désépinglée ou supprimée (seule copie hors mémoire d'un import, par ex.) ;
+- taille totale suivie en mémoire (scan du dossier au premier accès).
+
+Le dossier racine est CACHE_DIR (app.database) ; chaque usage a son sous-dossier.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+class DiskCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def _scan(self) -> int:
+        total = 0
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.is_file():
+                    total += entry.stat().st_size
+        except FileNotFoundError:
+            pass
+        return total
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """Retourne (contenu, métadonnées) ou None."""
+        base = self._path(key)
+        try:
+            with open(base + ".bin", "rb") as f:
+                data = f.read()
+            meta: Dict[str, Any] = {}
+            if os.path.exists(base + ".json"):
+                with open(base + ".json", encoding="utf-8") as f:
+                    meta = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(base + ".bin", None)
+        except OSError:
+            pass
+        self.hits += 1
+        return data, meta
+
+    def content_path(self, key: str) -> Optional[str]:
+        """Chemin du contenu d'une entrée (à ouvrir ou projeter soi-même), ou None ; compte comme un accès."""
+        path = self._path(key) + ".bin"
+        try:
+            os.utime(path, None)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key: str, data: bytes, meta: Optional[Dict[str, Any]] = None, pin: bool = False) -> None:
+        """Enregistre une entrée (ignorée si elle dépasse à elle seule la taille max), épinglée si pin."""
+        if len(data) > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        base = self._path(key)
+        with self._lock:
+            if pin:
+                open(base + ".pin", "wb").close()
+            if self._total is None:
+                self._total = self._scan()
+            previous = self._size_of(base)
+            meta_bytes = json.dumps(meta or {}, ensure_ascii=False).encode("utf-8")
+            self._atomic_write(base + ".json", meta_bytes)
+            self._atomic_write(base + ".bin", data)
+            self._total += len(data) + len(meta_bytes) - previous
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def pin(self, key: str) -> bool:
+        """Épingle une entrée existante ; False si elle est absente."""
+        base = self._path(key)
+        with self._lock:
+            if not os.path.exists(base + ".bin"):
+                return False
+            open(base + ".pin", "wb").close()
+            return True
+
+    def unpin(self, key: str) -> None:
+        try:
+            os.remove(self._path(key) + ".pin")
+        except OSError:
+            pass
+
+    def delete(self, key: str) -> None:
+        base = self._path(key)
+        with self._lock:
+            size = self._size_of(base)
+            for suffix in (".bin", ".json", ".pin"):
+                try:
+                    os.remove(base + suffix)
+                except OSError:
+                    pass
+            if self._total is not None:
+                self._total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            try:
+                for entry in os.scandir(self.directory):
+                    if entry.is_file():
+                        os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            self._total = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan()
+            try:
+                pinned = sum(1 for entry in os.scandir(self.directory) if entry.name.endswith(".pin"))
+            except FileNotFoundError:
+                pinned = 0
+            return {
+                "directory": self.directory,
+                "bytes": self._total,
+                "pinned": pinned,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    @staticmethod
+    def _size_of(base: str) -> int:
+        size = 0
+        for suffix in (".bin", ".json"):
+            try:
+                size += os.path.getsize(base + suffix)
+            except OSError:
+                pass
+        return size
+
+    def _atomic_write(self, path: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _evict(self) -> None:
+        """
+        Supprime les entrées non épinglées les moins récemment utilisées jusqu'à repasser sous la
+        limite (verrou tenu) ; les entrées épinglées peuvent la faire dépasser.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".bin") and not os.path.exists(entry.path[:-4] + ".pin"):
+                st = entry.stat()
+                entries.append((st.st_mtime, entry.path[:-4]))
+        entries.sort()
+        for _, base in entries:
+            if self._total <= self.max_bytes:
+                break
+            size = self._size_of(base)
+            for suffix in (".bin", ".json"):
+                try:
+                    os.remove(base + suffix)
+                except OSError:
+                    pass
+            self._total -= size
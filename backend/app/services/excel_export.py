@@ -0,0 +1,202 @@
+"""
+Exports Excel en streaming (openpyxl write_only).
+
+- Classeur write_only : les lignes sont sérialisées au fil de l'eau dans un fichier temporaire
+  d'openpyxl, la feuille n'est jamais entièrement en mémoire.
+- Styles nommés enregistrés une seule fois par classeur (au lieu d'un Font / PatternFill par cellule) :
+  chaque cellule ne porte qu'une référence vers le style.
+- stream() exécute la construction + la sauvegarde dans un thread et renvoie les octets du .xlsx
+  par morceaux (file bornée) : mémoire constante, premier octet envoyé dès la première entrée du ZIP.
+
+Utilisé par les exports Union, récapitulatif clients et plans d'achat Génie (api.py).
+"""
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+MONEY_FMT = '#,##0.00 "EUR"'
+PCT_FMT = "0.00%"
+INT_FMT = "#,##0"
+
+CHUNK_SIZE = 64 * 1024
+_QUEUE_MAX = 16
+
+_THIN = Side(style="thin")
+THIN_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+
+
+def solid_fill(color: str) -> PatternFill:
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+def style(
+    font: Optional[Font] = None,
+    fill: Optional[PatternFill] = None,
+    number_format: Optional[str] = None,
+    alignment: Optional[Alignment] = None,
+    border: bool = True,
+) -> Dict[str, Any]:
+    """Spécification d'un style nommé (bordure fine par défaut, comme les tableaux existants)."""
+    spec: Dict[str, Any] = {}
+    if font is not None:
+        spec["font"] = font
+    if fill is not None:
+        spec["fill"] = fill
+    if number_format is not None:
+        spec["number_format"] = number_format
+    if alignment is not None:
+        spec["alignment"] = alignment
+    if border:
+        spec["border"] = THIN_BORDER
+    return spec
+
+
+# Styles communs aux exports RFA (bleu 1F4E79)
+BASE_STYLES: Dict[str, Dict[str, Any]] = {
+    "title": style(font=Font(bold=True, size=14, color="1F4E79"), border=False),
+    "subtitle": style(font=Font(italic=True, color="808080"), border=False),
+    "header": style(
+        font=Font(bold=True, color="FFFFFF", size=11),
+        fill=solid_fill("1F4E79"),
+        alignment=Alignment(horizontal="center"),
+    ),
+    "text": style(),
+    "money": style(number_format=MONEY_FMT),
+    "pct": style(number_format=PCT_FMT),
+    "subtotal": style(font=Font(bold=True), fill=solid_fill("D6E4F0")),
+    "subtotal_money": style(font=Font(bold=True), fill=solid_fill("D6E4F0"), number_format=MONEY_FMT),
+}
+
+
+class _QueueSink:
+    """Flux d'écriture non « seekable » pour zipfile : regroupe les octets en morceaux poussés dans une file."""
+
+    def __init__(self, out: "queue.Queue", cancelled: threading.Event, chunk_size: int):
+        self._out = out
+        self._cancelled = cancelled
+        self._chunk_size = chunk_size
+        self._buf = bytearray()
+        self._pos = 0
+        self._aborted = False
+
+    def write(self, data) -> int:
+        if self._aborted:
+            # zipfile peut encore écrire à la finalisation (__del__) : octets ignorés
+            return len(data)
+        self._buf += data
+        self._pos += len(data)
+        if len(self._buf) >= self._chunk_size:
+            self._push(bytes(self._buf))
+            self._buf.clear()
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if self._buf:
+            self._push(bytes(self._buf))
+            self._buf.clear()
+
+    def _push(self, item: Any) -> None:
+        while True:
+            if self._cancelled.is_set():
+                self._aborted = True
+                raise RuntimeError("Export Excel interrompu (client déconnecté)")
+            try:
+                self._out.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+
+class StreamingWorkbook:
+    """Classeur write_only avec styles nommés ; cell()/append() produisent des WriteOnlyCell stylées."""
+
+    def __init__(self, styles: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.wb = Workbook(write_only=True)
+        for name, spec in {**BASE_STYLES, **(styles or {})}.items():
+            self.wb.add_named_style(NamedStyle(name=name, **spec))
+
+    def add_sheet(
+        self,
+        title: str,
+        widths: Sequence[float] = (),
+        merge: Optional[str] = None,
+    ):
+        """Crée une feuille ; largeurs et fusions doivent être posées avant la première ligne."""
+        ws = self.wb.create_sheet(title)
+        for i, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+        if merge:
+            ws.merged_cells.add(merge)
+        return ws
+
+    def cell(self, ws, value: Any, style_name: Optional[str] = None) -> WriteOnlyCell:
+        c = WriteOnlyCell(ws, value=value)
+        if style_name:
+            c.style = style_name
+        return c
+
+    def append(self, ws, values: Iterable[Any], styles: Any = None) -> None:
+        """
+        Ajoute une ligne. styles = nom de style unique, ou séquence (un nom par colonne, None = sans style).
+        """
+        values = list(values)
+        if styles is None or isinstance(styles, str):
+            styles = [styles] * len(values)
+        ws.append([self.cell(ws, v, s) for v, s in zip(values, styles)])
+
+    def blank(self, ws, count: int = 1) -> None:
+        for _ in range(count):
+            ws.append([])
+
+    def stream(self, build: Callable[["StreamingWorkbook"], None], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Générateur d'octets du .xlsx : build(self) puis sauvegarde, exécutés dans un thread dédié.
+        Si le consommateur s'arrête (déconnexion), le producteur est interrompu à la prochaine écriture.
+        """
+        out: "queue.Queue" = queue.Queue(maxsize=_QUEUE_MAX)
+        cancelled = threading.Event()
+        done = object()
+
+        def _produce():
+            sink = _QueueSink(out, cancelled, chunk_size)
+            try:
+                build(self)
+                self.wb.save(sink)
+                sink.close()
+                sink._push(done)
+            except BaseException as e:  # transmis au consommateur
+                if not cancelled.is_set():
+                    out.put(e)
+
+        worker = threading.Thread(target=_produce, name="excel-export", daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = out.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            worker.join(timeout=5)
+
+
+def xlsx_headers(filename: str) -> Dict[str, str]:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
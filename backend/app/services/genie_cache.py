@@ -0,0 +1,301 @@
+"""
+Cache des analyses Génie (résultat de genie_full_analysis).
+
+- Clé versionnée : import_id + empreinte des agrégats de l'import + version des contrats
+  (compteur AppSettings « genie_contracts_version », incrémenté à chaque modification de contrat,
+  règle, affectation ou override). Une analyse périmée n'est donc jamais servie, même par une
+  autre instance ou après un redémarrage.
+- Niveau mémoire : LRU bornée en octets (GENIE_CACHE_MB, taille = JSON de l'analyse).
+- Niveau persistant : une ligne AppSettings « genie_cache_<import_id> » par import, JSON compressé
+  (zlib + base64) avec la version en en-tête ; pas de limite à 1 Mo (plafond GENIE_PERSIST_MAX_MB, journalisé).
+- stats() : entrées, octets, hits / misses / évictions et taux de succès par niveau.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+_LOG = logging.getLogger(__name__)
+
+GENIE_CACHE_MB = float(os.environ.get("GENIE_CACHE_MB", "64"))
+GENIE_PERSIST_MAX_MB = float(os.environ.get("GENIE_PERSIST_MAX_MB", "16"))
+
+CONTRACTS_VERSION_KEY = "genie_contracts_version"
+PERSIST_KEY_PREFIX = "genie_cache_"
+_ENCODING = "zlib+base64"
+
+
+def _hit_rate(hits: int, misses: int) -> Optional[float]:
+    total = hits + misses
+    return round(hits / total, 4) if total else None
+
+
+class ByteLRU:
+    """LRU bornée par une taille totale en octets (taille de chaque entrée fournie à l'insertion)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any, size: int) -> None:
+        """Insère (ou remplace) une entrée ; ignorée si elle dépasse à elle seule la taille max."""
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def discard(self, predicate: Callable[[str], bool]) -> int:
+        """Retire les entrées dont la clé vérifie predicate ; retourne leur nombre."""
+        with self._lock:
+            keys = [k for k in self._entries if predicate(k)]
+            for k in keys:
+                self._remove(k)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": _hit_rate(self.hits, self.misses),
+            }
+
+
+# ── Versions ──────────────────────────────────────────────────────────────────
+
+def import_fingerprint(import_data) -> str:
+    """
+    Empreinte des agrégats par client (seule entrée de l'analyse Génie), mémorisée sur l'objet
+    tant que by_client n'est pas remplacé. Identique après un redémarrage si les données le sont.
+    """
+    by_client = import_data.by_client
+    memo = getattr(import_data, "_genie_fingerprint", None)
+    if memo and memo[0] is by_client:
+        return memo[1]
+    h = hashlib.sha1()
+    for code_union in sorted(by_client):
+        data = by_client[code_union]
+        h.update(json.dumps(
+            [code_union, data.get("nom_client"), data.get("groupe_client"), data.get("global"), data.get("tri")],
+            sort_keys=True, default=str,
+        ).encode("utf-8"))
+    digest = h.hexdigest()[:16]
+    import_data._genie_fingerprint = (by_client, digest)
+    return digest
+
+
+def contracts_version(session) -> str:
+    from sqlmodel import select
+    from app.models import AppSettings
+
+    row = session.exec(select(AppSettings).where(AppSettings.key == CONTRACTS_VERSION_KEY)).first()
+    return (row.value if row and row.value else "0")
+
+
+def bump_contracts_version(session) -> str:
+    """
+    Nouvelle version des contrats (les analyses Génie en cache deviennent inaccessibles).
+    Jeton aléatoire écrit en une seule requête : deux modifications simultanées donnent toujours
+    deux versions distinctes ; ligne absente : insertion, ou mise à jour si un autre appel l'a créée.
+    """
+    import uuid
+    from sqlalchemy import func, insert, update
+    from sqlalchemy.exc import IntegrityError
+    from app.models import AppSettings
+
+    version = uuid.uuid4().hex
+    stmt = (
+        update(AppSettings)
+        .where(AppSettings.key == CONTRACTS_VERSION_KEY)
+        .values(value=version, updated_at=func.now())
+    )
+    if not session.exec(stmt).rowcount:
+        try:
+            session.exec(insert(AppSettings).values(key=CONTRACTS_VERSION_KEY, value=version, updated_at=func.now()))
+            session.commit()
+            return version
+        except IntegrityError:
+            session.rollback()
+            session.exec(stmt)
+    session.commit()
+    return version
+
+
+def analysis_key(import_data, session) -> str:
+    """Clé « import_id:empreinte:version_contrats » (agrégats calculés au besoin)."""
+    if not import_data.by_client:
+        from app.services.compute import compute_aggregations
+        compute_aggregations(import_data)
+    import_id = getattr(import_data, "import_id", None) or ""
+    return f"{import_id}:{import_fingerprint(import_data)}:{contracts_version(session)}"
+
+
+# ── Encodage du niveau persistant ─────────────────────────────────────────────
+
+def encode_analysis(key: str, analysis: Dict) -> str:
+    raw = json.dumps(analysis, ensure_ascii=False, default=str).encode("utf-8")
+    data = base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+    return json.dumps({"version": key, "encoding": _ENCODING, "data": data})
+
+
+def decode_analysis(key: str, value: Optional[str]) -> Optional[Dict]:
+    """Analyse décodée si value est une entrée compressée de la même version, sinon None."""
+    if not value:
+        return None
+    try:
+        envelope = json.loads(value)
+        if envelope.get("encoding") != _ENCODING or envelope.get("version") != key:
+            return None
+        return json.loads(zlib.decompress(base64.b64decode(envelope["data"])))
+    except (ValueError, TypeError, KeyError, AttributeError, zlib.error):
+        return None
+
+
+class GenieCache:
+    """Niveau mémoire (ByteLRU) + niveau persistant (AppSettings), clés versionnées."""
+
+    def __init__(self, max_bytes: int, persist_max_bytes: int):
+        self.memory = ByteLRU(max_bytes)
+        self.persist_max_bytes = persist_max_bytes
+        self._lock = threading.Lock()
+        self.persist_hits = 0
+        self.persist_misses = 0
+        self.persist_writes = 0
+        self.persist_skipped = 0
+        self.persist_bytes_written = 0
+
+    def get_memory(self, key: str) -> Optional[Dict]:
+        return self.memory.get(key)
+
+    def put_memory(self, key: str, analysis: Dict, size: Optional[int] = None) -> None:
+        if size is None:
+            size = len(json.dumps(analysis, ensure_ascii=False, default=str).encode("utf-8"))
+        self.memory.put(key, analysis, size)
+
+    def get(self, key: str, session) -> Optional[Dict]:
+        """Mémoire puis AppSettings (remonté en mémoire en cas de succès)."""
+        analysis = self.memory.get(key)
+        if analysis is not None:
+            return analysis
+        from sqlmodel import select
+        from app.models import AppSettings
+
+        import_id = key.split(":", 1)[0]
+        try:
+            row = session.exec(select(AppSettings).where(AppSettings.key == PERSIST_KEY_PREFIX + import_id)).first()
+        except Exception as e:
+            session.rollback()
+            _LOG.warning("Génie: lecture du cache persistant impossible: %s", e)
+            row = None
+        analysis = decode_analysis(key, row.value if row else None)
+        with self._lock:
+            if analysis is None:
+                self.persist_misses += 1
+            else:
+                self.persist_hits += 1
+        if analysis is not None:
+            self.put_memory(key, analysis)
+        return analysis
+
+    def put(self, key: str, analysis: Dict, session) -> None:
+        """Mémoire + AppSettings (une ligne par import, remplacée à chaque nouvelle version)."""
+        self.put_memory(key, analysis)
+        from sqlmodel import select
+        from app.models import AppSettings
+
+        value = encode_analysis(key, analysis)
+        if len(value) > self.persist_max_bytes:
+            with self._lock:
+                self.persist_skipped += 1
+            _LOG.warning(
+                "Génie: analyse %s non persistée (%d octets compressés > %d)", key, len(value), self.persist_max_bytes
+            )
+            return
+        import_id = key.split(":", 1)[0]
+        try:
+            row = session.exec(select(AppSettings).where(AppSettings.key == PERSIST_KEY_PREFIX + import_id)).first()
+            if row:
+                row.value = value
+                row.updated_at = datetime.now()
+                session.add(row)
+            else:
+                session.add(AppSettings(key=PERSIST_KEY_PREFIX + import_id, value=value))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            _LOG.warning("Génie: écriture du cache persistant impossible: %s", e)
+            return
+        with self._lock:
+            self.persist_writes += 1
+            self.persist_bytes_written += len(value)
+
+    def discard_import(self, import_id: Optional[str] = None) -> int:
+        """Retire du niveau mémoire les analyses d'un import (ou toutes)."""
+        if import_id is None:
+            count = self.memory.stats()["entries"]
+            self.memory.clear()
+            return count
+        prefix = f"{import_id}:"
+        return self.memory.discard(lambda k: k.startswith(prefix))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            persistent = {
+                "hits": self.persist_hits,
+                "misses": self.persist_misses,
+                "hit_rate": _hit_rate(self.persist_hits, self.persist_misses),
+                "writes": self.persist_writes,
+                "skipped_too_large": self.persist_skipped,
+                "bytes_written": self.persist_bytes_written,
+                "max_bytes": self.persist_max_bytes,
+            }
+        return {"memory": self.memory.stats(), "persistent": persistent}
+
+
+genie_cache = GenieCache(
+    max_bytes=int(GENIE_CACHE_MB * 1024 * 1024),
+    persist_max_bytes=int(GENIE_PERSIST_MAX_MB * 1024 * 1024),
+)
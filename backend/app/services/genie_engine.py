@@ -4,23 +4,106 @@ Compare contrats ENTRANTS (Union ← fournisseurs) vs SORTANTS (Union → adhér
 Identifie marges, pertes et leviers à double effet.
 """
 import json
-from typing import Dict, List, Optional, Any
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 from app.core.fields import get_global_fields, get_tri_fields, get_field_by_key, TRI_TO_GLOBAL, GLOBAL_TO_TRIS, EXCLUDED_GROUPS
-from app.services.compute import compute_aggregations, get_entity_detail_with_rfa
+from app.services.compute import build_entity_detail, compute_aggregations
 from app.services.pdf_export import _parse_tiers, _get_tier_progress, _get_rate_for_threshold, _load_rules_map
+from app.services.genie_cache import genie_cache
+from app.services.genie_search import build_search_entries, search_index_for
 from app.storage import ImportData
 
+_LOG = logging.getLogger(__name__)
+
 # ── Cache module-level (survit entre les requêtes sur Railway/local) ──────────
-# Clé : import_id — Valeur : résultat de genie_full_analysis
-_full_analysis_cache: Dict[str, Dict] = {}
+# Résultats assemblés de genie_full_analysis : genie_cache (LRU bornée, clés versionnées
+# import + contrats, voir app.services.genie_cache).
+
+# Analyses par entité, réutilisées d'un calcul à l'autre :
+# import_id -> (version des contrats, {(mode, entity_id): analysis | None}) ; l'Union est rangée sous UNION_KEY.
+# Une modification de contrat / affectation / override dans ce processus ne retire que les entités
+# concernées et fait suivre la version ; toute autre différence de version (modification faite par un
+# autre processus) écarte toutes les parties de l'import.
+UNION_KEY = ("union", "UNION")
+_entity_cache: Dict[str, Tuple[str, Dict[Tuple[str, str], Optional[Dict]]]] = {}
+_cache_lock = threading.Lock()
+_cache_generation = 0  # incrémenté à chaque invalidation (un calcul en cours ne réécrit pas de parties périmées)
+
 
 def invalidate_genie_cache(import_id: str = None):
-    """Invalide le cache Génie pour un import donné (ou tout le cache)."""
-    global _full_analysis_cache
-    if import_id:
-        _full_analysis_cache.pop(import_id, None)
-    else:
-        _full_analysis_cache.clear()
+    """Invalide tout le cache Génie d'un import (données modifiées), ou de tous les imports."""
+    global _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        if import_id:
+            _entity_cache.pop(import_id, None)
+        else:
+            _entity_cache.clear()
+    genie_cache.discard_import(import_id)
+
+
+def _drop_entities(affected, versions: Optional[Tuple[str, str]] = None) -> int:
+    """
+    Retire les analyses d'entités pour lesquelles affected(key, analysis) est vrai ; retourne leur nombre.
+    versions = (avant, après) la modification : les parties calculées avec « avant » passent à « après »,
+    celles d'une autre version sont toutes retirées.
+    """
+    global _cache_generation
+    dropped = 0
+    with _cache_lock:
+        _cache_generation += 1
+        for import_id, (version, entities) in list(_entity_cache.items()):
+            if versions is not None and version != versions[0]:
+                dropped += len(entities)
+                del _entity_cache[import_id]
+            else:
+                stale = [key for key, analysis in entities.items() if analysis is None or affected(key, analysis)]
+                for key in stale:
+                    del entities[key]
+                dropped += len(stale)
+                if versions is not None:
+                    _entity_cache[import_id] = (versions[1], entities)
+            genie_cache.discard_import(import_id)
+    return dropped
+
+
+def invalidate_genie_entities(
+    target_type: str, target_value: str, versions: Optional[Tuple[str, str]] = None
+) -> int:
+    """
+    Affectation ou override modifié pour une cible (CODE_UNION / GROUPE_CLIENT).
+    Client : lui seul. Groupe : le groupe et ses clients (la résolution du contrat passe par le groupe).
+    """
+    target_type = getattr(target_type, "value", target_type)
+    value = (target_value or "").strip().upper()
+
+    def affected(key, analysis):
+        mode, entity_id = key
+        if mode == "union":
+            return False
+        if target_type == "CODE_UNION":
+            return mode == "client" and entity_id.strip().upper() == value
+        if mode == "group":
+            return entity_id.strip().upper() == value
+        return analysis.get("groupe_client") == value
+
+    return _drop_entities(affected, versions)
+
+
+def invalidate_genie_contract(
+    contract_id: Optional[int], resolution_changed: bool = False, versions: Optional[Tuple[str, str]] = None
+) -> int:
+    """
+    Contrat modifié. Règles seules : entités analysées avec ce contrat (+ Union).
+    resolution_changed (défaut, activation, périmètre, suppression) : toutes les entités.
+    """
+    if resolution_changed:
+        return _drop_entities(lambda key, analysis: True, versions)
+    return _drop_entities(
+        lambda key, analysis: key == UNION_KEY or analysis.get("contract_id") == contract_id, versions
+    )
 
 
 def _fmt(v: float) -> str:
@@ -172,135 +255,258 @@ def _rfa_for_ca_tri(ca: float, rule: Dict) -> float:
     return ca * (prog["rate"] or 0)
 
 
+# ── Analyse par entité en pool de processus ───────────────────────────────────
+# Unité de travail : (mode, entity_id, données agrégées de l'entité) — sérialisable.
+# Un seul pool pour le processus (GENIE_WORKERS processus, créé au premier besoin) ; chaque paquet
+# porte l'instantané du contexte en dictionnaires simples (RfaContext.to_payload, pré-sérialisé une
+# fois par analyse) et son empreinte : un processus ne le reconstruit que si l'empreinte change.
+GENIE_CHUNK_SIZE = int(os.environ.get("GENIE_CHUNK_SIZE", "32"))
+GENIE_WORKERS = int(os.environ.get("GENIE_WORKERS", "0")) or min(os.cpu_count() or 2, 4)
+
+EntityUnit = Tuple[str, str, Dict]
+AnalysisTask = Tuple[str, bytes, List[EntityUnit]]
+
+_analysis_pool = None
+_pool_lock = threading.Lock()
+_worker_context: Optional[Tuple[str, Any]] = None  # (empreinte, RfaContext) dans un processus du pool
+
+
+def _get_analysis_pool():
+    global _analysis_pool
+    with _pool_lock:
+        if _analysis_pool is None:
+            # spawn : un fork depuis le serveur (threads, verrous tenus) peut bloquer le processus enfant ;
+            # le contexte arrive avec chaque paquet, rien n'est hérité du parent
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            _analysis_pool = ProcessPoolExecutor(
+                max_workers=GENIE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _analysis_pool
+
+
+def _discard_analysis_pool(pool) -> None:
+    """Pool cassé (processus tué) : recréé au prochain appel."""
+    global _analysis_pool
+    with _pool_lock:
+        if _analysis_pool is pool:
+            _analysis_pool = None
+    pool.shutdown(wait=False)
+
+
+def _analyze_unit(unit: EntityUnit) -> Optional[Dict]:
+    """Détail RFA + analyse d'une entité ; None si l'entité est en erreur (ignorée, comme avant)."""
+    mode, entity_id, entity_data = unit
+    scratch = ImportData(None, [], {}, [])
+    if mode == "client":
+        scratch.by_client[entity_id] = entity_data
+    else:
+        scratch.by_group[entity_id] = entity_data
+    try:
+        entity_dict = build_entity_detail(scratch, mode, entity_id)
+        analysis = _analyze_entity(entity_dict, mode, entity_id)
+    except Exception:
+        return None
+    # Dépendances de l'analyse, pour l'invalidation ciblée du cache par entité
+    analysis["contract_id"] = (entity_dict.get("contract_applied") or {}).get("id")
+    analysis["groupe_client"] = (entity_data.get("groupe_client") or "").strip().upper() or None
+    return analysis
+
+
+def _analyze_chunk(task: AnalysisTask) -> List[Optional[Dict]]:
+    """Exécuté dans un processus du pool, sous le contexte du paquet (reconstruit si nouveau)."""
+    global _worker_context
+    token, payload, units = task
+    if _worker_context is None or _worker_context[0] != token:
+        import pickle
+        from app.services.rfa_context import RfaContext
+        _worker_context = (token, RfaContext.from_payload(pickle.loads(payload)))
+    with _worker_context[1].activate():
+        return [_analyze_unit(unit) for unit in units]
+
+
+def analyze_entities(ctx, units: Sequence[EntityUnit], max_workers: Optional[int] = None) -> List[Optional[Dict]]:
+    """
+    Analyse une liste d'entités ; résultats dans l'ordre de units (fusion déterministe).
+    Paquets de GENIE_CHUNK_SIZE entités répartis sur le pool partagé (GENIE_WORKERS processus) ;
+    repli séquentiel si un seul paquet, si max_workers == 1 ou si le multiprocessing est
+    indisponible (ex. serverless).
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    units = list(units)
+    chunk_size = max(1, GENIE_CHUNK_SIZE)
+    chunks = [units[i:i + chunk_size] for i in range(0, len(units), chunk_size)]
+    workers = min(max_workers or GENIE_WORKERS, len(chunks))
+    if workers > 1:
+        import hashlib
+        import pickle
+        pool = None
+        try:
+            payload = pickle.dumps(ctx.to_payload(), protocol=pickle.HIGHEST_PROTOCOL)
+            token = hashlib.sha1(payload).hexdigest()
+            pool = _get_analysis_pool()
+            tasks = [(token, payload, chunk) for chunk in chunks]
+            return [analysis for chunk in pool.map(_analyze_chunk, tasks) for analysis in chunk]
+        except BrokenProcessPool as e:
+            _LOG.warning("Génie: pool de processus interrompu (%s), analyse séquentielle", e)
+            if pool is not None:
+                _discard_analysis_pool(pool)
+        except (OSError, NotImplementedError, ImportError) as e:
+            _LOG.warning("Génie: pool de processus indisponible (%s), analyse séquentielle", e)
+    with ctx.activate():
+        return [_analyze_unit(unit) for unit in units]
+
+
+def _analyze_union(ctx, import_data: ImportData) -> Dict:
+    """Analyse Union (contrats entrants : ce que Union reçoit)."""
+    try:
+        from app.services.compute import build_union_detail
+        with ctx.activate():
+            union_dict = build_union_detail(import_data)
+            return _analyze_entity(union_dict, "client", "UNION", is_union=True)
+    except Exception:
+        return {"global_rows": [], "tri_rows": [], "rfa_by_key": {}}
+
+
 def genie_full_analysis(import_data: ImportData) -> Dict:
     """
     Analyse complète : compare ENTRANT (Union reçoit des fournisseurs) vs SORTANT (Union paie aux adhérents).
-    Utilise BatchContractResolver pour charger tous les contrats en 3 requêtes (au lieu de N×3).
-    Le résultat est mis en cache en mémoire (Railway/local) — premier appel lent, suivants instantanés.
+    Contrats, règles et overrides sont chargés une fois (RfaContext) ; l'analyse par entité est
+    répartie par paquets sur un pool de processus (voir analyze_entities).
+    Les analyses par entité sont conservées (_entity_cache) : après une invalidation ciblée,
+    seules les entités retirées sont recalculées avant ré-assemblage des sections globales.
     """
-    # ── Vérification cache ────────────────────────────────────────────────────
-    cache_key = getattr(import_data, "import_id", None)
-    if cache_key and cache_key in _full_analysis_cache:
-        return _full_analysis_cache[cache_key]
-
     if len(import_data.by_client) == 0:
         compute_aggregations(import_data)
 
-    # Sur Vercel (VERCEL=1), limite aux top N clients par CA pour tenir dans le timeout
-    import os as _os
-    _max_clients = int(_os.environ.get("GENIE_MAX_CLIENTS", "225"))
-    if _os.environ.get("VERCEL") == "1":
-        _max_clients = 30
-
-    # Pré-charge tous les contrats et assignments en 3 requêtes pour éviter le N+1
-    from app.services.contract_resolver import BatchContractResolver
-    _batch_resolver = BatchContractResolver()
+    # ── Vérification cache (clé versionnée : import + contrats) ───────────────
+    cache_key = getattr(import_data, "import_id", None)
+    version_key = _analysis_version_key(import_data) if cache_key else None
+    if version_key:
+        cached = genie_cache.get_memory(version_key)
+        if cached is not None:
+            return cached
+
+    # Tous les adhérents sont analysés (GENIE_MAX_CLIENTS > 0 pour limiter aux top N par CA).
+    # Sur Vercel (VERCEL=1), pas de pool de processus : top 30 pour tenir dans le timeout
+    max_clients = int(os.environ.get("GENIE_MAX_CLIENTS", "0"))
+    if os.environ.get("VERCEL") == "1":
+        max_clients = 30
+
+    # Tri par CA décroissant
+    sorted_clients = sorted(
+        import_data.by_client.keys(),
+        key=lambda cu: import_data.by_client[cu].get("grand_total", 0),
+        reverse=True
+    )
+    if max_clients > 0:
+        sorted_clients = sorted_clients[:max_clients]
 
-    # Monkey-patch temporaire de resolve_contract pour cette analyse
-    import app.services.rfa_calculator as _calc_mod
-    import app.services.contract_resolver as _resolver_mod
-    _orig_resolve = _resolver_mod.resolve_contract
-    _resolver_mod.resolve_contract = lambda code_union=None, groupe_client=None: _batch_resolver.resolve(code_union, groupe_client)
-    _calc_mod.resolve_contract = _resolver_mod.resolve_contract
+    # Groupes : ignorer ceux d'un seul client (= le client individuel) et les groupes fictifs
+    analysed_groups = [
+        groupe_name for groupe_name, group_data in import_data.by_group.items()
+        if group_data.get("nb_comptes", 1) > 1 and groupe_name.strip().upper() not in EXCLUDED_GROUPS
+    ]
 
     # =====================================================================
-    # 1) Analyser chaque ADHÉRENT (contrats sortants : ce que Union paie)
+    # 1) + 1b) + 2) Analyse de chaque ADHÉRENT, de chaque GROUPE (contrats sortants) et de
+    #          l'UNION (contrats entrants) — seulement celles absentes du cache par entité
     # =====================================================================
-    # Cache des règles contrat par (contract_id, mode) pour éviter N requêtes identiques
-    _rules_cache: Dict[tuple, Dict] = {}
-    _orig_load_rules_map = None
+    units = [("client", cu, import_data.by_client[cu]) for cu in sorted_clients]
+    units += [("group", g, import_data.by_group[g]) for g in analysed_groups]
+
+    # Parties réutilisables seulement si calculées avec la version courante des contrats
+    contracts_ver = version_key.rsplit(":", 1)[1] if version_key else None
+    with _cache_lock:
+        generation = _cache_generation
+        entry = _entity_cache.get(cache_key) if contracts_ver else None
+        parts = dict(entry[1]) if entry and entry[0] == contracts_ver else {}
+    missing = [unit for unit in units if (unit[0], unit[1]) not in parts]
+    fresh: Dict[Tuple[str, str], Optional[Dict]] = {}
+    if missing or UNION_KEY not in parts:
+        # Instantané contrats / règles / overrides : chargé une fois, transmis aux processus du pool
+        from app.services.rfa_context import RfaContext
+        ctx = RfaContext()
+        for unit, analysis in zip(missing, analyze_entities(ctx, missing)):
+            fresh[(unit[0], unit[1])] = analysis
+        if UNION_KEY not in parts:
+            fresh[UNION_KEY] = _analyze_union(ctx, import_data)
+        if parts:
+            print(f"[GENIE] {len(missing)}/{len(units)} entité(s) recalculée(s) (cache par entité)")
+    parts.update(fresh)
+
+    result = _assemble_analysis(import_data, units, parts)
+
+    if cache_key:
+        with _cache_lock:
+            current = generation == _cache_generation
+            if current and contracts_ver:
+                entry = _entity_cache.get(cache_key)
+                if entry and entry[0] == contracts_ver:
+                    entry[1].update(fresh)
+                else:
+                    _entity_cache[cache_key] = (contracts_ver, parts)
+        if current and version_key:
+            genie_cache.put_memory(version_key, result)
+    return result
+
+
+def _analysis_version_key(import_data: ImportData) -> Optional[str]:
+    """Clé versionnée de l'analyse (None si la version des contrats est illisible : pas de cache)."""
+    from sqlmodel import Session
+    from app.database import engine
+    from app.services.genie_cache import analysis_key
     try:
-        import app.services.pdf_export as _pe_mod
-        _orig_load_rules_map = _pe_mod._load_rules_map
-        def _cached_load_rules_map(contract_id, mode, entity_id):
-            k = (contract_id, mode)
-            if k not in _rules_cache:
-                _rules_cache[k] = _orig_load_rules_map(contract_id, mode, entity_id)
-            return _rules_cache[k]
-        _pe_mod._load_rules_map = _cached_load_rules_map
-    except Exception:
-        pass
+        with Session(engine) as session:
+            return analysis_key(import_data, session)
+    except Exception as e:
+        _LOG.warning("Génie: version des contrats illisible (%s), analyse non mise en cache", e)
+        return None
+
 
+def _assemble_analysis(import_data: ImportData, units: Sequence[EntityUnit], parts: Dict) -> Dict:
+    """Sections globales (balance, opportunités, cascade, plans…) à partir des analyses par entité."""
     all_near = []
     all_achieved = []
     client_rfa_by_key = {}  # key -> total RFA payée à tous les adhérents
     client_details = {}  # code_union -> analysis
-
-    # Tri par CA décroissant — top N clients sur Vercel, tous en local
-    _sorted_clients = sorted(
-        import_data.by_client.keys(),
-        key=lambda cu: import_data.by_client[cu].get("grand_total", 0),
-        reverse=True
-    )[:_max_clients]
-
-    for code_union in _sorted_clients:
-        try:
-            detail = get_entity_detail_with_rfa(import_data, "client", code_union)
-            entity_dict = detail.model_dump(by_alias=True, mode="json")
-            analysis = _analyze_entity(entity_dict, "client", code_union)
-            nom = import_data.by_client[code_union].get("nom_client", code_union)
-            client_details[code_union] = analysis
-
-            # Agréger les RFA sortantes par key
-            for key, rfa_val in analysis["rfa_by_key"].items():
-                client_rfa_by_key[key] = client_rfa_by_key.get(key, 0) + rfa_val
-
-            for row in analysis["global_rows"] + analysis["tri_rows"]:
-                entry = {
-                    **row,
-                    "entity_id": code_union,
-                    "entity_label": f"{code_union} - {nom}" if nom else code_union,
-                    "entity_type": "client",
-                }
-                if row.get("near"):
-                    all_near.append(entry)
-                if row.get("achieved"):
-                    all_achieved.append(entry)
-        except Exception:
-            continue
-
-    # =====================================================================
-    # 1b) Analyser chaque GROUPE (les RFA sont souvent calculées au niveau groupe)
-    # =====================================================================
     group_details = {}  # groupe -> analysis
     group_rfa_by_key = {}  # key -> total RFA groupes (pour comparaison sortant)
 
-    for groupe_name in list(import_data.by_group.keys()):
-        group_data = import_data.by_group[groupe_name]
-        # Ignorer les groupes avec un seul client (= le client individuel)
-        if group_data.get("nb_comptes", 1) <= 1:
+    # Fusion dans l'ordre des unités : résultat identique au parcours séquentiel
+    for mode, entity_id, entity_data in units:
+        analysis = parts.get((mode, entity_id))
+        if analysis is None:
             continue
-        # Ignorer les groupes fictifs (pas de consolidation)
-        if groupe_name.strip().upper() in EXCLUDED_GROUPS:
-            continue
-        try:
-            detail = get_entity_detail_with_rfa(import_data, "group", groupe_name)
-            entity_dict = detail.model_dump(by_alias=True, mode="json")
-            analysis = _analyze_entity(entity_dict, "group", groupe_name)
-            group_details[groupe_name] = analysis
-            codes = group_data.get("codes_union", [])
-            nb = group_data.get("nb_comptes", len(codes))
-            elabel = f"{groupe_name} ({nb} clients)"
-
-            # Agréger les RFA sortantes par key (pour les groupes)
+        if mode == "client":
+            nom = entity_data.get("nom_client", entity_id)
+            client_details[entity_id] = analysis
+            extra = {
+                "entity_label": f"{entity_id} - {nom}" if nom else entity_id,
+                "entity_type": "client",
+            }
+            for key, rfa_val in analysis["rfa_by_key"].items():
+                client_rfa_by_key[key] = client_rfa_by_key.get(key, 0) + rfa_val
+        else:
+            group_details[entity_id] = analysis
+            codes = entity_data.get("codes_union", [])
+            nb = entity_data.get("nb_comptes", len(codes))
+            extra = {
+                "entity_label": f"{entity_id} ({nb} clients)",
+                "entity_type": "group",
+                "codes_union": codes,
+                "nb_comptes": nb,
+            }
             for key, rfa_val in analysis["rfa_by_key"].items():
                 group_rfa_by_key[key] = group_rfa_by_key.get(key, 0) + rfa_val
 
-            for row in analysis["global_rows"] + analysis["tri_rows"]:
-                entry = {
-                    **row,
-                    "entity_id": groupe_name,
-                    "entity_label": elabel,
-                    "entity_type": "group",
-                    "codes_union": codes,
-                    "nb_comptes": nb,
-                }
-                if row.get("near"):
-                    all_near.append(entry)
-                if row.get("achieved"):
-                    all_achieved.append(entry)
-        except Exception:
-            continue
+        for row in analysis["global_rows"] + analysis["tri_rows"]:
+            entry = {**row, "entity_id": entity_id, **extra}
+            if row.get("near"):
+                all_near.append(entry)
+            if row.get("achieved"):
+                all_achieved.append(entry)
 
     # Utiliser la RFA sortante la plus haute entre clients individuels et groupes
     # (les groupes incluent leurs clients, donc on ne double-compte pas)
@@ -330,24 +536,15 @@ def genie_full_analysis(import_data: ImportData) -> Dict:
     # =====================================================================
     union_near = []
     union_achieved = []
-    union_rfa_by_key = {}  # key -> RFA reçue par Union du fournisseur
-    union_analysis = {"global_rows": [], "tri_rows": [], "rfa_by_key": {}}
+    union_analysis = parts.get(UNION_KEY) or {"global_rows": [], "tri_rows": [], "rfa_by_key": {}}
+    union_rfa_by_key = union_analysis.get("rfa_by_key", {})  # key -> RFA reçue par Union du fournisseur
 
-    try:
-        from app.services.compute import get_union_detail_with_rfa
-        union_detail = get_union_detail_with_rfa(import_data)
-        union_dict = union_detail.model_dump(by_alias=True, mode="json")
-        union_analysis = _analyze_entity(union_dict, "client", "UNION", is_union=True)
-        union_rfa_by_key = union_analysis.get("rfa_by_key", {})
-
-        for row in union_analysis["global_rows"] + union_analysis["tri_rows"]:
-            entry = {**row, "entity_id": "UNION", "entity_label": "Groupement Union", "entity_type": "union"}
-            if row.get("near"):
-                union_near.append(entry)
-            if row.get("achieved"):
-                union_achieved.append(entry)
-    except Exception:
-        pass
+    for row in union_analysis["global_rows"] + union_analysis["tri_rows"]:
+        entry = {**row, "entity_id": "UNION", "entity_label": "Groupement Union", "entity_type": "union"}
+        if row.get("near"):
+            union_near.append(entry)
+        if row.get("achieved"):
+            union_achieved.append(entry)
 
     # =====================================================================
     # 3) COMPARER ENTRANT vs SORTANT par key → marge ou perte
@@ -737,65 +934,6 @@ def genie_full_analysis(import_data: ImportData) -> Dict:
     smart_plans.sort(key=lambda x: (-x["tiers_with_bonus"], -x["tiers_unlocked"], x["total_with_bonus"]))
 
     # Restaure les fonctions originales
-    _resolver_mod.resolve_contract = _orig_resolve
-    _calc_mod.resolve_contract = _orig_resolve
-    if _orig_load_rules_map:
-        try:
-            _pe_mod._load_rules_map = _orig_load_rules_map
-        except Exception:
-            pass
-
-    return {
-        "summary": {
-            "total_clients": len(import_data.by_client),
-            "total_near": len(all_near),
-            "total_achieved": len(all_achieved),
-            "total_gain_potential": sum(e.get("projected_gain") or 0 for e in all_near),
-            "union_near_count": len(union_near),
-            "total_entrant": total_entrant,
-            "total_sortant": total_sortant,
-            "total_margin": total_margin,
-            "nb_losses": len(losses),
-            "nb_gains": len(gains),
-        },
-        "balance": balance_sorted,
-        "alerts": alerts[:15],
-        "top_gains": top_gains,
-        "near_by_objective": near_by_key_sorted,
-        "union_opportunities": union_opportunities,
-        "union_near": union_near,
-        "union_achieved": union_achieved,
-        "cascade": cascade_opportunities,
-        "smart_plans": smart_plans,
-    }
-
-    # ── Mise en cache (Railway/local : survit entre requêtes) ─────────────────
-    if cache_key:
-        _full_analysis_cache[cache_key] = {
-            "summary": {
-                "total_clients": len(import_data.by_client),
-                "total_near": len(all_near),
-                "total_achieved": len(all_achieved),
-                "total_gain_potential": sum(e.get("projected_gain") or 0 for e in all_near),
-                "union_near_count": len(union_near),
-                "total_entrant": total_entrant,
-                "total_sortant": total_sortant,
-                "total_margin": total_margin,
-                "nb_losses": len(losses),
-                "nb_gains": len(gains),
-            },
-            "balance": balance_sorted,
-            "alerts": alerts[:15],
-            "top_gains": top_gains,
-            "near_by_objective": near_by_key_sorted,
-            "union_opportunities": union_opportunities,
-            "union_near": union_near,
-            "union_achieved": union_achieved,
-            "cascade": cascade_opportunities,
-            "smart_plans": smart_plans,
-        }
-        return _full_analysis_cache[cache_key]
-
     return {
         "summary": {
             "total_clients": len(import_data.by_client),
@@ -818,6 +956,8 @@ def genie_full_analysis(import_data: ImportData) -> Dict:
         "union_achieved": union_achieved,
         "cascade": cascade_opportunities,
         "smart_plans": smart_plans,
+        # Entrées de l'index de recherche (search_adherent, entity_profile, smart_plan)
+        "search_index": build_search_entries(import_data),
     }
 
 
@@ -1017,15 +1157,14 @@ def _dispatch_query(analysis: Dict, query_type: str, params: Dict, import_data=N
         search = (params.get("search") or "").upper()
         if not search:
             return {"type": "error", "message": "Précisez un nom ou code."}
-        found = []
-        for entry in analysis["top_gains"]:
-            if search in entry.get("entity_id", "").upper() or search in entry.get("entity_label", "").upper():
-                found.append(entry)
+        index = search_index_for(analysis, import_data)
+        found = index.filter_rows("top_gains", lambda: analysis["top_gains"], search)
         if not found:
-            for obj in analysis["near_by_objective"]:
-                for e in obj["entries"]:
-                    if search in e.get("entity_id", "").upper() or search in e.get("entity_label", "").upper():
-                        found.append(e)
+            found = index.filter_rows(
+                "near_by_objective",
+                lambda: (e for obj in analysis["near_by_objective"] for e in obj["entries"]),
+                search,
+            )
         if not found:
             return {"type": "search_result", "message": f"Aucun objectif proche pour **{search}**.", "data": []}
         lines = []
@@ -1038,67 +1177,27 @@ def _dispatch_query(analysis: Dict, query_type: str, params: Dict, import_data=N
         search = (params.get("search") or "").strip()
         if not search:
             return {"type": "error", "message": "Précisez un nom ou code Union pour l'adhérent."}
-        search_upper = search.upper()
-        entity_id = None
-        entity_label = None
-        mode = None
-        # 1) Exact match code_union
-        if search_upper in import_data.by_client:
-            entity_id = search_upper
-            data = import_data.by_client[entity_id]
-            nom = data.get("nom_client", entity_id)
-            entity_label = f"{entity_id} - {nom}" if nom else entity_id
-            mode = "client"
-        # 2) Exact match groupe (hors exclus)
-        if entity_id is None:
-            for groupe_name in import_data.by_group:
-                if groupe_name.strip().upper() in EXCLUDED_GROUPS:
-                    continue
-                if groupe_name.strip().upper() == search_upper:
-                    entity_id = groupe_name
-                    group_data = import_data.by_group[entity_id]
-                    nb = group_data.get("nb_comptes", 0)
-                    entity_label = f"{entity_id} ({nb} clients)"
-                    mode = "group"
-                    break
-        # 3) Partial: code_union ou nom_client
-        if entity_id is None:
-            for code_union, data in import_data.by_client.items():
-                nom = (data.get("nom_client") or "").upper()
-                if search_upper in code_union.upper() or search_upper in nom:
-                    entity_id = code_union
-                    nom_d = data.get("nom_client", code_union)
-                    entity_label = f"{code_union} - {nom_d}" if nom_d else code_union
-                    mode = "client"
-                    break
-        # 4) Partial: groupe
-        if entity_id is None:
-            for groupe_name in import_data.by_group:
-                if groupe_name.strip().upper() in EXCLUDED_GROUPS:
-                    continue
-                if search_upper in groupe_name.upper():
-                    entity_id = groupe_name
-                    group_data = import_data.by_group[entity_id]
-                    nb = group_data.get("nb_comptes", 0)
-                    entity_label = f"{entity_id} ({nb} clients)"
-                    mode = "group"
-                    break
+        # Code Union / groupe exact, puis préfixe, puis partiel (index sans accents, clients avant groupes)
+        match = search_index_for(analysis, import_data).best(search)
+        entity_id = match.entity_id if match else None
+        entity_label = match.entity_label if match else None
+        mode = match.mode if match else None
         if entity_id is None or mode is None:
             return {"type": "entity_profile", "message": f"Aucun adhérent ou groupe trouvé pour « **{search}** ». Vérifiez le nom ou le code Union.", "data": None}
         try:
-            detail = get_entity_detail_with_rfa(import_data, mode, entity_id)
+            entity_dict = build_entity_detail(import_data, mode, entity_id)
         except Exception:
             return {"type": "entity_profile", "message": f"Impossible de charger la fiche pour **{entity_label}**.", "data": None}
-        entity_dict = detail.model_dump(by_alias=True, mode="json")
         entity_analysis = _analyze_entity(entity_dict, mode, entity_id)
-        contract_applied = detail.contract_applied or {}
+        contract_applied = entity_dict.get("contract_applied") or {}
         contract_name = contract_applied.get("name", "—")
         contract_id = contract_applied.get("id")
         total_rfa = sum(entity_analysis["rfa_by_key"].values())
         global_rows = entity_analysis["global_rows"]
         tri_rows = entity_analysis["tri_rows"]
-        plans = [p for p in analysis.get("smart_plans", []) if p.get("entity_id") == entity_id]
-        cascades = [c for c in analysis.get("cascade", []) if c.get("entity_id") == entity_id]
+        index = search_index_for(analysis, import_data)
+        plans = index.rows_by_entity("smart_plans", lambda: analysis.get("smart_plans", [])).get(entity_id, [])
+        cascades = index.rows_by_entity("cascade", lambda: analysis.get("cascade", [])).get(entity_id, [])
         near_count = sum(1 for r in global_rows + tri_rows if r.get("near"))
         achieved_count = sum(1 for r in global_rows + tri_rows if r.get("achieved"))
         gain_potential = sum(r.get("projected_gain") or 0 for r in global_rows + tri_rows if r.get("near"))
@@ -1219,7 +1318,7 @@ def _dispatch_query(analysis: Dict, query_type: str, params: Dict, import_data=N
         plans = analysis.get("smart_plans", [])
         search = (params.get("search") or "").upper()
         if search:
-            plans = [p for p in plans if search in p["entity_id"].upper() or search in p["entity_label"].upper()]
+            plans = search_index_for(analysis, import_data).filter_rows("smart_plans", lambda: analysis.get("smart_plans", []), search)
         if not plans:
             return {"type": "smart_plan", "message": "Aucun plan d'achat optimisé trouvé" + (f" pour **{search}**" if search else "") + ".", "data": []}
 
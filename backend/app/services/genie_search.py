@@ -0,0 +1,210 @@
+"""
+Index de recherche Génie (adhérents et groupes), construit avec l'analyse.
+
+- Normalisation : majuscules, sans accents, ponctuation réduite à un espace (« Garage Éric » == « GARAGE ERIC »).
+- Index n-grammes (1 à 3 caractères) sur code_union, nom_client et nom de groupe : une recherche
+  ne vérifie que les entrées qui contiennent tous les trigrammes de la saisie.
+- Résultats classés : code / nom exact, puis préfixe, début de mot, sous-chaîne ; les codes Union
+  membres d'un groupe retrouvent aussi le groupe (rang le plus faible).
+
+L'analyse ne transporte que la liste des entrées (JSON, persistée avec elle) ; l'index compilé est
+mémorisé par analyse (search_index_for).
+"""
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.fields import EXCLUDED_GROUPS
+
+_NON_ALNUM = re.compile(r"[^0-9A-Z]+")
+_MAX_GRAM = 3
+
+# Rangs (plus petit = plus pertinent)
+RANK_EXACT_ID = 0
+RANK_EXACT_NAME = 1
+RANK_PREFIX = 2
+RANK_WORD_PREFIX = 3
+RANK_SUBSTRING = 4
+RANK_MEMBER = 5
+
+
+def normalize(text: Optional[str]) -> str:
+    """Majuscules sans accents, tout ce qui n'est pas alphanumérique devient un espace unique."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFD", str(text).upper())
+    plain = "".join(c for c in decomposed if unicodedata.category(c) != "Mn")
+    return _NON_ALNUM.sub(" ", plain).strip()
+
+
+def _grams(text: str, n: int) -> Iterable[str]:
+    return (text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def build_search_entries(import_data) -> List[List]:
+    """
+    Entrées indexées : [mode, entity_id, entity_label, champs, codes_membres] pour chaque client
+    et chaque groupe non exclu (libellés identiques à ceux de l'analyse).
+    """
+    entries: List[List] = []
+    for code_union, data in import_data.by_client.items():
+        nom = data.get("nom_client", code_union)
+        label = f"{code_union} - {nom}" if nom else code_union
+        entries.append(["client", code_union, label, [code_union, data.get("nom_client") or ""], []])
+    for groupe_name, group_data in import_data.by_group.items():
+        if groupe_name.strip().upper() in EXCLUDED_GROUPS:
+            continue
+        codes = list(group_data.get("codes_union", []) or [])
+        nb = group_data.get("nb_comptes", len(codes))
+        entries.append(["group", groupe_name, f"{groupe_name} ({nb} clients)", [groupe_name], codes])
+    return entries
+
+
+class SearchMatch(NamedTuple):
+    mode: str
+    entity_id: str
+    entity_label: str
+    rank: int
+
+
+class EntitySearchIndex:
+    """Index n-grammes sur les entrées de build_search_entries."""
+
+    def __init__(self, entries: Sequence[Sequence]):
+        self.entries = entries
+        self._fields: List[List[str]] = []
+        self._members: List[List[str]] = []
+        self._postings: Dict[str, set] = {}
+        self._member_postings: Dict[str, set] = {}
+        self._sections: Dict[str, Dict[str, list]] = {}
+        self._sections_lock = threading.Lock()
+        for pos, (_mode, _entity_id, _label, fields, members) in enumerate(entries):
+            normalized = [normalize(f) for f in fields if f]
+            normalized_members = [normalize(code) for code in members if code]
+            self._fields.append(normalized)
+            self._members.append(normalized_members)
+            self._index(pos, normalized, self._postings)
+            self._index(pos, normalized_members, self._member_postings)
+
+    @staticmethod
+    def _index(pos: int, texts: Sequence[str], postings: Dict[str, set]) -> None:
+        for text in texts:
+            for n in range(1, _MAX_GRAM + 1):
+                for gram in _grams(text, n):
+                    postings.setdefault(gram, set()).add(pos)
+
+    @staticmethod
+    def _candidates(query: str, postings: Dict[str, set]) -> set:
+        n = min(_MAX_GRAM, len(query))
+        result: Optional[set] = None
+        for gram in sorted(set(_grams(query, n)), key=lambda g: len(postings.get(g, ()))):
+            found = postings.get(gram)
+            if not found:
+                return set()
+            result = set(found) if result is None else result & found
+            if not result:
+                return result
+        return result or set()
+
+    def _rank(self, pos: int, query: str) -> Optional[int]:
+        fields = self._fields[pos]
+        best = None
+        for i, text in enumerate(fields):
+            if text == query:
+                rank = RANK_EXACT_ID if i == 0 else RANK_EXACT_NAME
+            elif text.startswith(query):
+                rank = RANK_PREFIX
+            elif f" {query}" in text:
+                rank = RANK_WORD_PREFIX
+            elif query in text:
+                rank = RANK_SUBSTRING
+            else:
+                continue
+            best = rank if best is None else min(best, rank)
+        return best
+
+    def search(self, query: Optional[str], modes: Optional[Sequence[str]] = None, limit: Optional[int] = None) -> List[SearchMatch]:
+        """
+        Entités dont un champ contient la saisie (sans accents ni casse), classées par rang,
+        clients avant groupes, puis dans l'ordre de l'import.
+        """
+        q = normalize(query)
+        if not q:
+            return []
+        ranked: Dict[int, int] = {}
+        for pos in self._candidates(q, self._postings):
+            rank = self._rank(pos, q)
+            if rank is not None:
+                ranked[pos] = rank
+        for pos in self._candidates(q, self._member_postings):
+            if pos not in ranked and any(q in code for code in self._members[pos]):
+                ranked[pos] = RANK_MEMBER
+        matches = []
+        for pos, rank in ranked.items():
+            mode, entity_id, label = self.entries[pos][:3]
+            if modes and mode not in modes:
+                continue
+            matches.append((rank, mode != "client", pos, SearchMatch(mode, entity_id, label, rank)))
+        matches.sort(key=lambda m: m[:3])
+        if limit is not None:
+            matches = matches[:limit]
+        return [m[3] for m in matches]
+
+    def best(self, query: Optional[str]) -> Optional[SearchMatch]:
+        found = self.search(query, limit=1)
+        return found[0] if found else None
+
+    def rows_by_entity(self, section: str, rows: Callable[[], Iterable[Dict]]) -> Dict[str, list]:
+        """Lignes d'une section de l'analyse (plans, cascade…) regroupées par entity_id, calculées une fois."""
+        grouped = self._sections.get(section)
+        if grouped is None:
+            grouped = {}
+            for row in rows():
+                grouped.setdefault(row.get("entity_id"), []).append(row)
+            with self._sections_lock:
+                self._sections[section] = grouped
+        return grouped
+
+    def filter_rows(self, section: str, rows: Callable[[], Iterable[Dict]], query: Optional[str]) -> list:
+        """Lignes des entités correspondant à la saisie, dans l'ordre de pertinence puis d'origine."""
+        grouped = self.rows_by_entity(section, rows)
+        seen = set()
+        result = []
+        for match in self.search(query):
+            if match.entity_id in seen:
+                continue
+            seen.add(match.entity_id)
+            result.extend(grouped.get(match.entity_id, ()))
+        return result
+
+
+# Index compilés, par liste d'entrées (une par analyse en cache) ; bornés aux plus récents
+_MAX_COMPILED = 16
+_compiled: "OrderedDict[int, Tuple[list, EntitySearchIndex]]" = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def search_index_for(analysis: Dict, import_data=None) -> EntitySearchIndex:
+    """
+    Index de l'analyse (entrées analysis["search_index"]) ; reconstruit depuis import_data pour
+    une analyse qui n'en contient pas (ancienne entrée de cache).
+    """
+    entries = analysis.get("search_index")
+    if entries is None:
+        entries = build_search_entries(import_data) if import_data is not None else []
+        analysis["search_index"] = entries
+    with _compiled_lock:
+        memo = _compiled.get(id(entries))
+        if memo and memo[0] is entries:
+            _compiled.move_to_end(id(entries))
+            return memo[1]
+    index = EntitySearchIndex(entries)
+    with _compiled_lock:
+        _compiled[id(entries)] = (entries, index)
+        while len(_compiled) > _MAX_COMPILED:
+            _compiled.popitem(last=False)
+    return index
@@ -0,0 +1,148 @@
+"""
+Fabrique partagée de clients Google API (Sheets, Drive, Gmail).
+
+- Credentials mis en cache par (identité du compte, scopes) : une seule authentification par processus,
+  rafraîchissement proactif du jeton avant expiration (sous verrou).
+- Document de découverte parsé une seule fois par (api, version).
+- Services construits une fois par thread : les objets googleapiclient reposent sur httplib2,
+  qui n'est pas thread-safe ; chaque thread réutilise donc son propre service.
+
+Utilisé par sheets_loader, pure_data_sheets et nathalie_service.
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# Rafraîchir le jeton s'il expire dans moins de REFRESH_MARGIN
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_credentials: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+_discovery_docs: Dict[Tuple[str, str], Any] = {}
+_local = threading.local()
+
+
+def _fingerprint(*parts: Optional[str]) -> str:
+    return hashlib.sha256("\x00".join(p or "" for p in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def service_account_credentials(info: dict, scopes: Sequence[str]):
+    """Credentials compte de service, mis en cache par (compte, clé privée, scopes)."""
+    key = (
+        "sa:" + _fingerprint(info.get("client_email"), info.get("private_key_id")),
+        tuple(sorted(scopes)),
+    )
+    with _lock:
+        creds = _credentials.get(key)
+        if creds is None:
+            from google.oauth2 import service_account
+            creds = service_account.Credentials.from_service_account_info(info, scopes=list(scopes))
+            _credentials[key] = creds
+    return creds
+
+
+def service_account_file_credentials(path: str, scopes: Sequence[str]):
+    """Credentials compte de service depuis un fichier JSON (même cache que ci-dessus)."""
+    import json
+    with open(path) as f:
+        info = json.load(f)
+    return service_account_credentials(info, scopes)
+
+
+def oauth_user_credentials(
+    client_id: str,
+    client_secret: str,
+    refresh_token: str,
+    scopes: Sequence[str],
+    token_uri: str = "https://oauth2.googleapis.com/token",
+):
+    """Credentials OAuth utilisateur (refresh token), mis en cache par (client, refresh token, scopes)."""
+    key = ("oauth:" + _fingerprint(client_id, refresh_token), tuple(sorted(scopes)))
+    with _lock:
+        creds = _credentials.get(key)
+        if creds is None:
+            from google.oauth2.credentials import Credentials
+            creds = Credentials(
+                token=None,
+                refresh_token=refresh_token,
+                client_id=client_id,
+                client_secret=client_secret,
+                token_uri=token_uri,
+                scopes=list(scopes),
+            )
+            _credentials[key] = creds
+    return creds
+
+
+def _needs_refresh(creds) -> bool:
+    if not getattr(creds, "token", None):
+        return True
+    expiry = getattr(creds, "expiry", None)
+    if expiry is None:
+        return False
+    # google-auth stocke expiry en UTC naïf
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return expiry - REFRESH_MARGIN <= now
+
+
+def ensure_fresh(creds) -> None:
+    """Rafraîchit le jeton d'accès s'il est absent ou proche de l'expiration (un seul rafraîchissement à la fois)."""
+    if not _needs_refresh(creds):
+        return
+    with _refresh_lock:
+        if not _needs_refresh(creds):
+            return
+        from google.auth.transport.requests import Request
+        creds.refresh(Request())
+
+
+def _discovery_doc(api: str, version: str):
+    key = (api, version)
+    doc = _discovery_docs.get(key)
+    if doc is None:
+        from googleapiclient.discovery_cache import get_static_doc
+        import json
+        raw = get_static_doc(api, version)
+        if raw is None:
+            return None
+        doc = json.loads(raw)
+        with _lock:
+            _discovery_docs.setdefault(key, doc)
+    return doc
+
+
+def get_service(api: str, version: str, credentials):
+    """
+    Service googleapiclient pour (api, version, credentials), réutilisé dans le thread courant.
+    Les credentials doivent provenir des fabriques ci-dessus (identité stable).
+    """
+    ensure_fresh(credentials)
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = {}
+        _local.services = services
+    key = (api, version, id(credentials))
+    cached = services.get(key)
+    if cached is not None and cached[0] is credentials:
+        return cached[1]
+
+    from googleapiclient.discovery import build, build_from_document
+    doc = _discovery_doc(api, version)
+    if doc is not None:
+        service = build_from_document(doc, credentials=credentials)
+    else:
+        service = build(api, version, credentials=credentials, cache_discovery=False)
+    services[key] = (credentials, service)
+    return service
+
+
+def clear_cache() -> None:
+    """Oublie credentials et documents de découverte (tests, rotation de clés)."""
+    with _lock:
+        _credentials.clear()
+        _discovery_docs.clear()
+    _local.services = {}
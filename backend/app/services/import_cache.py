@@ -0,0 +1,645 @@
+"""
+Hiérarchie de caches des imports RFA : mémoire → instantané disque local → base partagée → origine.
+
+- Mémoire : app.storage (_imports), budget IMPORT_MEMORY_MB, sheets_live épinglé ; un import
+  sans copie en base est d'abord écrit sur disque et son instantané épinglé (spill) avant d'être
+  retiré de la mémoire : l'éviction LRU du disque ne peut pas supprimer sa seule copie.
+- Disque : un instantané par import (données + agrégations, JSON compressé) dans
+  CACHE_DIR/imports, borné à IMPORT_DISK_CACHE_MB (LRU, voir DiskCache). sheets_live est publié
+  en colonnes projetées partagées entre workers (app.services.columnar_snapshot, CACHE_DIR/shared) ;
+  son instantané porte la version de rfa_data et n'est servi que si elle n'a pas changé.
+- Base partagée : sheets_live = table rfa_data (puis ancien cache JSON AppSettings) ;
+  imports chargés par /upload ou /sync-from-sheets = ligne AppSettings « import_snapshot_<id> »
+  (compressée, plafond IMPORT_DB_MAX_MB par ligne, journalisé) ; rétention : les IMPORT_DB_MAX_ROWS
+  instantanés les plus récemment écrits, IMPORT_DB_TOTAL_MB au total, ligne supprimée avec l'import.
+- Origine : fournie par l'appelant (Google Sheets pour sheets_live) ; rien pour un upload.
+
+Un succès à un niveau remplit les niveaux supérieurs ; put() écrit dans tous (rafraîchissement,
+upload). stats() : hits / misses / écritures et tailles par niveau.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import os
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.storage import LIVE_IMPORT_ID, ImportData
+
+_LOG = logging.getLogger(__name__)
+
+IMPORT_DISK_CACHE_MB = float(os.environ.get("IMPORT_DISK_CACHE_MB", "256"))
+IMPORT_DB_MAX_MB = float(os.environ.get("IMPORT_DB_MAX_MB", "16"))
+IMPORT_DB_MAX_ROWS = int(os.environ.get("IMPORT_DB_MAX_ROWS", "20"))
+IMPORT_DB_TOTAL_MB = float(os.environ.get("IMPORT_DB_TOTAL_MB", "128"))
+PURE_DATA_DISK_CACHE_MB = float(os.environ.get("PURE_DATA_DISK_CACHE_MB", "512"))
+
+SNAPSHOT_KEY_PREFIX = "import_snapshot_"
+SNAPSHOT_FORMAT = 1
+
+# Ancien cache JSON de sheets_live dans AppSettings (repli quand rfa_data est indisponible)
+_CACHE_KEY_DATA   = "sheets_live_raw_data"
+_CACHE_KEY_COLS   = "sheets_live_raw_columns"
+_CACHE_KEY_MAP    = "sheets_live_col_mapping"
+_CACHE_KEY_CLIENT = "sheets_live_by_client"
+_CACHE_KEY_GROUP  = "sheets_live_by_group"
+
+# Origine : () -> (data, raw_columns, column_mapping) ou None
+OriginLoader = Callable[[], Optional[Tuple[list, list, dict]]]
+
+
+def _hit_rate(hits: int, misses: int) -> Optional[float]:
+    total = hits + misses
+    return round(hits / total, 4) if total else None
+
+
+def build_import(import_id: str, raw_columns: list, column_mapping: dict, data: list) -> ImportData:
+    """ImportData avec agrégations calculées."""
+    from app.services.compute import compute_aggregations
+
+    import_data = ImportData(import_id, raw_columns, column_mapping, data)
+    try:
+        compute_aggregations(import_data)
+    except Exception as e:
+        print(f"[IMPORT CACHE] Erreur agrégations {import_id}: {e}")
+    return import_data
+
+
+# ── Instantané (données + agrégations) ────────────────────────────────────────
+
+def encode_snapshot(import_data: ImportData) -> bytes:
+    payload = {
+        "format": SNAPSHOT_FORMAT,
+        "import_id": import_data.import_id,
+        "created_at": import_data.created_at.isoformat(),
+        "raw_columns": import_data.raw_columns,
+        "column_mapping": import_data.column_mapping,
+        "data": list(import_data.data),
+        "by_client": import_data.by_client,
+        "by_group": import_data.by_group,
+    }
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"), 6)
+
+
+def decode_snapshot(blob: bytes) -> Optional[ImportData]:
+    """ImportData reconstruit (agrégations comprises), ou None si l'instantané est illisible."""
+    try:
+        payload = json.loads(zlib.decompress(blob))
+        if payload.get("format") != SNAPSHOT_FORMAT:
+            return None
+        import_data = ImportData(
+            payload["import_id"], payload["raw_columns"], payload["column_mapping"], payload["data"]
+        )
+        import_data.created_at = datetime.fromisoformat(payload["created_at"])
+        import_data.by_client = payload["by_client"]
+        import_data.by_group = payload["by_group"]
+    except (ValueError, TypeError, KeyError, zlib.error):
+        return None
+    if not import_data.by_client and import_data.data:
+        from app.services.compute import compute_aggregations
+        compute_aggregations(import_data)
+    return import_data
+
+
+# ── Niveaux ──────────────────────────────────────────────────────────────────
+
+class MemoryTier:
+    name = "memory"
+    durable = False
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, import_id: str, session=None) -> Optional[ImportData]:
+        from app.storage import get_import
+
+        import_data = get_import(import_id)
+        if import_data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return import_data
+
+    def put(self, import_data: ImportData, session=None) -> bool:
+        from app.storage import put_import
+
+        put_import(import_data)
+        return False  # la mémoire ne compte pas comme copie persistante
+
+    def stats(self) -> Dict[str, Any]:
+        from app import storage
+
+        stats = storage._imports.stats()
+        stats.update({"hits": self.hits, "misses": self.misses, "hit_rate": _hit_rate(self.hits, self.misses)})
+        return stats
+
+
+class DiskTier:
+    """Instantanés locaux (DiskCache : écriture atomique, taille bornée, LRU)."""
+
+    name = "disk"
+    durable = False  # éviction LRU : ne compte comme copie que si l'instantané est épinglé
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self._directory = directory
+        self._cache = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.writes = 0
+        self.skipped = 0
+
+    def _disk(self):
+        with self._lock:
+            if self._cache is None:
+                from app.services.disk_cache import DiskCache
+
+                directory = self._directory
+                if directory is None:
+                    from app.database import CACHE_DIR
+                    directory = os.path.join(CACHE_DIR, "imports")
+                self._cache = DiskCache(directory, self.max_bytes)
+            return self._cache
+
+    def get(self, import_id: str, session=None) -> Optional[ImportData]:
+        current = None
+        if import_id == LIVE_IMPORT_ID and session is not None:
+            current = _live_source_version(session)
+        if import_id == LIVE_IMPORT_ID:
+            from app.services.columnar_snapshot import live_import_snapshot
+            import_data = live_import_snapshot.adopt(current)
+            if import_data is not None:
+                self.hits += 1
+                return import_data
+        entry = self._disk().get(import_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        blob, meta = entry
+        if import_id == LIVE_IMPORT_ID and session is not None:
+            if current is not None and meta.get("source_version") != current:
+                self.stale += 1
+                self.misses += 1
+                return None
+        import_data = decode_snapshot(blob)
+        if import_data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return import_data
+
+    def put(self, import_data: ImportData, session=None, pin: bool = False) -> bool:
+        if import_data.import_id == LIVE_IMPORT_ID:
+            from app.services.columnar_snapshot import live_import_snapshot
+            version = _live_source_version(session) if session is not None else None
+            if live_import_snapshot.publish(import_data, version) is not None:
+                self.writes += 1
+                return True
+        blob = encode_snapshot(import_data)
+        if len(blob) > self.max_bytes:
+            self.skipped += 1
+            _LOG.warning("Import %s non mis en cache disque (%d octets > %d)", import_data.import_id, len(blob), self.max_bytes)
+            return False
+        meta = {"import_id": import_data.import_id, "nb_lignes": len(import_data.data), "format": SNAPSHOT_FORMAT}
+        if import_data.import_id == LIVE_IMPORT_ID and session is not None:
+            meta["source_version"] = _live_source_version(session)
+        try:
+            self._disk().put(import_data.import_id, blob, meta, pin=pin)
+        except OSError as e:
+            _LOG.warning("Import %s: écriture de l'instantané disque impossible: %s", import_data.import_id, e)
+            return False
+        self.writes += 1
+        return True
+
+    def pin(self, import_id: str) -> bool:
+        """Épingle l'instantané existant de l'import ; False s'il n'y en a pas."""
+        return self._disk().pin(import_id)
+
+    def unpin(self, import_id: str) -> None:
+        self._disk().unpin(import_id)
+
+    def delete(self, import_id: str, session=None) -> None:
+        self._disk().delete(import_id)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._disk().stats()
+        stats.update({
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": _hit_rate(self.hits, self.misses),
+            "stale": self.stale,
+            "writes": self.writes,
+            "skipped_too_large": self.skipped,
+        })
+        return stats
+
+
+class DatabaseTier:
+    """Base partagée : rfa_data pour sheets_live, AppSettings compressé pour les autres imports."""
+
+    name = "database"
+    durable = True
+
+    def __init__(self, max_bytes: int, max_rows: int, max_total_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.max_total_bytes = max_total_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.evicted = 0
+        self.deleted = 0
+
+    def get(self, import_id: str, session=None) -> Optional[ImportData]:
+        import_data = None
+        if session is not None:
+            import_data = _read_live(session) if import_id == LIVE_IMPORT_ID else _read_snapshot_row(session, import_id)
+        if import_data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return import_data
+
+    def put(self, import_data: ImportData, session=None) -> bool:
+        if session is None:
+            return False
+        if import_data.import_id == LIVE_IMPORT_ID:
+            written = _write_live(session, import_data)
+            if written:
+                self.writes += 1
+            return written
+        value = base64.b64encode(encode_snapshot(import_data)).decode("ascii")
+        if len(value) > self.max_bytes:
+            self.skipped += 1
+            _LOG.warning(
+                "Import %s non persisté en base (%d octets compressés > %d)", import_data.import_id, len(value), self.max_bytes
+            )
+            return False
+        try:
+            _upsert_setting(session, SNAPSHOT_KEY_PREFIX + import_data.import_id, value)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            _LOG.warning("Import %s: écriture en base impossible: %s", import_data.import_id, e)
+            return False
+        self.writes += 1
+        self.bytes_written += len(value)
+        self._enforce_retention(session, keep=import_data.import_id)
+        return True
+
+    def delete(self, import_id: str, session=None) -> None:
+        if session is None or import_id == LIVE_IMPORT_ID:
+            return
+        if _delete_snapshot_rows(session, [import_id]):
+            self.deleted += 1
+
+    def _enforce_retention(self, session, keep: str) -> None:
+        """Garde les instantanés les plus récemment écrits (max_rows, max_total_bytes) ; keep reste toujours."""
+        try:
+            rows = _snapshot_rows(session)
+        except Exception as e:
+            session.rollback()
+            _LOG.warning("Instantanés en base: lecture pour la rétention impossible: %s", e)
+            return
+        kept = [size for import_id, size in rows if import_id == keep]
+        total, victims = sum(kept), []
+        for import_id, size in rows:
+            if import_id == keep:
+                continue
+            if len(kept) < self.max_rows and total + size <= self.max_total_bytes:
+                kept.append(size)
+                total += size
+            else:
+                victims.append(import_id)
+        if victims and _delete_snapshot_rows(session, victims):
+            from app.storage import unmark_persisted
+
+            self.evicted += len(victims)
+            for import_id in victims:
+                unmark_persisted(import_id)
+            _LOG.info("Instantanés en base: %d ancien(s) supprimé(s) (%s)", len(victims), ", ".join(victims))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": _hit_rate(self.hits, self.misses),
+            "writes": self.writes,
+            "skipped_too_large": self.skipped,
+            "bytes_written": self.bytes_written,
+            "max_bytes": self.max_bytes,
+            "max_rows": self.max_rows,
+            "max_total_bytes": self.max_total_bytes,
+            "evicted": self.evicted,
+            "deleted": self.deleted,
+        }
+        try:
+            from sqlmodel import Session
+            from app.database import engine
+
+            with Session(engine) as session:
+                rows = _snapshot_rows(session)
+            stats.update({"rows": len(rows), "bytes": sum(size for _, size in rows)})
+        except Exception as e:
+            _LOG.debug("Instantanés en base: occupation illisible: %s", e)
+        return stats
+
+
+def _live_source_version(session) -> Optional[str]:
+    from app.services.rfa_supabase import rfa_data_version
+    return rfa_data_version(session)
+
+
+def _upsert_setting(session, key: str, value: str) -> None:
+    from sqlmodel import select
+    from app.models import AppSettings
+
+    st = session.exec(select(AppSettings).where(AppSettings.key == key)).first()
+    if st:
+        st.value = value
+        st.updated_at = datetime.now()
+    else:
+        session.add(AppSettings(key=key, value=value))
+
+
+def _get_setting(session, key: str) -> Optional[str]:
+    from sqlmodel import select
+    from app.models import AppSettings
+
+    st = session.exec(select(AppSettings).where(AppSettings.key == key)).first()
+    return st.value if st and st.value else None
+
+
+def _snapshot_rows(session) -> List[Tuple[str, int]]:
+    """(import_id, taille) des instantanés en base, du plus récemment écrit au plus ancien (valeurs non lues)."""
+    from sqlalchemy import func
+    from sqlmodel import select
+    from app.models import AppSettings
+
+    rows = session.exec(
+        select(AppSettings.key, func.length(AppSettings.value))
+        .where(AppSettings.key.startswith(SNAPSHOT_KEY_PREFIX))
+        .order_by(AppSettings.updated_at.desc(), AppSettings.id.desc())
+    ).all()
+    return [(key[len(SNAPSHOT_KEY_PREFIX):], size or 0) for key, size in rows]
+
+
+def _delete_snapshot_rows(session, import_ids: List[str]) -> bool:
+    from sqlalchemy import delete
+    from app.models import AppSettings
+
+    try:
+        result = session.exec(
+            delete(AppSettings).where(AppSettings.key.in_([SNAPSHOT_KEY_PREFIX + i for i in import_ids]))
+        )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        _LOG.warning("Instantanés en base: suppression de %s impossible: %s", ", ".join(import_ids), e)
+        return False
+    return bool(result.rowcount)
+
+
+def _read_snapshot_row(session, import_id: str) -> Optional[ImportData]:
+    try:
+        value = _get_setting(session, SNAPSHOT_KEY_PREFIX + import_id)
+    except Exception as e:
+        session.rollback()
+        print(f"[IMPORT CACHE] Erreur lecture {import_id}: {e}")
+        return None
+    if not value:
+        return None
+    try:
+        return decode_snapshot(base64.b64decode(value))
+    except ValueError:
+        return None
+
+
+def _read_live(session) -> Optional[ImportData]:
+    """sheets_live depuis rfa_data, sinon depuis l'ancien cache JSON AppSettings."""
+    try:
+        from app.services.rfa_supabase import read_rfa_from_supabase, build_column_mapping
+        data_list = read_rfa_from_supabase(session)
+        if data_list:
+            column_mapping = build_column_mapping()
+            return build_import(LIVE_IMPORT_ID, list(column_mapping.keys()), column_mapping, data_list)
+    except Exception as e:
+        print(f"[RESOLVE] Erreur lecture rfa_data: {e}")
+    return _load_legacy_live_cache(session)
+
+
+def _write_live(session, import_data: ImportData) -> bool:
+    """sheets_live vers rfa_data (source de vérité des cold starts), sinon vers l'ancien cache JSON."""
+    try:
+        from app.services.rfa_supabase import write_rfa_to_supabase
+        nb = write_rfa_to_supabase(session, import_data.data)
+        print(f"[REFRESH] {nb} lignes écrites dans rfa_data")
+        return True
+    except Exception as e:
+        print(f"[REFRESH] Erreur écriture rfa_data: {e}")
+        session.rollback()
+    return _save_legacy_live_cache(session, import_data)
+
+
+def _save_legacy_live_cache(session, import_data: ImportData) -> bool:
+    """Sauvegarde le cache complet (raw + agrégations) dans AppSettings."""
+    try:
+        _upsert_setting(session, _CACHE_KEY_DATA, json.dumps(list(import_data.data)))
+        _upsert_setting(session, _CACHE_KEY_COLS, json.dumps(import_data.raw_columns))
+        _upsert_setting(session, _CACHE_KEY_MAP,  json.dumps(import_data.column_mapping))
+        _upsert_setting(session, _CACHE_KEY_CLIENT, json.dumps(import_data.by_client))
+        _upsert_setting(session, _CACHE_KEY_GROUP,  json.dumps(import_data.by_group))
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        print(f"[CACHE] Erreur sauvegarde: {e}")
+        return False
+
+
+def _load_legacy_live_cache(session) -> Optional[ImportData]:
+    """Charge l'ancien cache JSON AppSettings — agrégations pré-calculées incluses."""
+    try:
+        def _get(key):
+            value = _get_setting(session, key)
+            return json.loads(value) if value else None
+
+        data_list      = _get(_CACHE_KEY_DATA)
+        raw_columns    = _get(_CACHE_KEY_COLS)
+        column_mapping = _get(_CACHE_KEY_MAP)
+        by_client      = _get(_CACHE_KEY_CLIENT)
+        by_group       = _get(_CACHE_KEY_GROUP)
+    except Exception as e:
+        session.rollback()
+        print(f"[CACHE] Erreur lecture: {e}")
+        return None
+    if not data_list or not raw_columns:
+        return None
+    if by_client and by_group:
+        import_data = ImportData(LIVE_IMPORT_ID, raw_columns, column_mapping or {}, data_list)
+        import_data.by_client = by_client
+        import_data.by_group = by_group
+        return import_data
+    # Pas d'agrégations en cache : les calculer (lent, mais seulement 1 fois)
+    return build_import(LIVE_IMPORT_ID, raw_columns, column_mapping or {}, data_list)
+
+
+# ── Hiérarchie ───────────────────────────────────────────────────────────────
+
+class ImportCache:
+    def __init__(self, tiers: List[Any]):
+        self.tiers = tiers
+        self.origin_hits = 0
+        self.origin_misses = 0
+
+    def get(self, import_id: str, session=None, origin: Optional[OriginLoader] = None) -> Optional[ImportData]:
+        """Mémoire, puis load()."""
+        return self.get_memory(import_id) or self.load(import_id, session, origin)
+
+    def get_memory(self, import_id: str) -> Optional[ImportData]:
+        return self.tiers[0].get(import_id)
+
+    def load(self, import_id: str, session=None, origin: Optional[OriginLoader] = None) -> Optional[ImportData]:
+        """
+        Après un échec mémoire : premier niveau persistant qui a l'import (remonté dans les
+        niveaux au-dessus), puis l'origine (écrite dans tous les niveaux).
+        """
+        from app.storage import get_import, mark_persisted
+
+        import_data = get_import(import_id)  # chargé entre-temps par un appel concurrent
+        if import_data is not None:
+            return import_data
+        for level in range(1, len(self.tiers)):
+            import_data = self.tiers[level].get(import_id, session)
+            if import_data is not None:
+                if self.tiers[level].durable:
+                    mark_persisted(import_id)
+                self._write(import_data, session, self.tiers[:level])
+                return import_data
+        loaded = origin() if origin is not None else None
+        if not loaded or not loaded[0]:
+            if origin is not None:
+                self.origin_misses += 1
+            return None
+        self.origin_hits += 1
+        data, raw_columns, column_mapping = loaded
+        import_data = build_import(import_id, raw_columns, column_mapping, data)
+        self._write(import_data, session, self.tiers)
+        return import_data
+
+    def put(self, import_data: ImportData, session=None) -> None:
+        """Écriture dans tous les niveaux (nouvel import, rafraîchissement)."""
+        self._write(import_data, session, self.tiers)
+
+    def delete(self, import_id: str, session=None) -> None:
+        """Import supprimé : retiré de la mémoire et de tous les niveaux persistants."""
+        from app.storage import delete_import
+
+        delete_import(import_id)
+        for tier in self.tiers[1:]:
+            tier.delete(import_id, session)
+
+    def spill(self, import_data: ImportData) -> bool:
+        """
+        Copie disque épinglée d'un import sans copie en base, avant son retrait de la mémoire
+        (appelé par app.storage) ; l'instantané déjà écrit par put() est épinglé sans être réécrit.
+        """
+        disk = self.tiers[1]
+        return disk.pin(import_data.import_id) or disk.put(import_data, pin=True)
+
+    def _write(self, import_data: ImportData, session, tiers) -> None:
+        from app.storage import mark_persisted
+
+        persisted = False
+        for tier in reversed(tiers):
+            persisted = (tier.put(import_data, session) and tier.durable) or persisted
+        if persisted:
+            mark_persisted(import_data.import_id)
+            self.tiers[1].unpin(import_data.import_id)  # copie durable en base : l'instantané redevient évinçable
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {tier.name: tier.stats() for tier in self.tiers}
+        stats["origin"] = {
+            "hits": self.origin_hits,
+            "misses": self.origin_misses,
+            "hit_rate": _hit_rate(self.origin_hits, self.origin_misses),
+        }
+        return stats
+
+
+import_cache = ImportCache([
+    MemoryTier(),
+    DiskTier(int(IMPORT_DISK_CACHE_MB * 1024 * 1024)),
+    DatabaseTier(
+        int(IMPORT_DB_MAX_MB * 1024 * 1024), IMPORT_DB_MAX_ROWS, int(IMPORT_DB_TOTAL_MB * 1024 * 1024)
+    ),
+])
+
+
+# ── Pure Data retirés de la mémoire ──────────────────────────────────────────
+
+class PureDataDisk:
+    """
+    Copies disque des imports Pure Data retirés de la mémoire, en fichiers colonnes
+    (app.services.columnar_snapshot) : rechargés par app.storage en projection mmap, sans copie privée.
+    """
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self._directory = directory
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def _disk(self):
+        with self._lock:
+            if self._cache is None:
+                from app.services.disk_cache import DiskCache
+
+                directory = self._directory
+                if directory is None:
+                    from app.database import CACHE_DIR
+                    directory = os.path.join(CACHE_DIR, "pure_data")
+                self._cache = DiskCache(directory, self.max_bytes)
+            return self._cache
+
+    def put(self, key: str, pd_import) -> bool:
+        from app.services.columnar_snapshot import encode_columnar, is_mapped
+
+        if is_mapped(pd_import.rows) and self._disk().content_path(key) == pd_import.rows.snapshot.path:
+            return True  # déjà rechargé depuis ce fichier
+        blob = encode_columnar(pd_import)
+        if len(blob) > self.max_bytes:
+            return False
+        try:
+            self._disk().put(key, blob, {"import_id": pd_import.import_id, "nb_lignes": len(pd_import.rows)})
+        except OSError as e:
+            _LOG.warning("Pure Data %s: écriture disque impossible: %s", key, e)
+            return False
+        return True
+
+    def get(self, key: str):
+        """Pure Data dont les lignes restent dans le fichier projeté (mmap), ou None."""
+        from app.services.columnar_snapshot import open_columnar
+
+        path = self._disk().content_path(key)
+        if path is None:
+            return None
+        try:
+            return open_columnar(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return self._disk().stats()
+
+
+pure_data_disk = PureDataDisk(int(PURE_DATA_DISK_CACHE_MB * 1024 * 1024))
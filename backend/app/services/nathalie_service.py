@@ -8,6 +8,9 @@ from __future__ import annotations
 import base64
 import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Any, Tuple
 from fastapi import UploadFile
 
@@ -104,6 +107,13 @@ COL_TASK = {
     "terminee":     12,
 }
 
+# Cache des lectures Sheets (clients, fournisseurs, tâches) : durée avant revalidation
+CACHE_TTL_SECONDS = float(os.environ.get("NATHALIE_CACHE_TTL", "300"))
+# Envoi des demandes d'ouverture : téléchargements Drive / envois Gmail simultanés
+EMAIL_WORKERS = int(os.environ.get("NATHALIE_EMAIL_WORKERS", "4"))
+# Cache disque des pièces jointes Drive (RIB, Kbis, pièce d'identité), en Mo
+ATTACHMENT_CACHE_MB = int(os.environ.get("NATHALIE_ATTACHMENT_CACHE_MB", "200"))
+
 # ── Clients Google ─────────────────────────────────────────────────────────────
 
 def _get_google_service_account_info() -> dict:
@@ -127,19 +137,19 @@ def _get_google_service_account_info() -> dict:
 def _get_sheets_creds():
     """Credentials compte de service pour Sheets (lecture/écriture)."""
     try:
-        from google.oauth2 import service_account
+        from app.services.google_clients import service_account_credentials
+        import google.oauth2  # noqa: F401
     except ImportError:
         raise ImportError("Installez : pip install -r requirements-sheets.txt")
     scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-    return service_account.Credentials.from_service_account_info(
-        _get_google_service_account_info(), scopes=scopes
-    )
+    return service_account_credentials(_get_google_service_account_info(), scopes)
 
 
 def _get_drive_creds():
     """Credentials OAuth utilisateur pour Drive (upload fichiers)."""
     try:
-        from google.oauth2.credentials import Credentials
+        from app.services.google_clients import oauth_user_credentials
+        import google.oauth2.credentials  # noqa: F401
     except ImportError:
         raise ImportError("Installez : pip install google-auth-oauthlib")
 
@@ -152,12 +162,10 @@ def _get_drive_creds():
             "Variables DRIVE_CLIENT_ID, DRIVE_CLIENT_SECRET, DRIVE_REFRESH_TOKEN manquantes dans .env"
         )
 
-    return Credentials(
-        token=None,
-        refresh_token=refresh_token,
-        client_id=client_id,
-        client_secret=client_secret,
-        token_uri="https://oauth2.googleapis.com/token",
+    return oauth_user_credentials(
+        client_id,
+        client_secret,
+        refresh_token,
         scopes=[
             "https://www.googleapis.com/auth/drive",
             "https://www.googleapis.com/auth/gmail.send",
@@ -166,20 +174,21 @@ def _get_drive_creds():
 
 
 def _get_sheets_client():
-    from googleapiclient.discovery import build
-    return build("sheets", "v4", credentials=_get_sheets_creds())
+    from app.services.google_clients import get_service
+    return get_service("sheets", "v4", _get_sheets_creds())
 
 
 def _get_drive_client():
-    from googleapiclient.discovery import build
-    return build("drive", "v3", credentials=_get_drive_creds())
+    from app.services.google_clients import get_service
+    return get_service("drive", "v3", _get_drive_creds())
 
 
 def _get_gmail_creds():
     """Credentials OAuth pour Gmail (envoi d'emails). Même compte que Drive.
     Le refresh token doit avoir été obtenu avec le scope gmail.send (voir doc config)."""
     try:
-        from google.oauth2.credentials import Credentials
+        from app.services.google_clients import oauth_user_credentials
+        import google.oauth2.credentials  # noqa: F401
     except ImportError:
         raise ImportError("Installez : pip install google-auth-oauthlib")
     client_id = os.environ.get("DRIVE_CLIENT_ID")
@@ -189,12 +198,10 @@ def _get_gmail_creds():
         raise ValueError(
             "Variables DRIVE_CLIENT_ID, DRIVE_CLIENT_SECRET, DRIVE_REFRESH_TOKEN manquantes (utilisées aussi pour Gmail)"
         )
-    return Credentials(
-        token=None,
-        refresh_token=refresh_token,
-        client_id=client_id,
-        client_secret=client_secret,
-        token_uri="https://oauth2.googleapis.com/token",
+    return oauth_user_credentials(
+        client_id,
+        client_secret,
+        refresh_token,
         scopes=[
             "https://www.googleapis.com/auth/drive",
             "https://www.googleapis.com/auth/gmail.send",
@@ -203,8 +210,8 @@ def _get_gmail_creds():
 
 
 def _get_gmail_client():
-    from googleapiclient.discovery import build
-    return build("gmail", "v1", credentials=_get_gmail_creds())
+    from app.services.google_clients import get_service
+    return get_service("gmail", "v1", _get_gmail_creds())
 
 
 def _read_sheet(sheet_name: str, max_col: str = "Z") -> List[List[str]]:
@@ -253,48 +260,145 @@ def _extract_drive_file_id(link: str) -> Optional[str]:
     return None
 
 
+_attachment_cache = None
+
+
+def _get_attachment_cache():
+    global _attachment_cache
+    if _attachment_cache is None:
+        from app.database import CACHE_DIR
+        from app.services.disk_cache import DiskCache
+        _attachment_cache = DiskCache(
+            os.path.join(CACHE_DIR, "drive_attachments"), ATTACHMENT_CACHE_MB * 1024 * 1024
+        )
+    return _attachment_cache
+
+
 def _download_drive_file(file_id: str) -> Tuple[bytes, str, str]:
-    """Télécharge un fichier depuis Drive. Retourne (contenu, nom_fichier, mimetype)."""
+    """
+    Télécharge un fichier depuis Drive. Retourne (contenu, nom_fichier, mimetype).
+    Le contenu est mis en cache disque sous (file_id, md5Checksum ou modifiedTime) :
+    seul l'appel de métadonnées est refait tant que le fichier n'a pas changé.
+    """
     drive = _get_drive_client()
-    meta = drive.files().get(fileId=file_id, fields="name,mimeType").execute()
+    meta = drive.files().get(fileId=file_id, fields="name,mimeType,modifiedTime,md5Checksum").execute()
     name = meta.get("name", "piece_jointe")
     mime = meta.get("mimeType", "application/octet-stream")
+    version = meta.get("md5Checksum") or meta.get("modifiedTime")
+    cache = _get_attachment_cache() if version else None
+    if cache is not None:
+        hit = cache.get(f"{file_id}:{version}")
+        if hit is not None:
+            return hit[0], name, mime
     content = drive.files().get_media(fileId=file_id).execute()
+    if cache is not None:
+        cache.put(f"{file_id}:{version}", content, {"name": name, "mime": mime})
     return content, name, mime
 
 
-def _send_email_gmail(
+def _build_attachment_parts(attachments: List[Tuple[bytes, str, str]]) -> List[Any]:
+    """Encode les pièces jointes une seule fois (parties MIME partagées par tous les messages)."""
+    from email.message import MIMEPart
+    parts = []
+    for content, filename, mime_type in attachments:
+        maintype, _, subtype = (mime_type or "application/octet-stream").partition("/")
+        if not subtype:
+            subtype = "octet-stream"
+        part = MIMEPart()
+        part.set_content(content, maintype=maintype, subtype=subtype, filename=filename)
+        parts.append(part)
+    return parts
+
+
+def _build_email_raw(
     to_email: str,
     cc_emails: List[str],
     subject: str,
     body_plain: str,
-    attachments: List[Tuple[bytes, str, str]],
+    attachment_parts: List[Any],
 ) -> str:
-    """
-    Envoie un email via l'API Gmail (compte OAuth).
-    attachments: liste de (contenu_bytes, nom_fichier, mimetype).
-    Retourne l'id du message envoyé.
-    """
+    """Construit le message (une seule fois, réutilisé par les nouvelles tentatives) encodé pour l'API Gmail."""
     from email.message import EmailMessage
     if not to_email or "@" not in to_email:
         raise ValueError("Destinataire email invalide")
-    gmail = _get_gmail_client()
     message = EmailMessage()
     message["To"] = to_email
     if cc_emails:
         message["Cc"] = ", ".join(cc_emails)
     message["Subject"] = subject
     message.set_content(body_plain)
-    for content, filename, mime_type in attachments:
-        maintype, _, subtype = (mime_type or "application/octet-stream").partition("/")
-        if not subtype:
-            subtype = "octet-stream"
-        message.add_attachment(content, maintype=maintype, subtype=subtype, filename=filename)
-    raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    sent = gmail.users().messages().send(userId="me", body={"raw": raw}).execute()
+    if attachment_parts:
+        message.make_mixed()
+        for part in attachment_parts:
+            message.attach(part)
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+
+def _http_status(error: Exception) -> Optional[int]:
+    status = getattr(getattr(error, "resp", None), "status", None)
+    return int(status) if status is not None else None
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """429 ou 403 rateLimitExceeded/userRateLimitExceeded : la requête a été refusée, on peut la rejouer."""
+    status = _http_status(error)
+    if status == 429:
+        return True
+    if status == 403:
+        content = getattr(error, "content", b"") or b""
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", "ignore")
+        return "rateLimitExceeded" in content or "userRateLimitExceeded" in content
+    return False
+
+
+def _is_transient(error: Exception) -> bool:
+    """Quota (voir _is_rate_limited) ou 5xx : erreur transitoire, on réessaie les lectures."""
+    status = _http_status(error)
+    return _is_rate_limited(error) or (status is not None and status >= 500)
+
+
+def _with_backoff(fn, max_attempts: int = 5, base_delay: float = 1.0, retry_on=_is_transient):
+    """Exécute fn() avec backoff exponentiel (+ gigue) tant que retry_on(erreur) le permet."""
+    import random
+    for attempt in range(max_attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_attempts - 1 or not retry_on(e):
+                raise
+            time.sleep(base_delay * (2 ** attempt) + random.uniform(0, base_delay))
+
+
+def _send_raw_gmail(raw: str) -> str:
+    """
+    Envoie un message déjà encodé via l'API Gmail. Retourne l'id du message.
+    Backoff sur les refus de quota uniquement : après un 5xx le mail a pu partir, le rejouer
+    risquerait un doublon chez le fournisseur.
+    """
+    def _send():
+        gmail = _get_gmail_client()
+        return gmail.users().messages().send(userId="me", body={"raw": raw}).execute()
+    sent = _with_backoff(_send, retry_on=_is_rate_limited)
     return sent.get("id", "")
 
 
+def _send_email_gmail(
+    to_email: str,
+    cc_emails: List[str],
+    subject: str,
+    body_plain: str,
+    attachments: List[Tuple[bytes, str, str]],
+) -> str:
+    """
+    Envoie un email via l'API Gmail (compte OAuth).
+    attachments: liste de (contenu_bytes, nom_fichier, mimetype).
+    Retourne l'id du message envoyé.
+    """
+    raw = _build_email_raw(to_email, cc_emails, subject, body_plain, _build_attachment_parts(attachments))
+    return _send_raw_gmail(raw)
+
+
 def _build_supplier_col_map(headers: List[str]) -> Dict[str, int]:
     """
     Construit le mapping colonne -> clé à partir de la ligne d'en-têtes CONTACT FOURNISSEURS.
@@ -427,6 +531,7 @@ async def create_client_full(
         valueInputOption="USER_ENTERED",
         body={"values": [row]}
     ).execute()
+    invalidate_cache(SHEET_CLIENTS)
     
     return {
         "success": True,
@@ -512,6 +617,87 @@ def _row_to_task(row: List[str]) -> Dict[str, Any]:
     }
 
 
+# ── Cache des feuilles ────────────────────────────────────────────────────────
+# { nom_feuille: {"data": ..., "modified": modifiedTime Drive, "checked_at": monotonic} }
+_sheet_cache: Dict[str, Dict[str, Any]] = {}
+_sheet_locks: Dict[str, threading.Lock] = {}
+
+
+def _spreadsheet_modified_time() -> Optional[str]:
+    """modifiedTime Drive du classeur (None si Drive indisponible : pas de revalidation conditionnelle)."""
+    try:
+        drive = _get_drive_client()
+        meta = drive.files().get(fileId=SPREADSHEET_ID, fields="modifiedTime").execute()
+        return meta.get("modifiedTime")
+    except Exception:
+        return None
+
+
+def _cached_sheet(sheet_name: str, loader):
+    """
+    Retourne les données parsées d'une feuille, rechargées au plus toutes les CACHE_TTL_SECONDS.
+    À expiration, si le modifiedTime Drive du classeur n'a pas bougé, le cache est prolongé sans relire la feuille.
+    """
+    lock = _sheet_locks.setdefault(sheet_name, threading.Lock())
+    with lock:
+        now = time.monotonic()
+        entry = _sheet_cache.get(sheet_name)
+        if entry and now - entry["checked_at"] < CACHE_TTL_SECONDS:
+            return entry["data"]
+        modified = _spreadsheet_modified_time()
+        if entry and modified and entry["modified"] == modified:
+            entry["checked_at"] = now
+            return entry["data"]
+        data = loader()
+        _sheet_cache[sheet_name] = {"data": data, "modified": modified, "checked_at": now}
+        return data
+
+
+def invalidate_cache(*sheet_names: str) -> None:
+    """Invalide le cache des feuilles données (toutes si aucune). À appeler après chaque écriture."""
+    if not sheet_names:
+        _sheet_cache.clear()
+        return
+    for name in sheet_names:
+        _sheet_cache.pop(name, None)
+
+
+def _load_clients() -> Dict[str, Any]:
+    rows = _read_sheet(SHEET_CLIENTS)
+    clients = [_row_to_client(row) for row in rows[1:] if _safe(row, COL["code_union"])] if rows else []
+    by_code: Dict[str, Dict[str, Any]] = {}
+    for c in clients:
+        by_code.setdefault(c["code_union"], c)
+    return {"list": clients, "by_code": by_code}
+
+
+def _load_suppliers() -> Dict[str, Any]:
+    rows = _read_sheet(SHEET_SUPPLIERS)
+    suppliers: List[Dict[str, Any]] = []
+    if rows:
+        col_map = _build_supplier_col_map(rows[0])
+        if not col_map:
+            col_map = COL_SUP_FALLBACK
+        idx_entreprise = col_map.get("entreprise", 0)
+        suppliers = [
+            _row_to_supplier(row, col_map)
+            for row in rows[1:]
+            if _safe(row, idx_entreprise)
+        ]
+    # Même règle que l'ancien dict construit à chaque envoi : la dernière ligne d'une entreprise l'emporte
+    by_name = {s["entreprise"].upper(): s for s in suppliers if s.get("entreprise")}
+    return {"list": suppliers, "by_name": by_name}
+
+
+def _load_tasks() -> Dict[str, Any]:
+    rows = _read_sheet(SHEET_TASKS)
+    tasks = [_row_to_task(row) for row in rows[1:] if _safe(row, COL_TASK["id_tache"])] if rows else []
+    by_code: Dict[str, List[Dict[str, Any]]] = {}
+    for t in tasks:
+        by_code.setdefault(t["code_union"], []).append(t)
+    return {"list": tasks, "by_code": by_code}
+
+
 # ── API publique du service ───────────────────────────────────────────────────
 
 def get_clients(with_ouverture_only: bool = False) -> List[Dict[str, Any]]:
@@ -519,13 +705,10 @@ def get_clients(with_ouverture_only: bool = False) -> List[Dict[str, Any]]:
     Retourne la liste des clients depuis LISTE CLIENT 2.
     Si with_ouverture_only=True, ne retourne que ceux avec OUVERTURE CHEZ renseigné.
     """
-    rows = _read_sheet(SHEET_CLIENTS)
-    if not rows:
-        return []
-    clients = [_row_to_client(row) for row in rows[1:] if _safe(row, COL["code_union"])]
+    clients = _cached_sheet(SHEET_CLIENTS, _load_clients)["list"]
     if with_ouverture_only:
-        clients = [c for c in clients if c["ouverture_chez"]]
-    return clients
+        return [c for c in clients if c["ouverture_chez"]]
+    return list(clients)
 
 
 def get_suppliers() -> List[Dict[str, Any]]:
@@ -534,39 +717,25 @@ def get_suppliers() -> List[Dict[str, Any]]:
     La structure de la feuille peut avoir changé : on lit la première ligne comme en-têtes
     et on mappe dynamiquement les colonnes (entreprise, nom, prénom, mail, etc.).
     """
-    rows = _read_sheet(SHEET_SUPPLIERS)
-    if not rows:
-        return []
-    headers = rows[0]
-    col_map = _build_supplier_col_map(headers)
-    if not col_map:
-        col_map = COL_SUP_FALLBACK
-    idx_entreprise = col_map.get("entreprise", 0)
-    return [
-        _row_to_supplier(row, col_map)
-        for row in rows[1:]
-        if _safe(row, idx_entreprise)
-    ]
+    return list(_cached_sheet(SHEET_SUPPLIERS, _load_suppliers)["list"])
+
+
+def get_supplier_index() -> Dict[str, Dict[str, Any]]:
+    """Contacts fournisseurs indexés par nom d'entreprise en majuscules."""
+    return _cached_sheet(SHEET_SUPPLIERS, _load_suppliers)["by_name"]
 
 
 def get_tasks(code_union: Optional[str] = None) -> List[Dict[str, Any]]:
     """Retourne les tâches, optionnellement filtrées par code union."""
-    rows = _read_sheet(SHEET_TASKS)
-    if not rows:
-        return []
-    tasks = [_row_to_task(row) for row in rows[1:] if _safe(row, COL_TASK["id_tache"])]
+    data = _cached_sheet(SHEET_TASKS, _load_tasks)
     if code_union:
-        tasks = [t for t in tasks if t["code_union"] == code_union]
-    return tasks
+        return list(data["by_code"].get(code_union, []))
+    return list(data["list"])
 
 
 def get_client_by_code(code_union: str) -> Optional[Dict[str, Any]]:
     """Retourne un client précis par code union."""
-    clients = get_clients()
-    for c in clients:
-        if c["code_union"] == code_union:
-            return c
-    return None
+    return _cached_sheet(SHEET_CLIENTS, _load_clients)["by_code"].get(code_union)
 
 
 # ── Génération d'email fournisseur ────────────────────────────────────────────
@@ -686,11 +855,10 @@ def send_emails_to_suppliers(
     if not client:
         raise ValueError(f"Client {code_union} introuvable")
     cc = cc_emails if cc_emails is not None else _get_cc_emails_from_env()
-    all_suppliers = get_suppliers()
-    sup_map = {s["entreprise"].upper(): s for s in all_suppliers if s.get("entreprise")}
+    sup_map = get_supplier_index()
 
-    # Pièces jointes : télécharger depuis Drive une seule fois pour tous les mails
-    attachments: List[Tuple[bytes, str, str]] = []
+    # Pièces jointes : télécharger depuis Drive une seule fois pour tous les mails (en parallèle)
+    file_ids = []
     for key, link in [
         ("rib", client.get("rib", "")),
         ("kbis", client.get("kbis", "")),
@@ -699,50 +867,57 @@ def send_emails_to_suppliers(
         if not link:
             continue
         file_id = _extract_drive_file_id(link)
-        if not file_id:
-            continue
+        if file_id:
+            file_ids.append(file_id)
+
+    def _download(file_id: str) -> Optional[Tuple[bytes, str, str]]:
         try:
-            content, name, mime = _download_drive_file(file_id)
-            attachments.append((content, name, mime))
+            return _with_backoff(lambda: _download_drive_file(file_id))
         except Exception:
-            pass  # on ignore les pièces injoignables
+            return None  # on ignore les pièces injoignables
+
+    workers = max(1, EMAIL_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        downloaded = list(executor.map(_download, file_ids))
+    attachments = [a for a in downloaded if a is not None]
+    attachment_parts = _build_attachment_parts(attachments)
 
-    results = []
-    for name in supplier_names:
+    def _dispatch(name: str) -> Dict[str, Any]:
         supplier = sup_map.get(name.upper())
         if not supplier:
-            results.append({
+            return {
                 "fournisseur": name,
                 "success": False,
                 "error": "Contact fournisseur introuvable (pas d'email dans CONTACT FOURNISSEURS)",
-            })
-            continue
+            }
         to_email = (supplier.get("mail") or "").strip()
         if not to_email or "@" not in to_email:
-            results.append({
+            return {
                 "fournisseur": name,
                 "success": False,
                 "error": "Email du contact fournisseur manquant ou invalide",
-            })
-            continue
+            }
         try:
             email_data = generate_email(client, supplier)
-            msg_id = _send_email_gmail(
+            raw = _build_email_raw(
                 to_email=to_email,
                 cc_emails=cc,
                 subject=email_data["sujet"],
                 body_plain=email_data["corps"],
-                attachments=attachments,
+                attachment_parts=attachment_parts,
             )
-            results.append({
+            return {
                 "fournisseur": name,
                 "success": True,
-                "message_id": msg_id,
-            })
+                "message_id": _send_raw_gmail(raw),
+            }
         except Exception as e:
-            results.append({
+            return {
                 "fournisseur": name,
                 "success": False,
                 "error": str(e),
-            })
-    return results
+            }
+
+    # Un email par fournisseur, envois en parallèle (résultats dans l'ordre de supplier_names)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_dispatch, supplier_names))
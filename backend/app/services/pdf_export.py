@@ -7,16 +7,17 @@ import json
 import logging
 import mimetypes
 import os
+import threading
+import time
 from typing import Dict, Optional, List, Tuple, Any
 from io import BytesIO
-from jinja2 import Template
 try:
     from xhtml2pdf import pisa
     XHTML2PDF_AVAILABLE = True
 except ImportError:
     pisa = None
     XHTML2PDF_AVAILABLE = False
-from app.services.compute import get_entity_detail_with_rfa
+from app.services.compute import build_entity_detail
 from app.services.contract_resolver import get_contract_by_id
 from app.services.rfa_calculator import load_contract_rules, load_entity_overrides
 from app.storage import get_import, ImportData
@@ -26,6 +27,18 @@ from datetime import datetime
 _LOG = logging.getLogger(__name__)
 _MAX_PARTNER_LOGOS = 12
 
+# Cache process des logos PDF (data URI prêts) :
+# - lot complet (requêtes AppSettings/Ad/SupplierLogo) réutilisé PDF_ASSET_CACHE_TTL secondes (fenêtres des annonces),
+#   PDF_ASSET_RETRY_TTL secondes seulement si un logo n'a pas pu être chargé (nouvel essai rapide) ;
+# - data URI par référence : fichier local versionné par (mtime, taille), URL distante gardée PDF_REMOTE_ASSET_TTL secondes.
+# invalidate_pdf_asset_cache() est appelé par les routes d'écriture (logos, annonces, paramètres, uploads).
+_ASSET_BUNDLE_TTL = float(os.environ.get("PDF_ASSET_CACHE_TTL", "300"))
+_REMOTE_ASSET_TTL = float(os.environ.get("PDF_REMOTE_ASSET_TTL", "3600"))
+_ASSET_RETRY_TTL = float(os.environ.get("PDF_ASSET_RETRY_TTL", "15"))
+_asset_lock = threading.Lock()
+_data_uri_cache: Dict[str, Tuple[str, float, str]] = {}   # ref -> (version, chargé_à, data URI)
+_header_assets_cache: Dict[str, Any] = {}                  # {"at": monotonic, "assets": {...}}
+
 
 def _local_path_from_api_uploads(url: str) -> Optional[str]:
     """Convertit /api/uploads/... vers un chemin disque (backend local)."""
@@ -107,11 +120,82 @@ def _fetch_image_as_data_uri(ref: str) -> Optional[str]:
     return f"data:{mime};base64,{b64}"
 
 
+def _asset_version(ref: str) -> Optional[str]:
+    """Version de contenu d'une référence image : (mtime, taille) pour un fichier local, "remote" sinon."""
+    if ref.startswith("/api/uploads/"):
+        path = _local_path_from_api_uploads(ref)
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return f"{st.st_mtime_ns}:{st.st_size}"
+    return "remote"
+
+
+def _cached_image_data_uri(ref: str, failed: Optional[List[str]] = None) -> Optional[str]:
+    """
+    _fetch_image_as_data_uri avec cache process (les échecs ne sont pas mis en cache ; ils sont
+    ajoutés à failed si fourni).
+    """
+    ref = (ref or "").strip()
+    if not ref:
+        return None
+    version = _asset_version(ref)
+    if version is None:
+        return None
+    now = time.monotonic()
+    hit = _data_uri_cache.get(ref)
+    if hit and hit[0] == version and (version != "remote" or now - hit[1] < _REMOTE_ASSET_TTL):
+        return hit[2]
+    data = _fetch_image_as_data_uri(ref)
+    if data:
+        _data_uri_cache[ref] = (version, now, data)
+    elif failed is not None:
+        failed.append(ref)
+    return data
+
+
+def invalidate_pdf_asset_cache() -> None:
+    """Vide le cache des logos PDF (après écriture d'un logo, d'une annonce, d'un paramètre ou d'un upload)."""
+    with _asset_lock:
+        _data_uri_cache.clear()
+        _header_assets_cache.clear()
+
+
+def _assets_digest(assets: Dict[str, Any]) -> str:
+    import hashlib
+    raw = json.dumps(assets, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
 def collect_pdf_header_assets() -> Dict[str, Any]:
     """
     Logos pour l'en-tête PDF : société (AppSettings company_logo), annonces type logo (publicité),
     logos fournisseurs actifs. Retourne des data URI prêts pour <img src="...">.
+    Résultat mis en cache (voir _ASSET_BUNDLE_TTL / _ASSET_RETRY_TTL / invalidate_pdf_asset_cache).
     """
+    with _asset_lock:
+        cached = _header_assets_cache.get("assets")
+        if cached is None or time.monotonic() - _header_assets_cache.get("at", 0) >= _header_assets_cache.get("ttl", 0):
+            cached = _collect_pdf_header_assets_uncached()
+            failed = cached.pop("_failed", [])
+            if cached.pop("_complete", False):
+                _header_assets_cache["assets"] = cached
+                _header_assets_cache["digest"] = _assets_digest(cached)  # clé du cache des PDF produits
+                _header_assets_cache["at"] = time.monotonic()
+                _header_assets_cache["ttl"] = _ASSET_RETRY_TTL if failed else _ASSET_BUNDLE_TTL
+                if failed:
+                    _LOG.info("PDF header assets: %d logo(s) non chargé(s), nouvel essai dans %ss", len(failed), _ASSET_RETRY_TTL)
+    return {
+        "union_logo_data_uri": cached.get("union_logo_data_uri"),
+        "partner_logo_data_uris": list(cached.get("partner_logo_data_uris") or []),
+        "supplier_logo_uri_by_key": dict(cached.get("supplier_logo_uri_by_key") or {}),
+    }
+
+
+def _collect_pdf_header_assets_uncached() -> Dict[str, Any]:
     out: Dict[str, Any] = {
         "union_logo_data_uri": None,
         "partner_logo_data_uris": [],
@@ -129,6 +213,7 @@ def collect_pdf_header_assets() -> Dict[str, Any]:
     partner_uris: List[str] = []
     supplier_uri_by_key: Dict[str, str] = {}
     seen_raw: set = set()
+    failed: List[str] = []
     now = datetime.now()
 
     try:
@@ -137,7 +222,7 @@ def collect_pdf_header_assets() -> Dict[str, Any]:
             company_raw = (st.value or "").strip() if st else ""
             if company_raw:
                 seen_raw.add(company_raw)
-                union_uri = _fetch_image_as_data_uri(company_raw)
+                union_uri = _cached_image_data_uri(company_raw, failed)
 
             ads = session.exec(
                 select(Ad)
@@ -160,7 +245,7 @@ def collect_pdf_header_assets() -> Dict[str, Any]:
                 if not u or u in seen_raw:
                     continue
                 seen_raw.add(u)
-                data = _fetch_image_as_data_uri(u)
+                data = _cached_image_data_uri(u, failed)
                 if data:
                     partner_uris.append(data)
 
@@ -175,7 +260,7 @@ def collect_pdf_header_assets() -> Dict[str, Any]:
                 u = sl.image_url.strip()
                 if not u:
                     continue
-                data = _fetch_image_as_data_uri(u)
+                data = _cached_image_data_uri(u, failed)
                 if data:
                     supplier_uri_by_key[sl.supplier_key.upper().strip()] = data
                 if len(partner_uris) >= _MAX_PARTNER_LOGOS:
@@ -193,6 +278,8 @@ def collect_pdf_header_assets() -> Dict[str, Any]:
     out["union_logo_data_uri"] = union_uri
     out["partner_logo_data_uris"] = partner_uris
     out["supplier_logo_uri_by_key"] = supplier_uri_by_key
+    out["_complete"] = True
+    out["_failed"] = failed
     return out
 
 
@@ -430,6 +517,54 @@ def format_percent(value: float) -> str:
     return f"{float(value) * 100:.2f}%"
 
 
+# Environnement Jinja2 unique : templates compilés une fois par processus (cache mémoire),
+# bytecode éventuellement persisté sur disque (CACHE_DIR/jinja), helpers de format exposés
+# en filtres ({{ x|format_amount }}) et en fonctions ({{ format_amount(x) }}).
+_TEMPLATE_SOURCES = {
+    "espace_client.html": lambda: _get_espace_client_template(),
+    "rapport_simple.html": lambda: _get_simple_pdf_template(),
+}
+_jinja_env = None
+_jinja_env_lock = threading.Lock()
+
+
+def _load_template_source(name: str):
+    getter = _TEMPLATE_SOURCES.get(name)
+    if getter is None:
+        return None
+    # Sources embarquées dans le module : toujours à jour pour la durée du processus
+    return getter(), None, lambda: True
+
+
+def _get_jinja_env():
+    global _jinja_env
+    if _jinja_env is not None:
+        return _jinja_env
+    with _jinja_env_lock:
+        if _jinja_env is None:
+            from jinja2 import Environment, FileSystemBytecodeCache, FunctionLoader
+            bytecode_cache = None
+            if os.environ.get("PDF_JINJA_BYTECODE_CACHE", "1") != "0":
+                try:
+                    from app.database import CACHE_DIR
+                    jinja_dir = os.path.join(CACHE_DIR, "jinja")
+                    os.makedirs(jinja_dir, exist_ok=True)
+                    bytecode_cache = FileSystemBytecodeCache(jinja_dir)
+                except Exception as e:
+                    _LOG.debug("PDF: cache bytecode Jinja indisponible: %s", e)
+            env = Environment(
+                loader=FunctionLoader(_load_template_source),
+                bytecode_cache=bytecode_cache,
+                auto_reload=False,
+            )
+            env.filters["format_amount"] = format_amount
+            env.filters["format_percent"] = format_percent
+            env.globals["format_amount"] = format_amount
+            env.globals["format_percent"] = format_percent
+            _jinja_env = env
+    return _jinja_env
+
+
 def build_cotisation_pdf_detail_rows(
     mode: str,
     c_amt: float,
@@ -489,11 +624,63 @@ def _pil_image_from_data_uri(data_uri: Optional[str]) -> Optional[Any]:
         return None
 
 
+# Bandeau : ne dépend que du logo société → mémoïsé par hash du logo (mémoire + disque).
+# Incrémenter _HERO_BANNER_VERSION si le dessin change (invalide le cache disque).
+_HERO_BANNER_VERSION = 1
+_HERO_BANNER_MEMORY_MAX = 8
+_hero_banner_cache: Dict[str, str] = {}
+_hero_banner_disk = None
+
+
+def _get_hero_banner_disk_cache():
+    global _hero_banner_disk
+    if _hero_banner_disk is None:
+        from app.database import CACHE_DIR
+        from app.services.disk_cache import DiskCache
+        _hero_banner_disk = DiskCache(os.path.join(CACHE_DIR, "pdf_hero_banners"), 20 * 1024 * 1024)
+    return _hero_banner_disk
+
+
 def build_pdf_hero_banner_data_uri(union_logo_data_uri: Optional[str] = None) -> Optional[str]:
     """
     Bandeau décoratif (dégradé bleu GU + liseré or) en PNG embarqué en data URI pour xhtml2pdf.
     Si union_logo_data_uri est fourni (PNG/JPEG depuis collect_pdf_header_assets), le logo est centré dans la zone bleue.
+    Résultat mis en cache par hash du logo (mémoire puis disque).
     """
+    import hashlib
+    logo_hash = hashlib.sha256((union_logo_data_uri or "").encode("utf-8")).hexdigest()
+    key = f"hero_banner:v{_HERO_BANNER_VERSION}:{logo_hash}"
+    cached = _hero_banner_cache.get(key)
+    if cached is not None:
+        return cached
+
+    disk = None
+    try:
+        disk = _get_hero_banner_disk_cache()
+        hit = disk.get(key)
+    except Exception as e:
+        _LOG.debug("PDF hero banner: cache disque indisponible: %s", e)
+        hit = None
+    if hit is not None:
+        data_uri = hit[0].decode("ascii")
+    else:
+        data_uri = _render_pdf_hero_banner(union_logo_data_uri)
+        if data_uri is None:
+            return None
+        if disk is not None:
+            try:
+                disk.put(key, data_uri.encode("ascii"))
+            except Exception as e:
+                _LOG.debug("PDF hero banner: écriture cache disque échouée: %s", e)
+
+    if len(_hero_banner_cache) >= _HERO_BANNER_MEMORY_MAX:
+        _hero_banner_cache.pop(next(iter(_hero_banner_cache)))
+    _hero_banner_cache[key] = data_uri
+    return data_uri
+
+
+def _render_pdf_hero_banner(union_logo_data_uri: Optional[str]) -> Optional[str]:
+    """Dessine le bandeau (PIL) et l'encode en PNG data URI."""
     try:
         from PIL import Image, ImageDraw
     except ImportError:
@@ -649,8 +836,7 @@ def generate_espace_client_pdf_html(
     date_generated = datetime.now().strftime("%d/%m/%Y")
     hero_banner_data_uri = build_pdf_hero_banner_data_uri(header_assets.get("union_logo_data_uri"))
 
-    template_str = _get_espace_client_template()
-    template = Template(template_str)
+    template = _get_jinja_env().get_template("espace_client.html")
     html_content = template.render(
         entity_label=entity_label,
         entity_id=entity_id,
@@ -676,8 +862,6 @@ def generate_espace_client_pdf_html(
         total_objectives=total_objectives,
         global_rows=global_rows,
         tri_rows=tri_rows,
-        format_amount=format_amount,
-        format_percent=format_percent,
         union_logo_data_uri=header_assets.get("union_logo_data_uri"),
         partner_logo_data_uris=header_assets.get("partner_logo_data_uris") or [],
         hero_banner_data_uri=hero_banner_data_uri,
@@ -1110,7 +1294,157 @@ def generate_pdf_html(
     Format simple et lisible (fallback si pas de contrat ou contract_applied.id absent).
     Reprend la cotisation Union si transmise (comme le template Espace Client).
     """
-    template_str = """
+    template = _get_jinja_env().get_template("rapport_simple.html")
+    
+    # Préparer les données formatées
+    rfa_data = entity_data.get('rfa', {})
+    ca_data = entity_data.get('ca', {})
+    
+    # Accéder aux données RFA (peut être 'global_items' ou 'global' selon la sérialisation)
+    global_rfa = rfa_data.get('global_items', rfa_data.get('global', {}))
+    tri_rfa = rfa_data.get('tri_items', rfa_data.get('tri', {}))
+    
+    # Calculer le CA total UNIQUEMENT avec les globales (pas les tri-partites)
+    ca_global_total = 0.0
+    for key in get_global_fields():
+        ca_global_total += ca_data.get('global', {}).get(key, 0) or 0
+    
+    # Calculer la RFA totale
+    rfa_total = rfa_data.get('totals', {}).get('grand_total', 0) or 0
+    
+    # Calculer le taux RFA global
+    rfa_rate_global = (rfa_total / ca_global_total * 100) if ca_global_total > 0 else 0
+    
+    # Construire la liste de toutes les plateformes (même celles à 0)
+    all_items = []
+    
+    # Ajouter les plateformes globales
+    for key in get_global_fields():
+        _, default_label = get_field_by_key(key)
+        ca = ca_data.get('global', {}).get(key, 0) or 0
+        rfa_item = global_rfa.get(key, {})
+        
+        # Pour les globales, on prend le total (RFA + Bonus)
+        # rfa_item est un dict (build_entity_detail)
+        if rfa_item and isinstance(rfa_item, dict):
+            total_dict = rfa_item.get('total', {})
+            if total_dict and isinstance(total_dict, dict):
+                rfa_value = float(total_dict.get('value', 0) or 0)
+                rfa_rate = float(total_dict.get('rate', 0) or 0)
+            else:
+                rfa_value = 0.0
+                rfa_rate = 0.0
+        else:
+            rfa_value = 0.0
+            rfa_rate = 0.0
+        
+        # Formater le label (enlever " (global)" si présent)
+        label = default_label.replace(" (global)", "").replace(" - Global", "")
+        
+        all_items.append({
+            'label': label,
+            'ca': ca,
+            'rate': rfa_rate,
+            'value': rfa_value,
+            'ca_formatted': format_amount(ca),
+            'rate_formatted': format_percent(rfa_rate),
+            'value_formatted': format_amount(rfa_value)
+        })
+    
+    # Ajouter les tri-partites
+    for key in get_tri_fields():
+        _, default_label = get_field_by_key(key)
+        ca = ca_data.get('tri', {}).get(key, 0) or 0
+        tri_item = tri_rfa.get(key, {})
+        
+        # tri_item est un dict (build_entity_detail)
+        if tri_item and isinstance(tri_item, dict):
+            rfa_value = float(tri_item.get('value', 0) or 0)
+            rfa_rate = float(tri_item.get('rate', 0) or 0)
+        else:
+            rfa_value = 0.0
+            rfa_rate = 0.0
+        
+        all_items.append({
+            'label': default_label,
+            'ca': ca,
+            'rate': rfa_rate,
+            'value': rfa_value,
+            'ca_formatted': format_amount(ca),
+            'rate_formatted': format_percent(rfa_rate),
+            'value_formatted': format_amount(rfa_value)
+        })
+    
+    # Trier par label pour un affichage cohérent
+    all_items.sort(key=lambda x: x['label'])
+    
+    # Préparer les infos adhérent
+    if mode == 'client':
+        adherent_name = entity_data.get('nom_client') or entity_data.get('code_union', '')
+    else:
+        adherent_name = entity_data.get('groupe_client', '')
+    
+    from datetime import datetime
+    date_generated = datetime.now().strftime("%d/%m/%Y")
+    year = datetime.now().strftime("%Y")
+
+    rfa_gross = float(rfa_total)
+    c_amt = float(cotisation_amount or 0) if cotisation_amount is not None else 0.0
+    if c_amt < 0:
+        c_amt = 0.0
+    if cotisation_facturee is None and cotisation_deduite is None:
+        c_kind_raw = (cotisation_kind or "").strip().lower()
+        if c_kind_raw == "offerte":
+            c_fact, c_ded = False, False
+        elif c_amt > 0:
+            c_fact, c_ded = True, True
+        else:
+            c_fact, c_ded = False, False
+    elif cotisation_facturee is None or cotisation_deduite is None:
+        c_fact = bool(cotisation_facturee) if cotisation_facturee is not None else (c_amt > 0)
+        c_ded = bool(cotisation_deduite) if cotisation_deduite is not None else (c_amt > 0)
+    else:
+        c_fact = bool(cotisation_facturee)
+        c_ded = bool(cotisation_deduite)
+
+    cotisation_active = mode in ("client", "group") and c_amt > 0
+    cotisation_offerte = cotisation_active and not c_fact and not c_ded
+    if cotisation_active and c_ded:
+        rfa_display = max(rfa_gross - c_amt, 0.0)
+        rfa_main_label = "RFA Totale HT (nette)"
+    else:
+        rfa_display = rfa_gross
+        rfa_main_label = "RFA Totale HT"
+
+    all_items.extend(
+        build_cotisation_pdf_detail_rows(mode, c_amt, cotisation_active, cotisation_offerte, c_ded)
+    )
+
+    html_content = template.render(
+        entity_label=adherent_name,
+        adherent_name=adherent_name,
+        date_generated=date_generated,
+        year=year,
+        ca_total_formatted=format_amount(ca_global_total),
+        rfa_total_formatted=format_amount(rfa_total),
+        rfa_display_formatted=format_amount(rfa_display),
+        rfa_gross_formatted=format_amount(rfa_gross),
+        rfa_main_label=rfa_main_label,
+        rfa_rate_global_formatted=format_percent(rfa_rate_global / 100),  # format_percent attend un ratio
+        cotisation_active=cotisation_active,
+        cotisation_offerte=cotisation_offerte,
+        cotisation_facturee=c_fact,
+        cotisation_deduite=c_ded,
+        cotisation_amount_formatted=format_amount(c_amt) if cotisation_active else format_amount(0),
+        all_items=all_items,
+    )
+    
+    return html_content
+
+
+def _get_simple_pdf_template() -> str:
+    """Template HTML rapport RFA simple (sans contrat appliqué), compatible xhtml2pdf."""
+    return """
 <!DOCTYPE html>
 <html lang="fr">
 <head>
@@ -1331,153 +1665,140 @@ def generate_pdf_html(
 </body>
 </html>
     """
-    
-    template = Template(template_str)
-    
-    # Préparer les données formatées
-    rfa_data = entity_data.get('rfa', {})
-    ca_data = entity_data.get('ca', {})
-    
-    # Accéder aux données RFA (peut être 'global_items' ou 'global' selon la sérialisation)
-    global_rfa = rfa_data.get('global_items', rfa_data.get('global', {}))
-    tri_rfa = rfa_data.get('tri_items', rfa_data.get('tri', {}))
-    
-    # Calculer le CA total UNIQUEMENT avec les globales (pas les tri-partites)
-    ca_global_total = 0.0
-    for key in get_global_fields():
-        ca_global_total += ca_data.get('global', {}).get(key, 0) or 0
-    
-    # Calculer la RFA totale
-    rfa_total = rfa_data.get('totals', {}).get('grand_total', 0) or 0
-    
-    # Calculer le taux RFA global
-    rfa_rate_global = (rfa_total / ca_global_total * 100) if ca_global_total > 0 else 0
-    
-    # Construire la liste de toutes les plateformes (même celles à 0)
-    all_items = []
-    
-    # Ajouter les plateformes globales
-    for key in get_global_fields():
-        _, default_label = get_field_by_key(key)
-        ca = ca_data.get('global', {}).get(key, 0) or 0
-        rfa_item = global_rfa.get(key, {})
-        
-        # Pour les globales, on prend le total (RFA + Bonus)
-        # rfa_item est un dict après model_dump()
-        if rfa_item and isinstance(rfa_item, dict):
-            total_dict = rfa_item.get('total', {})
-            if total_dict and isinstance(total_dict, dict):
-                rfa_value = float(total_dict.get('value', 0) or 0)
-                rfa_rate = float(total_dict.get('rate', 0) or 0)
-            else:
-                rfa_value = 0.0
-                rfa_rate = 0.0
-        else:
-            rfa_value = 0.0
-            rfa_rate = 0.0
-        
-        # Formater le label (enlever " (global)" si présent)
-        label = default_label.replace(" (global)", "").replace(" - Global", "")
-        
-        all_items.append({
-            'label': label,
-            'ca': ca,
-            'rate': rfa_rate,
-            'value': rfa_value,
-            'ca_formatted': format_amount(ca),
-            'rate_formatted': format_percent(rfa_rate),
-            'value_formatted': format_amount(rfa_value)
-        })
-    
-    # Ajouter les tri-partites
-    for key in get_tri_fields():
-        _, default_label = get_field_by_key(key)
-        ca = ca_data.get('tri', {}).get(key, 0) or 0
-        tri_item = tri_rfa.get(key, {})
-        
-        # tri_item est un dict après model_dump()
-        if tri_item and isinstance(tri_item, dict):
-            rfa_value = float(tri_item.get('value', 0) or 0)
-            rfa_rate = float(tri_item.get('rate', 0) or 0)
-        else:
-            rfa_value = 0.0
-            rfa_rate = 0.0
-        
-        all_items.append({
-            'label': default_label,
-            'ca': ca,
-            'rate': rfa_rate,
-            'value': rfa_value,
-            'ca_formatted': format_amount(ca),
-            'rate_formatted': format_percent(rfa_rate),
-            'value_formatted': format_amount(rfa_value)
-        })
-    
-    # Trier par label pour un affichage cohérent
-    all_items.sort(key=lambda x: x['label'])
-    
-    # Préparer les infos adhérent
-    if mode == 'client':
-        adherent_name = entity_data.get('nom_client') or entity_data.get('code_union', '')
-    else:
-        adherent_name = entity_data.get('groupe_client', '')
-    
-    from datetime import datetime
-    date_generated = datetime.now().strftime("%d/%m/%Y")
-    year = datetime.now().strftime("%Y")
 
-    rfa_gross = float(rfa_total)
-    c_amt = float(cotisation_amount or 0) if cotisation_amount is not None else 0.0
-    if c_amt < 0:
-        c_amt = 0.0
-    if cotisation_facturee is None and cotisation_deduite is None:
-        c_kind_raw = (cotisation_kind or "").strip().lower()
-        if c_kind_raw == "offerte":
-            c_fact, c_ded = False, False
-        elif c_amt > 0:
-            c_fact, c_ded = True, True
-        else:
-            c_fact, c_ded = False, False
-    elif cotisation_facturee is None or cotisation_deduite is None:
-        c_fact = bool(cotisation_facturee) if cotisation_facturee is not None else (c_amt > 0)
-        c_ded = bool(cotisation_deduite) if cotisation_deduite is not None else (c_amt > 0)
-    else:
-        c_fact = bool(cotisation_facturee)
-        c_ded = bool(cotisation_deduite)
 
-    cotisation_active = mode in ("client", "group") and c_amt > 0
-    cotisation_offerte = cotisation_active and not c_fact and not c_ded
-    if cotisation_active and c_ded:
-        rfa_display = max(rfa_gross - c_amt, 0.0)
-        rfa_main_label = "RFA Totale HT (nette)"
-    else:
-        rfa_display = rfa_gross
-        rfa_main_label = "RFA Totale HT"
+def build_entity_pdf_html(
+    import_data: ImportData,
+    mode: str,
+    entity_id: str,
+    contract_id: Optional[int] = None,
+    cotisation_amount: Optional[float] = None,
+    cotisation_kind: Optional[str] = None,
+    cotisation_facturee: Optional[bool] = None,
+    cotisation_deduite: Optional[bool] = None,
+) -> str:
+    """Calcule le détail RFA de l'entité et retourne le HTML du rapport (identique à la page Espace Client)."""
+    # Détail sous forme de dict (clés 'global' / 'tri'), sans passer par le modèle Pydantic
+    entity_dict = build_entity_detail(
+        import_data, mode, entity_id, contract_id=contract_id
+    )
 
-    all_items.extend(
-        build_cotisation_pdf_detail_rows(mode, c_amt, cotisation_active, cotisation_offerte, c_ded)
+    return generate_espace_client_pdf_html(
+        entity_dict,
+        mode,
+        cotisation_amount=cotisation_amount,
+        cotisation_kind=cotisation_kind,
+        cotisation_facturee=cotisation_facturee,
+        cotisation_deduite=cotisation_deduite,
     )
 
-    html_content = template.render(
-        entity_label=adherent_name,
-        adherent_name=adherent_name,
-        date_generated=date_generated,
-        year=year,
-        ca_total_formatted=format_amount(ca_global_total),
-        rfa_total_formatted=format_amount(rfa_total),
-        rfa_display_formatted=format_amount(rfa_display),
-        rfa_gross_formatted=format_amount(rfa_gross),
-        rfa_main_label=rfa_main_label,
-        rfa_rate_global_formatted=format_percent(rfa_rate_global / 100),  # format_percent attend un ratio
-        cotisation_active=cotisation_active,
-        cotisation_offerte=cotisation_offerte,
-        cotisation_facturee=c_fact,
-        cotisation_deduite=c_ded,
-        cotisation_amount_formatted=format_amount(c_amt) if cotisation_active else format_amount(0),
-        all_items=all_items,
+
+def html_to_pdf_bytes(html_content: str) -> bytes:
+    """Convertit le HTML en PDF (xhtml2pdf). Fonction de niveau module : utilisable dans un pool de processus."""
+    if not XHTML2PDF_AVAILABLE:
+        raise RuntimeError("Export PDF non disponible dans cet environnement (xhtml2pdf non installé).")
+
+    pdf_buffer = BytesIO()
+    result = pisa.CreatePDF(html_content, dest=pdf_buffer, encoding='utf-8')
+    raw = pdf_buffer.getvalue()
+    # xhtml2pdf incrémente souvent err pour des avertissements CSS alors que le PDF est valide
+    if not raw.startswith(b"%PDF") or len(raw) < 64:
+        raise ValueError(
+            f"PDF invalide ou vide (xhtml2pdf err={result.err!r}, {len(raw)} octets)"
+        )
+    if result.err:
+        _LOG.warning(
+            "xhtml2pdf: %s avertissement(s) — PDF genere (%s octets)", result.err, len(raw)
+        )
+    return raw
+
+
+# Cache disque des PDF produits, adressé par les entrées du rendu (consulté avant tout calcul) :
+# import (empreinte des agrégats) + version des contrats/règles/overrides + entité, mode, contrat,
+# cotisation + date du jour (affichée dans le rapport) + lot de logos + gabarits.
+_PDF_CACHE_MB = int(os.environ.get("PDF_CACHE_MB", "500"))
+_pdf_output_cache = None
+_template_digest: Optional[str] = None
+
+
+def _get_pdf_output_cache():
+    global _pdf_output_cache
+    if _pdf_output_cache is None:
+        from app.database import CACHE_DIR
+        from app.services.disk_cache import DiskCache
+        _pdf_output_cache = DiskCache(os.path.join(CACHE_DIR, "pdf_output"), _PDF_CACHE_MB * 1024 * 1024)
+    return _pdf_output_cache
+
+
+def _header_assets_digest() -> str:
+    """Empreinte du lot de logos courant (calculée quand le lot est mis en cache, voir collect_pdf_header_assets)."""
+    assets = collect_pdf_header_assets()
+    with _asset_lock:
+        digest = _header_assets_cache.get("digest")
+    return digest or _assets_digest(assets)
+
+
+def _templates_digest() -> str:
+    global _template_digest
+    if _template_digest is None:
+        import hashlib
+        h = hashlib.sha256()
+        h.update(_get_espace_client_template().encode("utf-8"))
+        h.update(_get_simple_pdf_template().encode("utf-8"))
+        _template_digest = h.hexdigest()[:16]
+    return _template_digest
+
+
+def _pdf_cache_prefix(import_data: ImportData, contract_id: Optional[int]) -> Optional[str]:
+    """Partie de la clé commune à toutes les entités d'un import (None si le cache est désactivé ou indisponible)."""
+    if _PDF_CACHE_MB <= 0:
+        return None
+    try:
+        from sqlmodel import Session
+        from app.database import engine
+        from app.services.genie_cache import analysis_key
+        with Session(engine) as session:
+            version = analysis_key(import_data, session)
+        # Date du jour : le rapport affiche sa date (et son année) de génération
+        today = datetime.now().strftime("%Y-%m-%d")
+        return f"pdf:{version}:{contract_id}:{today}:{_header_assets_digest()}:{_templates_digest()}"
+    except Exception as e:
+        _LOG.debug("PDF: clé de cache indisponible: %s", e)
+        return None
+
+
+def _pdf_cache_key(
+    prefix: str,
+    mode: str,
+    entity_id: str,
+    cotisation_amount: Optional[float] = None,
+    cotisation_kind: Optional[str] = None,
+    cotisation_facturee: Optional[bool] = None,
+    cotisation_deduite: Optional[bool] = None,
+) -> str:
+    return json.dumps(
+        [prefix, mode, entity_id, cotisation_amount, cotisation_kind, cotisation_facturee, cotisation_deduite]
     )
-    
-    return html_content
+
+
+def _pdf_cache_get(key: Optional[str]) -> Optional[bytes]:
+    if key is None:
+        return None
+    try:
+        hit = _get_pdf_output_cache().get(key)
+    except Exception as e:
+        _LOG.debug("PDF: cache disque indisponible: %s", e)
+        return None
+    return hit[0] if hit is not None else None
+
+
+def _pdf_cache_put(key: Optional[str], raw: bytes) -> None:
+    if key is None:
+        return
+    try:
+        _get_pdf_output_cache().put(key, raw)
+    except Exception as e:
+        _LOG.debug("PDF: écriture cache disque échouée: %s", e)
 
 
 def generate_pdf_report(
@@ -1501,40 +1822,158 @@ def generate_pdf_report(
     if not import_data:
         raise ValueError(f"Import non trouvé: {import_id}")
 
-    entity_detail = get_entity_detail_with_rfa(
-        import_data, mode, entity_id, contract_id=contract_id
+    prefix = _pdf_cache_prefix(import_data, contract_id)
+    key = None if prefix is None else _pdf_cache_key(
+        prefix, mode, entity_id, cotisation_amount, cotisation_kind, cotisation_facturee, cotisation_deduite
     )
+    raw = _pdf_cache_get(key)
+    if raw is None:
+        html_content = build_entity_pdf_html(
+            import_data,
+            mode,
+            entity_id,
+            contract_id=contract_id,
+            cotisation_amount=cotisation_amount,
+            cotisation_kind=cotisation_kind,
+            cotisation_facturee=cotisation_facturee,
+            cotisation_deduite=cotisation_deduite,
+        )
+        raw = html_to_pdf_bytes(html_content)
+        _pdf_cache_put(key, raw)
+    return BytesIO(raw)
 
-    # Convertir en dict pour le template
-    # Utiliser by_alias=True pour utiliser 'global' et 'tri' au lieu de 'global_items' et 'tri_items'
-    entity_dict = entity_detail.model_dump(by_alias=True, mode='json')
 
-    # Générer le HTML (identique à la page Espace Client)
-    html_content = generate_espace_client_pdf_html(
-        entity_dict,
-        mode,
-        cotisation_amount=cotisation_amount,
-        cotisation_kind=cotisation_kind,
-        cotisation_facturee=cotisation_facturee,
-        cotisation_deduite=cotisation_deduite,
-    )
+# ── Export PDF en lot (ZIP) ───────────────────────────────────────────────────
+
+class _ZipSink:
+    """Flux d'écriture non « seekable » pour zipfile : les octets écrits sont récupérés par drain()."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._buf += data
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _html_to_pdf_safe(html_content: str) -> Tuple[Optional[bytes], Optional[str]]:
+    """Variante sans exception (résultat toujours sérialisable depuis un processus du pool)."""
+    try:
+        return html_to_pdf_bytes(html_content), None
+    except Exception as e:
+        return None, str(e)
+
+
+def bulk_pdf_filename(mode: str, entity_id: str) -> str:
+    entity_label = "".join(c if c.isalnum() or c in "-_." else "_" for c in entity_id.strip())
+    return f"RFA_{entity_label}_{mode}.pdf"
+
+
+def iter_bulk_pdf_zip(
+    import_data: ImportData,
+    jobs: List[Dict[str, Any]],
+    contract_id: Optional[int] = None,
+    max_workers: Optional[int] = None,
+):
+    """
+    Génère un ZIP (un PDF par entité) et le produit par morceaux (StreamingResponse).
+    jobs : [{"mode", "entity_id", "cotisation_amount", "cotisation_kind", "cotisation_facturee", "cotisation_deduite"}].
+
+    - un seul RfaContext (contrats, règles, overrides en mémoire) et un seul lot de logos pour tout le lot ;
+    - HTML construit dans ce processus par paquets, conversion xhtml2pdf dans un pool de processus
+      (repli séquentiel si le multiprocessing est indisponible, ex. serverless) ;
+    - PDF déjà présents dans le cache disque (mêmes entrées) réutilisés sans calcul ni conversion ;
+    - entités en erreur listées dans ERREURS.txt à la fin de l'archive.
+    """
+    import zipfile
+    from concurrent.futures import ProcessPoolExecutor
+    from app.services.rfa_context import RfaContext
 
     if not XHTML2PDF_AVAILABLE:
         raise RuntimeError("Export PDF non disponible dans cet environnement (xhtml2pdf non installé).")
 
-    # Générer le PDF avec xhtml2pdf
-    pdf_buffer = BytesIO()
-    result = pisa.CreatePDF(html_content, dest=pdf_buffer, encoding='utf-8')
-    pdf_buffer.seek(0)
-    raw = pdf_buffer.getvalue()
-    # xhtml2pdf incrémente souvent err pour des avertissements CSS alors que le PDF est valide
-    if not raw.startswith(b"%PDF") or len(raw) < 64:
-        raise ValueError(
-            f"PDF invalide ou vide (xhtml2pdf err={result.err!r}, {len(raw)} octets)"
-        )
-    if result.err:
-        import logging
-        logging.getLogger(__name__).warning(
-            "xhtml2pdf: %s avertissement(s) — PDF genere (%s octets)", result.err, len(raw)
-        )
-    return pdf_buffer
+    ctx = RfaContext()
+    collect_pdf_header_assets()  # préchauffe le cache des logos (partagé par toutes les entités)
+    prefix = _pdf_cache_prefix(import_data, contract_id)
+
+    workers = max_workers or int(os.environ.get("PDF_BULK_WORKERS", "0")) or (os.cpu_count() or 2)
+    pool = None
+    if workers > 1 and len(jobs) > 1:
+        try:
+            import multiprocessing
+            # spawn plutôt que fork : le serveur est multi-thread (voir genie_engine._get_analysis_pool)
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError, ImportError) as e:
+            _LOG.warning("PDF en lot: pool de processus indisponible (%s), conversion séquentielle", e)
+    batch_size = max(1, workers * 2)
+
+    sink = _ZipSink()
+    errors: List[str] = []
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+            for start in range(0, len(jobs), batch_size):
+                batch = jobs[start:start + batch_size]
+                keys = [
+                    None if prefix is None else _pdf_cache_key(
+                        prefix,
+                        job["mode"],
+                        job["entity_id"],
+                        job.get("cotisation_amount"),
+                        job.get("cotisation_kind"),
+                        job.get("cotisation_facturee"),
+                        job.get("cotisation_deduite"),
+                    )
+                    for job in batch
+                ]
+                cached = [_pdf_cache_get(key) for key in keys]
+                rendered: List[Tuple[Dict[str, Any], Optional[str], Optional[bytes], Optional[str]]] = []
+                misses: List[str] = []
+                with ctx.activate():
+                    for job, key, pdf in zip(batch, keys, cached):
+                        if pdf is not None:
+                            rendered.append((job, key, pdf, None))
+                            continue
+                        try:
+                            html = build_entity_pdf_html(
+                                import_data,
+                                job["mode"],
+                                job["entity_id"],
+                                contract_id=contract_id,
+                                cotisation_amount=job.get("cotisation_amount"),
+                                cotisation_kind=job.get("cotisation_kind"),
+                                cotisation_facturee=job.get("cotisation_facturee"),
+                                cotisation_deduite=job.get("cotisation_deduite"),
+                            )
+                            rendered.append((job, key, None, html))
+                            misses.append(html)
+                        except Exception as e:
+                            errors.append(f"{job['mode']} {job['entity_id']}: {e}")
+                converted = iter(pool.map(_html_to_pdf_safe, misses) if pool else map(_html_to_pdf_safe, misses))
+                for job, key, pdf, html in rendered:
+                    if pdf is None:
+                        pdf, err = next(converted)
+                        if err:
+                            errors.append(f"{job['mode']} {job['entity_id']}: {err}")
+                            continue
+                        _pdf_cache_put(key, pdf)
+                    zf.writestr(bulk_pdf_filename(job["mode"], job["entity_id"]), pdf)
+                    yield sink.drain()
+            if errors:
+                zf.writestr("ERREURS.txt", "\n".join(errors) + "\n")
+        yield sink.drain()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -300,8 +300,9 @@ def build_client_detail(
                 "delta": delta,
                 "delta_pct": delta_pct
             })
+        current_keys = {m[key] for m in merged}
         for item in previous_list:
-            if item[key] in {m[key] for m in merged}:
+            if item[key] in current_keys:
                 continue
             merged.append({
                 **item,
@@ -361,8 +362,9 @@ def build_client_detail(
                     level_index + 1
                 )
             merged.append(merged_item)
+        current_keys = {m.get(key) for m in merged}
         for item in prev:
-            if item.get(key) in {m.get(key) for m in merged}:
+            if item.get(key) in current_keys:
                 continue
             merged_item = {
                 key: item.get(key),
@@ -458,8 +460,9 @@ def build_platform_detail(
                 "delta": delta,
                 "delta_pct": delta_pct
             })
+        current_keys = {m["code_union"] for m in merged}
         for item in prev:
-            if item["code_union"] in {m["code_union"] for m in merged}:
+            if item["code_union"] in current_keys:
                 continue
             merged.append({
                 **item,
@@ -563,8 +566,9 @@ def build_marque_detail(
                 "delta": delta,
                 "delta_pct": delta_pct,
             })
+        current_keys = {m["code_union"] for m in merged}
         for item in prev:
-            if item["code_union"] in {m["code_union"] for m in merged}:
+            if item["code_union"] in current_keys:
                 continue
             merged.append({
                 **item,
@@ -655,8 +659,9 @@ def build_commercial_detail(
                 "delta": delta,
                 "delta_pct": delta_pct
             })
+        current_keys = {m[key] for m in merged}
         for item in prev:
-            if item[key] in {m[key] for m in merged}:
+            if item[key] in current_keys:
                 continue
             merged.append({
                 **item,
@@ -696,8 +701,10 @@ def _merge_by_key(current_list: List[Dict], previous_list: List[Dict], key_field
             "delta_pct": delta_pct,
         })
 
+    current_keys = {m[key_field] for m in merged}
+
     for item in previous_list:
-        if item[key_field] in {m[key_field] for m in merged}:
+        if item[key_field] in current_keys:
             continue
         merged.append({
             **item,
@@ -1,54 +1,13 @@
 """
 Stockage Supabase dédié au mode Pure Data mensuel (isolé de l'existant).
 """
-import re
 from typing import List, Dict, Tuple, Optional
 from app.database import engine
+# Mêmes colonnes et même nettoyage que pure_data (les deux chemins COPY ne peuvent pas diverger)
+from app.services.pure_data_supabase import COLUMNS, _clean_row_lenient, _norm_month, _norm_year
 
 PURE_DATA_MONTHLY_TABLE = "pure_data_monthly"
 
-COLUMNS = [
-    "mois", "annee", "code_union", "raison_sociale", "groupe_client",
-    "region_commerciale", "fournisseur", "marque", "groupe_frs",
-    "famille", "sous_famille", "ca", "commercial",
-]
-
-
-def _norm_year(value) -> Optional[int]:
-    if value is None:
-        return None
-    try:
-        return int(value)
-    except (ValueError, TypeError):
-        pass
-    s = str(value)
-    m = re.search(r"(20\d{2})", s)
-    return int(m.group(1)) if m else None
-
-
-def _norm_month(value) -> Optional[int]:
-    if value is None:
-        return None
-    try:
-        x = int(value)
-        return x if 1 <= x <= 12 else None
-    except (ValueError, TypeError):
-        pass
-    s = str(value).strip().lower()
-    months = {
-        "janvier": 1, "fevrier": 2, "février": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6,
-        "juillet": 7, "aout": 8, "août": 8, "septembre": 9, "octobre": 10, "novembre": 11,
-        "decembre": 12, "décembre": 12,
-    }
-    for key, val in months.items():
-        if key in s:
-            return val
-    m = re.search(r"(\d{1,2})", s)
-    if m:
-        x = int(m.group(1))
-        return x if 1 <= x <= 12 else None
-    return None
-
 
 def _table_exists() -> bool:
     try:
@@ -102,36 +61,13 @@ def append_monthly_rows(rows: List[Dict]) -> int:
     if not rows:
         return 0
     _ensure_table()
-
-    col_list = ", ".join(f'"{c}"' for c in COLUMNS)
-    placeholders = ", ".join(f":{c}" for c in COLUMNS)
-    insert_sql = f'INSERT INTO "{PURE_DATA_MONTHLY_TABLE}" ({col_list}) VALUES ({placeholders})'
-
-    clean_rows = []
-    for row in rows:
-        clean = {}
-        for col in COLUMNS:
-            val = row.get(col)
-            if col == "ca":
-                try:
-                    val = float(val) if val is not None else 0.0
-                except (ValueError, TypeError):
-                    val = 0.0
-            elif col == "annee":
-                val = _norm_year(val if val is not None else row.get("year"))
-            elif col == "mois":
-                val = _norm_month(val if val is not None else row.get("month"))
-            else:
-                val = str(val).strip() if val is not None else None
-            clean[col] = val
-        clean_rows.append(clean)
-
-    from sqlalchemy import text
-    BATCH = 500
-    with engine.begin() as conn:
-        for i in range(0, len(clean_rows), BATCH):
-            conn.execute(text(insert_sql), clean_rows[i:i + BATCH])
-    return len(clean_rows)
+    from app.services.bulk_load import bulk_load
+    return bulk_load(
+        PURE_DATA_MONTHLY_TABLE,
+        COLUMNS,
+        (_clean_row_lenient(row) for row in rows),
+        engine=engine,
+    )
 
 
 def delete_monthly_rows(
@@ -4,7 +4,9 @@ Utilise le même compte de service que le reste de l'application.
 Feuille : "global New" dans le spreadsheet RFA principal.
 """
 import os
-from typing import List, Dict, Tuple
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Tuple, Optional
 
 # Même spreadsheet que RFA
 SPREADSHEET_ID = os.environ.get(
@@ -13,9 +15,13 @@ SPREADSHEET_ID = os.environ.get(
 )
 PURE_DATA_SHEET_NAME = os.environ.get("PURE_DATA_SHEET_NAME", "global New")
 
+# Lecture paginée : taille d'un bloc de lignes et nombre de blocs lus en parallèle
+CHUNK_ROWS = int(os.environ.get("PURE_DATA_SHEETS_CHUNK_ROWS", "20000"))
+MAX_WORKERS = int(os.environ.get("PURE_DATA_SHEETS_WORKERS", "4"))
+
 
 def _get_sheets_creds():
-    from google.oauth2 import service_account
+    from app.services.google_clients import service_account_credentials
     info = None
     json_env = os.environ.get("GOOGLE_CREDENTIALS_JSON")
     if json_env:
@@ -29,38 +35,20 @@ def _get_sheets_creds():
                 info = json.load(f)
     if not info:
         raise ValueError("GOOGLE_CREDENTIALS_JSON ou GOOGLE_APPLICATION_CREDENTIALS manquant")
-    return service_account.Credentials.from_service_account_info(
-        info, scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"]
-    )
+    return service_account_credentials(info, ["https://www.googleapis.com/auth/spreadsheets.readonly"])
 
 
-def load_pure_data_from_sheets() -> Tuple[List[Dict], List[str], Dict[str, str]]:
-    """
-    Lit la feuille 'global New' et retourne (rows, columns, column_mapping)
-    au même format que pure_data_import.load_pure_data().
-    """
-    from googleapiclient.discovery import build
-    from app.services.pure_data_import import PURE_FIELD_DEFINITIONS
-    from app.core.normalize import normalize_header
+def _get_sheets_client():
+    """Client partagé (un service par thread : httplib2 n'est pas thread-safe)."""
+    from app.services.google_clients import get_service
+    return get_service("sheets", "v4", _get_sheets_creds())
 
-    client = build("sheets", "v4", credentials=_get_sheets_creds())
-    result = (
-        client.spreadsheets()
-        .values()
-        .get(
-            spreadsheetId=SPREADSHEET_ID,
-            range=f"{PURE_DATA_SHEET_NAME}!A1:Z500000",
-        )
-        .execute()
-    )
-    all_values = result.get("values", [])
-    if not all_values:
-        return [], [], {}
 
-    headers_raw = all_values[0]
-    data_rows   = all_values[1:]
+def _build_col_index(headers_raw: List) -> Tuple[Dict[int, str], Dict[str, str]]:
+    """Mapping en-têtes → clés canoniques (même logique que load_pure_data)."""
+    from app.services.pure_data_import import PURE_FIELD_DEFINITIONS
+    from app.core.normalize import normalize_header
 
-    # Mapping en-têtes → clés canoniques (même logique que load_pure_data)
     raw_field_mapping: Dict[str, str] = {}
     for key, aliases in PURE_FIELD_DEFINITIONS:
         for alias in aliases:
@@ -83,46 +71,130 @@ def load_pure_data_from_sheets() -> Tuple[List[Dict], List[str], Dict[str, str]]
                         column_mapping[canonical] = col
                         col_index[i] = canonical
                     break
+    return col_index, column_mapping
+
 
-    # Construire les lignes
+def _to_text(val) -> Optional[str]:
+    """Valeur texte (UNFORMATTED_VALUE peut renvoyer un nombre pour un code ou un nom)."""
+    if val is None or val == "":
+        return None
+    if isinstance(val, float) and val.is_integer():
+        val = int(val)
+    text = str(val).strip()
+    return text or None
+
+
+def _convert_value(key: str, val):
+    """Convertit une cellule (déjà typée par UNFORMATTED_VALUE) vers le format Pure Data."""
+    if key == "ca":
+        if isinstance(val, (int, float)) and not isinstance(val, bool):
+            return float(val)
+        text = _to_text(val)
+        try:
+            text = text.replace(" ", "").replace("\xa0", "").replace(",", ".").replace("€", "") if text else "0"
+            return float(text) if text else 0.0
+        except (ValueError, AttributeError):
+            return 0.0
+    if key == "annee":
+        if isinstance(val, (int, float)) and not isinstance(val, bool) and 2000 <= val < 2100:
+            return int(val)
+        m = re.search(r"(20\d{2})", _to_text(val) or "")
+        return int(m.group(1)) if m else None
+    if key == "mois":
+        if isinstance(val, (int, float)) and not isinstance(val, bool):
+            v = int(val)
+            return v if 1 <= v <= 12 else None
+        text = _to_text(val)
+        try:
+            v = int(text) if text else None
+            return v if v and 1 <= v <= 12 else None
+        except (ValueError, TypeError):
+            return _parse_month_name(text)
+    return _to_text(val)
+
+
+def _convert_chunk(values: List[List], col_index: Dict[int, str], keys: List[str]) -> List[Dict]:
+    """Convertit un bloc de lignes brutes directement en lignes Pure Data."""
     rows: List[Dict] = []
-    for raw_row in data_rows:
-        if not any(c.strip() for c in raw_row if c):
+    items = sorted(col_index.items())
+    for raw_row in values:
+        if not any(c not in (None, "") and str(c).strip() for c in raw_row):
             continue
-        row_dict: Dict = {}
-        for key, _ in PURE_FIELD_DEFINITIONS:
-            row_dict[key] = None
-
-        for i, val in enumerate(raw_row):
-            if i in col_index:
-                key = col_index[i]
-                text = str(val).strip() if val else None
-
-                if key == "ca":
-                    try:
-                        text = text.replace(" ", "").replace(",", ".").replace("€", "") if text else "0"
-                        row_dict[key] = float(text) if text else 0.0
-                    except (ValueError, AttributeError):
-                        row_dict[key] = 0.0
-                elif key == "annee":
-                    import re
-                    m = re.search(r"(20\d{2})", text or "")
-                    row_dict[key] = int(m.group(1)) if m else None
-                    # Stocker aussi l'année comme entier dans "year"
-                elif key == "mois":
-                    try:
-                        v = int(text) if text else None
-                        row_dict[key] = v if v and 1 <= v <= 12 else None
-                    except (ValueError, TypeError):
-                        row_dict[key] = _parse_month_name(text)
-                else:
-                    row_dict[key] = text
-
-        # Calculer year/month depuis annee/mois si présents
+        row_dict: Dict = dict.fromkeys(keys)
+        n = len(raw_row)
+        for i, key in items:
+            if i < n:
+                row_dict[key] = _convert_value(key, raw_row[i])
         rows.append(row_dict)
+    return rows
+
+
+def _fetch_chunk(range_a1: str) -> List[List]:
+    """Lit une plage de lignes (1 appel batchGet, valeurs non formatées)."""
+    client = _get_sheets_client()
+    result = (
+        client.spreadsheets()
+        .values()
+        .batchGet(
+            spreadsheetId=SPREADSHEET_ID,
+            ranges=[range_a1],
+            majorDimension="ROWS",
+            valueRenderOption="UNFORMATTED_VALUE",
+            dateTimeRenderOption="FORMATTED_STRING",
+        )
+        .execute()
+    )
+    value_ranges = result.get("valueRanges", [])
+    return value_ranges[0].get("values", []) if value_ranges else []
+
+
+def _sheet_row_count(client) -> int:
+    meta = client.spreadsheets().get(
+        spreadsheetId=SPREADSHEET_ID,
+        fields="sheets.properties(title,gridProperties.rowCount)",
+    ).execute()
+    for sheet in meta.get("sheets", []):
+        props = sheet.get("properties", {})
+        if props.get("title") == PURE_DATA_SHEET_NAME:
+            return int(props.get("gridProperties", {}).get("rowCount", 0) or 0)
+    raise ValueError(f"Feuille '{PURE_DATA_SHEET_NAME}' introuvable dans le tableur")
+
+
+def load_pure_data_from_sheets() -> Tuple[List[Dict], List[str], Dict[str, str]]:
+    """
+    Lit la feuille 'global New' et retourne (rows, columns, column_mapping)
+    au même format que pure_data_import.load_pure_data().
+
+    Lecture par blocs de CHUNK_ROWS lignes (batchGet, UNFORMATTED_VALUE : nombres déjà typés),
+    MAX_WORKERS blocs en parallèle ; chaque bloc est converti dès réception puis libéré.
+    """
+    from app.services.pure_data_import import PURE_FIELD_DEFINITIONS
+
+    client = _get_sheets_client()
+    header_values = _fetch_chunk(f"{PURE_DATA_SHEET_NAME}!A1:Z1")
+    if not header_values:
+        return [], [], {}
+    headers_raw = [str(h) for h in header_values[0]]
+    col_index, column_mapping = _build_col_index(headers_raw)
+    keys = [key for key, _ in PURE_FIELD_DEFINITIONS]
+
+    row_count = _sheet_row_count(client)
+    ranges = [
+        f"{PURE_DATA_SHEET_NAME}!A{start}:Z{min(start + CHUNK_ROWS - 1, row_count)}"
+        for start in range(2, row_count + 1, CHUNK_ROWS)
+    ]
+
+    chunks: Dict[int, List[Dict]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, MAX_WORKERS)) as executor:
+        futures = {executor.submit(_fetch_chunk, r): idx for idx, r in enumerate(ranges)}
+        for future in as_completed(futures):
+            chunks[futures[future]] = _convert_chunk(future.result(), col_index, keys)
+
+    rows: List[Dict] = []
+    for idx in range(len(ranges)):
+        rows.extend(chunks.pop(idx, []))
 
-    columns = list(headers_raw)
-    return rows, columns, {v: k for k, v in column_mapping.items()}
+    return rows, headers_raw, {v: k for k, v in column_mapping.items()}
 
 
 def _parse_month_name(text: str) -> int | None:
@@ -138,7 +210,6 @@ def _parse_month_name(text: str) -> int | None:
     for k, v in months.items():
         if k in t:
             return v
-    import re
     m = re.search(r"(\d{1,2})", t)
     if m:
         v = int(m.group(1))
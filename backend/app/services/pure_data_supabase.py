@@ -74,84 +74,74 @@ def _table_exists() -> bool:
         return False
 
 
+def _clean_row_strict(row: Dict) -> Tuple:
+    """Ligne prête pour l'insertion (ordre COLUMNS) — valeurs déjà typées (sync Sheets)."""
+    out = []
+    for col in COLUMNS:
+        val = row.get(col)
+        if col == "ca":
+            try:
+                val = float(val) if val is not None else 0.0
+            except (ValueError, TypeError):
+                val = 0.0
+        elif col in ("mois", "annee"):
+            try:
+                val = int(val) if val is not None else None
+            except (ValueError, TypeError):
+                val = None
+        else:
+            val = str(val).strip() if val is not None else None
+        out.append(val)
+    return tuple(out)
+
+
+def _clean_row_lenient(row: Dict) -> Tuple:
+    """Ligne prête pour l'insertion (ordre COLUMNS) — année/mois dérivés si besoin (import Excel)."""
+    out = []
+    for col in COLUMNS:
+        val = row.get(col)
+        if col == "ca":
+            try:
+                val = float(val) if val is not None else 0.0
+            except (ValueError, TypeError):
+                val = 0.0
+        elif col == "annee":
+            val = _norm_year(val if val is not None else row.get("year"))
+        elif col == "mois":
+            val = _norm_month(val if val is not None else row.get("month"))
+        else:
+            val = str(val).strip() if val is not None else None
+        out.append(val)
+    return tuple(out)
+
+
 def write_pure_data_to_supabase(rows: List[Dict]) -> int:
+    """
+    Remplace tout le contenu de pure_data.
+    PostgreSQL : COPY dans une table fantôme puis bascule par renommage (jamais de table vide visible).
+    """
     if not rows:
         return 0
-
-    col_list    = ", ".join(f'"{c}"' for c in COLUMNS)
-    placeholders = ", ".join(f":{c}" for c in COLUMNS)
-    insert_sql  = f'INSERT INTO "{PURE_DATA_TABLE}" ({col_list}) VALUES ({placeholders})'
-
-    clean_rows = []
-    for row in rows:
-        clean = {}
-        for col in COLUMNS:
-            val = row.get(col)
-            if col == "ca":
-                try:
-                    val = float(val) if val is not None else 0.0
-                except (ValueError, TypeError):
-                    val = 0.0
-            elif col in ("mois", "annee"):
-                try:
-                    val = int(val) if val is not None else None
-                except (ValueError, TypeError):
-                    val = None
-            else:
-                val = str(val).strip() if val is not None else None
-            clean[col] = val
-        clean_rows.append(clean)
-
-    from sqlalchemy import text
-    # Découper en lots de 500 pour éviter les limites PostgreSQL
-    BATCH = 500
-    with engine.begin() as conn:
-        conn.execute(text(f'DELETE FROM "{PURE_DATA_TABLE}"'))
-        for i in range(0, len(clean_rows), BATCH):
-            batch = clean_rows[i:i + BATCH]
-            conn.execute(text(insert_sql), batch)
-
-    return len(clean_rows)
+    from app.services.bulk_load import swap_reload
+    return swap_reload(
+        PURE_DATA_TABLE,
+        COLUMNS,
+        (_clean_row_strict(row) for row in rows),
+        engine=engine,
+    )
 
 
 def append_pure_data_rows(rows: List[Dict]) -> int:
     """Ajoute des lignes Pure Data sans supprimer l'existant."""
     if not rows:
         return 0
-
-    col_list = ", ".join(f'"{c}"' for c in COLUMNS)
-    placeholders = ", ".join(f":{c}" for c in COLUMNS)
-    insert_sql = f'INSERT INTO "{PURE_DATA_TABLE}" ({col_list}) VALUES ({placeholders})'
-
-    clean_rows = []
-    for row in rows:
-        clean = {}
-        for col in COLUMNS:
-            val = row.get(col)
-            if col == "ca":
-                try:
-                    val = float(val) if val is not None else 0.0
-                except (ValueError, TypeError):
-                    val = 0.0
-            elif col == "annee":
-                year = _norm_year(val if val is not None else row.get("year"))
-                val = year
-            elif col == "mois":
-                month = _norm_month(val if val is not None else row.get("month"))
-                val = month
-            else:
-                val = str(val).strip() if val is not None else None
-            clean[col] = val
-        clean_rows.append(clean)
-
-    from sqlalchemy import text
-    BATCH = 500
-    with engine.begin() as conn:
-        for i in range(0, len(clean_rows), BATCH):
-            batch = clean_rows[i:i + BATCH]
-            conn.execute(text(insert_sql), batch)
-
-    return len(clean_rows)
+    from app.services.bulk_load import bulk_load
+    return bulk_load(
+        PURE_DATA_TABLE,
+        COLUMNS,
+        (_clean_row_lenient(row) for row in rows),
+        engine=engine,
+    )
 
 
 def _build_in_clause(values: List, prefix: str) -> Tuple[str, Dict]:
@@ -13,6 +13,10 @@ def load_contract_rules(contract: Contract) -> Dict[str, ContractRule]:
     """
     Charge toutes les règles d'un contrat indexées par key.
     """
+    from app.services.rfa_context import current_context
+    ctx = current_context()
+    if ctx is not None:
+        return ctx.load_contract_rules(contract)
     from sqlmodel import Session, select
     from app.database import engine
     
@@ -39,6 +43,10 @@ def load_entity_overrides(target_type: str, target_value: str) -> Dict[str, Dict
             ...
         }
     """
+    from app.services.rfa_context import current_context
+    ctx = current_context()
+    if ctx is not None:
+        return ctx.load_entity_overrides(target_type, target_value)
     from sqlmodel import Session, select
     from app.database import engine
     
@@ -0,0 +1,114 @@
+"""
+Contexte RFA partagé pour les calculs en masse (récap, PDF en lot).
+
+Charge en une fois contrats, affectations, règles et overrides actifs, puis sert
+resolve_contract / get_contract_by_id / load_contract_rules / load_entity_overrides
+depuis la mémoire. activate() rend le contexte courant (ContextVar) le temps du bloc : ces
+fonctions le consultent (current_context()) avant d'interroger la base. Le contexte ne vaut que
+pour le thread / la tâche asyncio qui l'active : les autres requêtes continuent de lire la base.
+"""
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import Contract, ContractOverride, ContractRule
+from app.services.contract_resolver import BatchContractResolver
+
+
+_current: "ContextVar[Optional[RfaContext]]" = ContextVar("rfa_context", default=None)
+
+
+def current_context() -> Optional["RfaContext"]:
+    """Contexte activé dans le thread / la tâche courante, ou None."""
+    return _current.get()
+
+
+def _enum_value(v: Any) -> str:
+    return v.value if hasattr(v, "value") else str(v)
+
+
+class RfaContext:
+    """Instantané contrats / règles / overrides (4 requêtes + 3 pour la résolution des contrats)."""
+
+    def __init__(self, session: Optional[Session] = None):
+        self._resolver = BatchContractResolver()
+        own_session = session is None
+        if own_session:
+            session = Session(engine)
+        try:
+            self._contracts: Dict[int, Contract] = {c.id: c for c in session.exec(select(Contract)).all()}
+            self._rules: Dict[int, Dict[str, ContractRule]] = {}
+            for r in session.exec(select(ContractRule)).all():
+                self._rules.setdefault(r.contract_id, {})[r.key] = r
+            self._overrides: Dict[Tuple[str, str], Dict[str, Dict]] = {}
+            active = session.exec(select(ContractOverride).where(ContractOverride.is_active == True)).all()  # noqa: E712
+            for ov in active:
+                key = (_enum_value(ov.target_type), (ov.target_value or "").strip().upper())
+                by_field = self._overrides.setdefault(key, {}).setdefault(ov.field_key, {})
+                try:
+                    by_field[_enum_value(ov.tier_type)] = json.loads(ov.custom_tiers)
+                except Exception:
+                    pass
+        finally:
+            if own_session:
+                session.close()
+
+    def to_payload(self) -> Dict[str, Any]:
+        """
+        Instantané en dictionnaires simples (sans objets ORM) pour les processus du pool Génie ;
+        from_payload() reconstruit un contexte équivalent sans accès à la base.
+        """
+        def contract_id(c: Optional[Contract]) -> Optional[int]:
+            return c.id if c is not None else None
+
+        return {
+            "contracts": {cid: c.model_dump() for cid, c in self._contracts.items()},
+            "rules": {
+                cid: {key: r.model_dump() for key, r in rules.items()} for cid, rules in self._rules.items()
+            },
+            "overrides": self._overrides,
+            "by_code_union": {v: contract_id(c) for v, c in self._resolver._by_code_union.items()},
+            "by_groupe": {v: contract_id(c) for v, c in self._resolver._by_groupe.items()},
+            "default": contract_id(self._resolver._default),
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "RfaContext":
+        ctx = cls.__new__(cls)
+        ctx._contracts = {cid: Contract(**data) for cid, data in payload["contracts"].items()}
+        ctx._rules = {
+            cid: {key: ContractRule(**data) for key, data in rules.items()}
+            for cid, rules in payload["rules"].items()
+        }
+        ctx._overrides = payload["overrides"]
+        ctx._resolver = BatchContractResolver.from_maps(
+            {v: ctx._contracts.get(cid) for v, cid in payload["by_code_union"].items()},
+            {v: ctx._contracts.get(cid) for v, cid in payload["by_groupe"].items()},
+            ctx._contracts.get(payload["default"]),
+        )
+        return ctx
+
+    def resolve_contract(self, code_union: Optional[str] = None, groupe_client: Optional[str] = None) -> Optional[Contract]:
+        return self._resolver.resolve(code_union, groupe_client)
+
+    def get_contract_by_id(self, contract_id: int) -> Optional[Contract]:
+        return self._contracts.get(contract_id)
+
+    def load_contract_rules(self, contract: Contract) -> Dict[str, ContractRule]:
+        return self._rules.get(contract.id, {})
+
+    def load_entity_overrides(self, target_type: Any, target_value: str) -> Dict[str, Dict]:
+        return self._overrides.get((_enum_value(target_type), (target_value or "").strip().upper()), {})
+
+    @contextmanager
+    def activate(self):
+        """Rend ce contexte courant le temps du bloc (thread / tâche asyncio courante uniquement)."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
@@ -113,6 +113,7 @@ def read_rfa_from_supabase(session) -> Optional[List[Dict[str, Any]]]:
             data_list.append(rec)
         return data_list
     except Exception as e:
+        session.rollback()
         print(f"[RFA_SUPABASE] Erreur lecture: {e}")
         return None
 
@@ -126,3 +127,20 @@ def build_column_mapping() -> Dict[str, str]:
     }
     cm.update({k: k for k in FIELD_TO_COL.keys()})
     return cm
+
+
+def rfa_data_version(session) -> Optional[str]:
+    """
+    Version du contenu de `rfa_data` (nombre de lignes + dernière mise à jour), pour valider
+    une copie locale. None si la table est illisible.
+    """
+    from sqlalchemy import text
+    try:
+        row = session.execute(text("SELECT COUNT(*), MAX(updated_at) FROM rfa_data")).fetchone()
+    except Exception as e:
+        session.rollback()
+        print(f"[RFA_SUPABASE] Erreur version: {e}")
+        return None
+    if not row or not row[0]:
+        return None
+    return f"{row[0]}:{row[1]}"
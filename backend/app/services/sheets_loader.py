@@ -19,10 +19,14 @@ from app.services.excel_import import build_data_from_dataframe
 
 
 def _get_sheets_client(credentials_path: Optional[str] = None):
-    """Retourne le client Google Sheets (lazy import pour dépendance optionnelle)."""
+    """Retourne le client Google Sheets (lazy import pour dépendance optionnelle, client partagé en cache)."""
     try:
-        from google.oauth2 import service_account
-        from googleapiclient.discovery import build
+        from app.services.google_clients import (
+            get_service,
+            service_account_credentials,
+            service_account_file_credentials,
+        )
+        import googleapiclient  # noqa: F401
     except ImportError as e:
         raise ImportError(
             "Pour utiliser Google Sheets, installez : pip install google-api-python-client google-auth"
@@ -34,14 +38,14 @@ def _get_sheets_client(credentials_path: Optional[str] = None):
     if raw_json:
         import json as _json
         info = _json.loads(raw_json)
-        creds = service_account.Credentials.from_service_account_info(info, scopes=scopes)
-        return build("sheets", "v4", credentials=creds)
+        creds = service_account_credentials(info, scopes)
+        return get_service("sheets", "v4", creds)
 
     # Priorité 2 : fichier local (dev)
     path = credentials_path or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "")
     if path and os.path.isfile(path):
-        creds = service_account.Credentials.from_service_account_file(path, scopes=scopes)
-        return build("sheets", "v4", credentials=creds)
+        creds = service_account_file_credentials(path, scopes)
+        return get_service("sheets", "v4", creds)
 
     raise ValueError(
         "Credentials Google manquants : GOOGLE_CREDENTIALS_JSON ou GOOGLE_APPLICATION_CREDENTIALS"
@@ -0,0 +1,119 @@
+"""
+Coalescence des calculs coûteux par clé (« single-flight »).
+
+Quand plusieurs requêtes identiques arrivent en même temps (ex. les commerciaux qui ouvrent le
+tableau de bord juste après un rafraîchissement), une seule exécute le calcul ; les autres
+attendent et reçoivent le même résultat (ou la même exception). Rien n'est conservé une fois le
+calcul terminé : le cache éventuel reste celui de l'appelant (mémoire, Supabase, AppSettings…).
+
+- do(key, fn, ...) : appelants en threads (endpoints, pool d'exécution).
+- do_async(key, fn, ...) : appelants asyncio ; une coroutine est attendue dans la boucle,
+  une fonction synchrone est exécutée dans le pool de threads (sans bloquer la boucle) et
+  partagée aussi avec les appelants de do().
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """Calcul en cours pour une clé (synchrone)."""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Un seul calcul en cours par clé ; statistiques dans stats()."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Tuple[int, Hashable], "asyncio.Future"] = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Exécute fn(*args, **kwargs), ou attend le calcul déjà lancé pour key par un autre thread."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Version asyncio : les appelants de la même boucle attendent la même tâche (annuler
+        l'un d'eux n'annule pas le calcul des autres).
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is not None:
+                self.shared += 1
+        if task is None:
+            if asyncio.iscoroutinefunction(fn):
+                coro = self._run_coroutine(key, fn, *args, **kwargs)
+            else:
+                coro = loop.run_in_executor(None, lambda: self.do(key, fn, *args, **kwargs))
+            task = asyncio.ensure_future(coro)
+            with self._lock:
+                self._tasks[task_key] = task
+            task.add_done_callback(lambda t: self._forget(task_key, t))
+        return await asyncio.shield(task)
+
+    async def _run_coroutine(self, key: Hashable, fn, *args, **kwargs):
+        with self._lock:
+            self.executed += 1
+        return await fn(*args, **kwargs)
+
+    def _forget(self, task_key, task) -> None:
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+        if not task.cancelled():
+            task.exception()  # lue : pas d'avertissement si tous les appelants sont partis
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "executed": self.executed,
+                "shared": self.shared,
+                "in_flight": len(self._calls) + len(self._tasks),
+            }
+
+
+# Instances partagées (un espace de clés par type de calcul)
+import_flight = SingleFlight("import")
+recap_flight = SingleFlight("recap")
+genie_flight = SingleFlight("genie")
+pure_data_flight = SingleFlight("pure_data")
@@ -0,0 +1,227 @@
+"""
+Exports tabulaires bruts (CSV / Parquet) pour les outils de la finance.
+
+Pas de classeur intermédiaire : les lignes (dicts) sont encodées au fil de l'eau et envoyées par morceaux.
+- CSV : UTF-8 avec BOM (accents corrects à l'ouverture dans Excel), séparateur virgule, point décimal.
+- Parquet : pyarrow (dépendance optionnelle), un row group par lot de lignes, schéma typé explicite.
+
+Les colonnes sont décrites par (nom, type) avec type dans "str", "float", "int".
+"""
+from __future__ import annotations
+
+import csv
+import io
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+EXPORT_FORMATS = ("csv", "parquet")
+
+CSV_CHUNK_ROWS = 5000
+PARQUET_ROW_GROUP_ROWS = 50000
+
+Column = Tuple[str, str]
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+def iter_csv(columns: Sequence[Column], rows: Iterable[Dict[str, Any]], chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[bytes]:
+    """Octets CSV (en-tête puis lignes), par paquets de chunk_rows lignes."""
+    names = [name for name, _ in columns]
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(names)
+    first = True
+    pending = 0
+    for row in rows:
+        writer.writerow([row.get(name) for name in names])
+        pending += 1
+        if pending >= chunk_rows:
+            yield _drain_csv(buf, first)
+            first = False
+            pending = 0
+    yield _drain_csv(buf, first)
+
+
+def _drain_csv(buf: io.StringIO, with_bom: bool) -> bytes:
+    data = buf.getvalue()
+    buf.seek(0)
+    buf.truncate(0)
+    return data.encode("utf-8-sig" if with_bom else "utf-8")
+
+
+class _ParquetSink:
+    """Flux d'écriture pour pyarrow : position absolue conservée, octets récupérés par drain()."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._buf += data
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _parquet_schema(columns: Sequence[Column]):
+    import pyarrow as pa
+    types = {"str": pa.string(), "float": pa.float64(), "int": pa.int64()}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _coerce(kind: str, value: Any) -> Any:
+    if value is None or value == "":
+        return None if kind != "str" else value
+    if kind == "str":
+        return str(value)
+    if kind == "float":
+        return float(value)
+    return int(value)
+
+
+def _parquet_batch(schema, columns: Sequence[Column], batch: List[Dict[str, Any]]):
+    import pyarrow as pa
+    arrays = [
+        pa.array([_coerce(kind, row.get(name)) for row in batch], type=schema.field(name).type)
+        for name, kind in columns
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def iter_parquet(
+    columns: Sequence[Column],
+    rows: Iterable[Dict[str, Any]],
+    row_group_rows: int = PARQUET_ROW_GROUP_ROWS,
+) -> Iterator[bytes]:
+    """Octets Parquet : un row group écrit (et envoyé) par lot de row_group_rows lignes."""
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(columns)
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    batch: List[Dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= row_group_rows:
+            writer.write_table(_parquet_batch(schema, columns, batch))
+            batch = []
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    if batch:
+        writer.write_table(_parquet_batch(schema, columns, batch))
+    writer.close()
+    yield sink.drain()
+
+
+def iter_export(export_format: str, columns: Sequence[Column], rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    if export_format == "csv":
+        return iter_csv(columns, rows)
+    if export_format == "parquet":
+        return iter_parquet(columns, rows)
+    raise ValueError(f"Format d'export inconnu : {export_format}")
+
+
+def media_type(export_format: str) -> str:
+    return CSV_MEDIA_TYPE if export_format == "csv" else PARQUET_MEDIA_TYPE
+
+
+# ---------------------------------------------------------------------------
+# Jeux de colonnes
+# ---------------------------------------------------------------------------
+
+RECAP_CLIENT_COLUMNS: List[Column] = [
+    ("entity_type", "str"),
+    ("code_union", "str"),
+    ("nom_client", "str"),
+    ("groupe_client", "str"),
+    ("nb_comptes", "int"),
+    ("montant_total_realise", "float"),
+    ("rfa_client", "float"),
+    ("type_contrat", "str"),
+]
+
+RECAP_DETAIL_COLUMNS: List[Column] = [
+    ("entity_type", "str"),
+    ("code_union", "str"),
+    ("nom_client", "str"),
+    ("platform_scope", "str"),
+    ("platform_key", "str"),
+    ("platform_label", "str"),
+    ("ca_realise_plateforme", "float"),
+    ("rfa_plateforme", "float"),
+    ("bonus_plateforme", "float"),
+    ("total_plateforme", "float"),
+    ("type_contrat", "str"),
+]
+
+_COMPARISON_VALUES: List[Column] = [
+    ("ca", "float"),
+    ("ca_previous", "float"),
+    ("delta", "float"),
+    ("delta_pct", "float"),
+]
+
+PURE_DATA_COLUMNS: Dict[str, List[Column]] = {
+    "clients": [("code_union", "str"), ("raison_sociale", "str"), ("commercial", "str")] + _COMPARISON_VALUES,
+    "platforms": [("platform", "str")] + _COMPARISON_VALUES,
+    "commercials": [("commercial", "str"), ("clients", "int")] + _COMPARISON_VALUES,
+    "marques": [("marque", "str")] + _COMPARISON_VALUES,
+    "breakdown": [
+        ("fournisseur", "str"),
+        ("marque", "str"),
+        ("famille", "str"),
+        ("sous_famille", "str"),
+    ] + _COMPARISON_VALUES,
+}
+
+
+def recap_client_rows(export_data: Dict[str, List[Dict]]) -> Iterator[Dict[str, Any]]:
+    """Indépendants puis groupes, dans une seule table (entity_type distingue les deux)."""
+    for row in export_data.get("independents", []):
+        yield {**row, "entity_type": "INDEPENDANT"}
+    for row in export_data.get("groups", []):
+        yield {**row, "entity_type": "GROUPE"}
+
+
+def recap_detail_rows(export_data: Dict[str, List[Dict]]) -> Iterator[Dict[str, Any]]:
+    yield from export_data.get("independents_details", [])
+    yield from export_data.get("groups_details", [])
+
+
+def flatten_breakdown(
+    items: List[Dict],
+    level_keys: Sequence[str] = ("fournisseur", "marque", "famille", "sous_famille"),
+    parents: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Aplatit l'arbre fournisseur -> marque -> famille -> sous-famille (une ligne par feuille)."""
+    parents = parents or {}
+    for item in items:
+        path = dict(parents)
+        for key in level_keys:
+            if key in item:
+                path[key] = item[key]
+        children = item.get("children")
+        if children:
+            yield from flatten_breakdown(children, level_keys, path)
+        else:
+            yield {**path, **{k: item.get(k) for k, _ in _COMPARISON_VALUES}}
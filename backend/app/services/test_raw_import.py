@@ -513,6 +513,104 @@ def matches_rule(row: Dict, rule: Dict) -> Tuple[bool, List[str]]:
     return True, debug_info
 
 
+ROW_MATCH_FIELDS = ("fournisseur", "marque", "groupe_frs", "famille", "sous_famille")
+
+
+def _text_and_compact(value) -> Tuple[str, str]:
+    text = normalize_text(value)
+    return text, normalize_compact(text)
+
+
+def _compile_rule(rule: Dict) -> Dict:
+    """Motifs d'une règle normalisés une fois (mêmes normalisations que matches_rule)."""
+    sous_famille = rule.get("sous_famille") or rule.get("sousFamille")
+    return {
+        "key": rule["key"],
+        "fournisseur": normalize_text(rule.get("fournisseur", "")),
+        "marque": _text_and_compact(rule["marque"]) if "marque" in rule else None,
+        "marqueList": [_text_and_compact(m) for m in rule["marqueList"]] if "marqueList" in rule else None,
+        "groupeFrsList": [normalize_text(g) for g in rule["groupeFrsList"]] if "groupeFrsList" in rule else None,
+        "famille": normalize_family(rule["famille"]) if "famille" in rule else None,
+        "sous_famille": _text_and_compact(sous_famille) if sous_famille else None,
+    }
+
+
+def _contains(pattern: Tuple[str, str], value: Tuple[str, str]) -> bool:
+    return pattern[0] in value[0] or pattern[1] in value[1]
+
+
+class CompiledRuleMatcher:
+    """
+    Équivalent de matches_rule pour un jeu de règles fixe :
+    - motifs des règles normalisés une seule fois ;
+    - attributs de ligne normalisés et règles évaluées une fois par tuple distinct
+      (fournisseur, marque, groupe_frs, famille, sous_famille), résultat mémoïsé.
+    Les traces de debug ne sont produites que via explain().
+    """
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = list(rules)
+        self._compiled = [_compile_rule(r) for r in self.rules]
+        self._matches: Dict[Tuple, Tuple[str, ...]] = {}
+        self._suppliers: Dict[str, str] = {}
+
+    @staticmethod
+    def row_key(row: Dict) -> Tuple:
+        return tuple(row.get(field, "") for field in ROW_MATCH_FIELDS)
+
+    def supplier(self, raw_name: str) -> str:
+        """normalize_supplier_name mémoïsé."""
+        norm = self._suppliers.get(raw_name)
+        if norm is None:
+            norm = normalize_supplier_name(raw_name)
+            self._suppliers[raw_name] = norm
+        return norm
+
+    def match_keys(self, row: Dict) -> Tuple[str, ...]:
+        """Clés des règles qui correspondent à la ligne, dans l'ordre des règles."""
+        key = self.row_key(row)
+        keys = self._matches.get(key)
+        if keys is None:
+            keys = self._evaluate(*key)
+            self._matches[key] = keys
+        return keys
+
+    def _evaluate(self, fournisseur, marque, groupe_frs, famille, sous_famille) -> Tuple[str, ...]:
+        frs_text = normalize_text(fournisseur)
+        frs_norm_text = normalize_text(self.supplier(fournisseur))
+        marque_tc = _text_and_compact(marque)
+        groupe_frs_text = normalize_text(groupe_frs)
+        famille_text = normalize_text(famille)
+        famille_norm = normalize_family(famille_text)
+        sous_famille_tc = _text_and_compact(sous_famille)
+
+        matched = []
+        for rule in self._compiled:
+            rule_frs = rule["fournisseur"]
+            if not rule_frs or (rule_frs not in frs_text and rule_frs not in frs_norm_text):
+                continue
+            if rule["marque"] is not None and not _contains(rule["marque"], marque_tc):
+                continue
+            if rule["marqueList"] is not None and not any(_contains(m, marque_tc) for m in rule["marqueList"]):
+                continue
+            if rule["groupeFrsList"] is not None and not any(g in groupe_frs_text for g in rule["groupeFrsList"]):
+                continue
+            if rule["famille"] is not None and rule["famille"] not in famille_text and rule["famille"] not in famille_norm:
+                continue
+            if rule["sous_famille"] is not None and not _contains(rule["sous_famille"], sous_famille_tc):
+                continue
+            matched.append(rule["key"])
+        return tuple(matched)
+
+    def explain(self, row: Dict) -> Dict[str, List[str]]:
+        """Traces de debug détaillées (matches_rule) pour chaque règle, à la demande."""
+        return {rule["key"]: matches_rule(row, rule)[1] for rule in self.rules}
+
+    @property
+    def distinct_rows(self) -> int:
+        return len(self._matches)
+
+
 def validate_rules() -> Dict:
     """Valide que toutes les règles sont bien définies."""
     validation = {
@@ -646,6 +744,7 @@ def calculate_rfa_from_raw(
     
     # COMBINER LES RÈGLES : dynamiques (globales) + statiques (tri-partites)
     all_rules = dynamic_global_rules + RFA_RULES  # RFA_RULES ne contient que les TRI maintenant
+    tri_matcher = CompiledRuleMatcher([rule for rule in all_rules if rule["type"] == "tri"])
     
     # ÉTAPE 1 : AGRÉGATION PAR CLIENT ET PAR FOURNISSEUR (comme AppScript)
     # Le script AppScript fait : clientReportMap[clientKey].suppliers[supKey].ca += ca
@@ -675,13 +774,8 @@ def calculate_rfa_from_raw(
             client_suppliers_map[code_union] = {}
             client_additionals_map[code_union] = {}
         
-        # Garder les valeurs brutes pour le debug, et les normaliser pour le matching
         fournisseur_raw = str(row.get("fournisseur", "")).strip()
-        fournisseur = normalize_supplier_name(fournisseur_raw)  # Normaliser via le mapping (ACR Industries -> ACR)
-        marque = normalize_text(row.get("marque", ""))
-        groupe_frs = normalize_text(row.get("groupe_frs", ""))
-        famille = normalize_text(row.get("famille", ""))
-        sous_famille = normalize_text(row.get("sous_famille", ""))
+        fournisseur = tri_matcher.supplier(fournisseur_raw)  # Normaliser via le mapping (ACR Industries -> ACR)
         
         # AGRÉGER PAR FOURNISSEUR (pour les règles GLOBALES)
         # Comme AppScript : suppliers[supKey].ca += ca
@@ -694,17 +788,15 @@ def calculate_rfa_from_raw(
         
         # AGRÉGER PAR RÈGLE TRI-PARTITE (pour les règles TRI)
         # Comme AppScript : additionals[rule.key].ca += ca
-        for rule in all_rules:
-            if rule["type"] == "tri":
-                matches, _ = matches_rule(row, rule)
-                if matches:
-                    rule_key = rule["key"]
-                    if rule_key not in client_additionals_map[code_union]:
-                        client_additionals_map[code_union][rule_key] = {"ca": 0.0, "lignes": 0}
-                    client_additionals_map[code_union][rule_key]["ca"] += ca
-                    client_additionals_map[code_union][rule_key]["lignes"] += 1
+        # (matching évalué une fois par combinaison fournisseur/marque/groupe FRS/famille/sous-famille)
+        for rule_key in tri_matcher.match_keys(row):
+            if rule_key not in client_additionals_map[code_union]:
+                client_additionals_map[code_union][rule_key] = {"ca": 0.0, "lignes": 0}
+            client_additionals_map[code_union][rule_key]["ca"] += ca
+            client_additionals_map[code_union][rule_key]["lignes"] += 1
     
     debug_log.append(f"✅ Agrégation terminée : {len(client_map)} clients trouvés")
+    debug_log.append(f"🔎 Règles tri-partites évaluées sur {tri_matcher.distinct_rows} combinaisons distinctes")
     
     # DIAGNOSTIC : Afficher les fournisseurs agrégés pour le premier client
     if client_suppliers_map:
@@ -1,8 +1,22 @@
 """
 Stockage en mémoire des imports.
+
+_imports et _pure_data_imports sont des MemoryBudgetStore : dictionnaires bornés par un budget
+mémoire estimé (IMPORT_MEMORY_MB, PURE_DATA_MEMORY_MB). Au-delà, les entrées les moins récemment
+utilisées sont retirées après avoir été écrites sur disque (ou si elles y sont déjà) ; les imports
+« live » (sheets_live, monthly_live) sont épinglés. Les imports RFA retirés sont rechargés par la
+hiérarchie de caches (app.services.import_cache), les Pure Data depuis leur copie disque.
+
+sheets_live est publié en fichier colonnes projeté (app.services.columnar_snapshot) : ses lignes
+sont partagées entre les workers, et chacun reprend la dernière génération publiée à la lecture.
 """
-from typing import Dict, Optional, List
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterable, Optional, List, Tuple
 from datetime import datetime
+import os
+import sys
+import threading
 import uuid
 
 
@@ -30,35 +44,353 @@ class PureDataImport:
         self.rows = rows  # liste de dicts normalisés
 
 
-# Stockage global en mémoire
-_imports: Dict[str, ImportData] = {}
-_pure_data_imports: Dict[str, PureDataImport] = {}
+# ==================== BUDGET MÉMOIRE ====================
+
+_SAMPLE = 64  # éléments mesurés par collection (taille extrapolée au reste)
+
+
+def _deep_size(obj: Any, depth: int = 0) -> int:
+    size = sys.getsizeof(obj)
+    if depth > 6:
+        return size
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, depth + 1) + _deep_size(v, depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_size(v, depth + 1) for v in obj)
+    return size
+
+
+def _sampled_size(items: Iterable, count: int, measure: Callable[[Any], int]) -> int:
+    """Taille de count éléments extrapolée depuis au plus _SAMPLE éléments répartis."""
+    if not count:
+        return 0
+    items = list(items) if not isinstance(items, list) else items
+    step = max(1, count // _SAMPLE)
+    sample = items[::step][:_SAMPLE]
+    return int(sum(measure(x) for x in sample) * count / len(sample))
+
+
+def estimate_size(obj: Any) -> int:
+    """Estimation (octets) d'un ImportData / PureDataImport : lignes + agrégations, par échantillonnage."""
+    size = sys.getsizeof(obj)
+    rows = getattr(obj, "data", None)
+    if rows is None:
+        rows = getattr(obj, "rows", None) or []
+    if hasattr(rows, "private_bytes"):
+        size += rows.private_bytes()  # lignes projetées (mmap) : pages partagées, hors budget
+    else:
+        size += sys.getsizeof(rows) + _sampled_size(rows, len(rows), _deep_size)
+    for name in ("by_client", "by_group"):
+        mapping = getattr(obj, name, None)
+        if mapping:
+            size += sys.getsizeof(mapping) + _sampled_size(
+                list(mapping.items()), len(mapping), lambda kv: _deep_size(kv[0]) + _deep_size(kv[1])
+            )
+    return size
+
+
+class MemoryBudgetStore(MutableMapping):
+    """
+    Dictionnaire id -> import borné par un budget mémoire estimé, éviction LRU.
+    - Une entrée n'est retirée que si spill(key, obj) confirme une copie hors mémoire ;
+      la dernière entrée insérée et les objets épinglés (aussi sous leurs alias) restent.
+      spill() s'exécute hors du verrou (écriture disque) : victimes choisies sous le verrou,
+      puis retirées seulement si elles sont toujours là et le budget toujours dépassé.
+    - Un même objet rangé sous plusieurs clés (alias « sheets_live ») n'est compté qu'une fois.
+    - get() sur une clé absente essaie reload(key) (copie disque).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        budget_bytes: int,
+        pinned: Iterable[str] = (),
+        spill: Optional[Callable[[str, Any], bool]] = None,
+        reload: Optional[Callable[[str], Any]] = None,
+    ):
+        self.name = name
+        self.budget_bytes = budget_bytes
+        self.pinned = set(pinned)
+        self._spill = spill
+        self._reload = reload
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[int, int] = {}  # id(objet) -> taille estimée
+        self._refs: Dict[int, int] = {}  # id(objet) -> nombre de clés
+        self._bytes = 0
+        self._spilling: set = set()  # clés en cours d'écriture hors mémoire (par un autre appel)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spill_failures = 0
+        self.reloads = 0
+
+    # -- MutableMapping --
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            obj = self._entries[key]
+            self._entries.move_to_end(key)
+            return obj
+
+    def __setitem__(self, key: str, obj: Any) -> None:
+        with self._lock:
+            self._insert(key, obj)
+        self._enforce(keep=key)
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            self._release(self._entries.pop(key))
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Entrée (marquée récente), sinon rechargée par reload(key) si possible."""
+        with self._lock:
+            obj = self._entries.get(key)
+            if obj is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return obj
+            self.misses += 1
+        if self._reload is None:
+            return default
+        obj = self._reload(key)
+        if obj is None:
+            return default
+        with self._lock:
+            self.reloads += 1
+            if key not in self._entries:
+                self._insert(key, obj)
+            obj = self._entries[key]
+        self._enforce(keep=key)
+        return obj
+
+    def put(self, key: str, obj: Any) -> None:
+        """Range obj sous key, ou ré-estime sa taille s'il y est déjà (ex. agrégations calculées)."""
+        with self._lock:
+            if self._entries.get(key) is not obj:
+                self._insert(key, obj)
+            else:
+                self._entries.move_to_end(key)
+                oid = id(obj)
+                size = estimate_size(obj)
+                self._bytes += size - self._sizes[oid]
+                self._sizes[oid] = size
+        self._enforce(keep=key)
+
+    # -- budget --
+    def _insert(self, key: str, obj: Any) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._release(previous)
+        self._entries[key] = obj
+        self._acquire(obj)
+
+    def _acquire(self, obj: Any) -> None:
+        oid = id(obj)
+        if oid in self._refs:
+            self._refs[oid] += 1
+            return
+        self._refs[oid] = 1
+        self._sizes[oid] = estimate_size(obj)
+        self._bytes += self._sizes[oid]
+
+    def _release(self, obj: Any) -> None:
+        oid = id(obj)
+        self._refs[oid] -= 1
+        if self._refs[oid] == 0:
+            del self._refs[oid]
+            self._bytes -= self._sizes.pop(oid)
+
+    def _pick_victims(self, skip: set) -> List[Tuple[str, Any, bool]]:
+        """(clé, objet, copie à écrire) les moins récemment utilisés, jusqu'à repasser sous le budget (verrou tenu)."""
+        pinned = {id(self._entries[k]) for k in self.pinned if k in self._entries}
+        projected = self._bytes
+        victims = []
+        for key, obj in self._entries.items():
+            if projected <= self.budget_bytes:
+                break
+            if key in skip or key in self._spilling or id(obj) in pinned:
+                continue
+            last_ref = self._refs[id(obj)] == 1
+            victims.append((key, obj, last_ref and self._spill is not None))
+            if last_ref:
+                projected -= self._sizes[id(obj)]
+        return victims
+
+    def _enforce(self, keep: str) -> None:
+        """Retire les entrées les moins récentes au-delà du budget ; appelé sans le verrou."""
+        skip = {keep}
+        while True:
+            with self._lock:
+                if self._bytes <= self.budget_bytes:
+                    return
+                victims = self._pick_victims(skip)
+                if not victims:
+                    break
+                self._spilling.update(key for key, _, _ in victims)
+            try:
+                for key, obj, needs_copy in victims:
+                    skip.add(key)
+                    if needs_copy and not self._spill(key, obj):
+                        with self._lock:
+                            self.spill_failures += 1
+                        continue
+                    with self._lock:
+                        # Remplacée, supprimée ou budget revenu entre-temps : on la garde
+                        if self._entries.get(key) is not obj or self._bytes <= self.budget_bytes:
+                            continue
+                        del self._entries[key]
+                        self._release(obj)
+                        self.evictions += 1
+            finally:
+                with self._lock:
+                    self._spilling.difference_update(key for key, _, _ in victims)
+        print(f"[STORAGE] {self.name}: budget mémoire dépassé ({self._bytes} > {self.budget_bytes} octets)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "pinned": sorted(k for k in self.pinned if k in self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "spill_failures": self.spill_failures,
+                "reloads": self.reloads,
+                "largest": sorted(
+                    ({"key": k, "bytes": self._sizes[id(o)]} for k, o in self._entries.items()),
+                    key=lambda e: -e["bytes"],
+                )[:5],
+            }
+
 
 # ID fixe pour l'import "source Sheets" (feuille connectée comme base de données RFA)
 LIVE_IMPORT_ID = "sheets_live"
 
+IMPORT_MEMORY_MB = float(os.environ.get("IMPORT_MEMORY_MB", "512"))
+PURE_DATA_MEMORY_MB = float(os.environ.get("PURE_DATA_MEMORY_MB", "256"))
+
+_persisted: set = set()  # imports RFA dont une copie durable existe hors mémoire (base, pas le cache disque LRU)
+_persisted_lock = threading.Lock()
+
+
+def _spill_import(import_id: str, import_data: ImportData) -> bool:
+    """Copie en base : retrait direct ; sinon instantané disque épinglé (import_cache.spill)."""
+    if import_id in _persisted:
+        return True
+    from app.services.import_cache import import_cache
+    return import_cache.spill(import_data)
+
+
+def _spill_pure_data(key: str, pd_import: PureDataImport) -> bool:
+    from app.services.import_cache import pure_data_disk
+    return pure_data_disk.put(key, pd_import)
+
+
+def _reload_pure_data(key: str) -> Optional[PureDataImport]:
+    from app.services.import_cache import pure_data_disk
+    return pure_data_disk.get(key)
+
+
+# Stockage global en mémoire
+_imports = MemoryBudgetStore(
+    "imports", int(IMPORT_MEMORY_MB * 1024 * 1024), pinned=[LIVE_IMPORT_ID], spill=_spill_import,
+)
+_pure_data_imports = MemoryBudgetStore(
+    "pure_data", int(PURE_DATA_MEMORY_MB * 1024 * 1024), pinned=[LIVE_IMPORT_ID, "monthly_live"],
+    spill=_spill_pure_data, reload=_reload_pure_data,
+)
+
+
+def put_import(import_data: ImportData) -> None:
+    """
+    Range (ou re-mesure) un import en mémoire ; les plus anciens sont retirés au-delà du budget.
+    sheets_live est d'abord publié pour les autres workers, et sa version projetée est gardée.
+    """
+    if import_data.import_id == LIVE_IMPORT_ID:
+        from app.services.columnar_snapshot import live_import_snapshot
+        import_data = live_import_snapshot.publish(import_data) or import_data
+    _imports.put(import_data.import_id, import_data)
+
+
+def _sync_live_import() -> None:
+    """Reprend la génération de sheets_live publiée par un autre worker, si elle a changé."""
+    from app.services.columnar_snapshot import live_import_snapshot
+    import_data = live_import_snapshot.refresh()
+    if import_data is not None:
+        _imports.put(LIVE_IMPORT_ID, import_data)
+
+
+def mark_persisted(import_id: str) -> None:
+    """Signale qu'un import a une copie durable (base) : il peut être retiré de la mémoire sans autre copie."""
+    with _persisted_lock:
+        _persisted.add(import_id)
+
+
+def unmark_persisted(import_id: str) -> None:
+    """Copie hors mémoire supprimée (rétention, suppression) : l'import devra être recopié avant d'être retiré."""
+    with _persisted_lock:
+        _persisted.discard(import_id)
+
+
+def delete_import(import_id: str) -> None:
+    """Retire un import de la mémoire (voir import_cache.delete pour les niveaux persistants)."""
+    unmark_persisted(import_id)
+    if import_id in _imports:
+        try:
+            del _imports[import_id]
+        except KeyError:
+            pass
+
 
 def create_import(raw_columns: list, column_mapping: dict, data: list) -> str:
     """Crée un nouvel import et retourne son ID."""
     import_id = str(uuid.uuid4())
-    _imports[import_id] = ImportData(import_id, raw_columns, column_mapping, data)
+    put_import(ImportData(import_id, raw_columns, column_mapping, data))
     return import_id
 
 
-def set_live_import(raw_columns: list, column_mapping: dict, data: list) -> str:
-    """Enregistre ou met à jour l'import "feuille Sheets" (source RFA pour tous)."""
-    _imports[LIVE_IMPORT_ID] = ImportData(LIVE_IMPORT_ID, raw_columns, column_mapping, data)
+def set_live_import(
+    raw_columns: list,
+    column_mapping: dict,
+    data: list,
+    by_client: Optional[Dict[str, Dict]] = None,
+    by_group: Optional[Dict[str, Dict]] = None,
+) -> str:
+    """
+    Enregistre ou met à jour l'import "feuille Sheets" (source RFA pour tous) : écrit atomiquement
+    une nouvelle génération du fichier partagé (agrégations comprises si fournies), que les autres
+    workers reprennent à leur prochaine lecture.
+    """
+    import_data = ImportData(LIVE_IMPORT_ID, raw_columns, column_mapping, data)
+    import_data.by_client = by_client or {}
+    import_data.by_group = by_group or {}
+    put_import(import_data)
     return LIVE_IMPORT_ID
 
 
 def get_import(import_id: str) -> Optional[ImportData]:
-    """Récupère un import par ID."""
+    """Récupère un import par ID (en mémoire)."""
+    if import_id == LIVE_IMPORT_ID:
+        _sync_live_import()
     return _imports.get(import_id)
 
 
 def get_live_import() -> Optional[ImportData]:
     """Récupère l'import issu de la feuille Sheets connectée, s'il existe."""
-    return _imports.get(LIVE_IMPORT_ID)
+    return get_import(LIVE_IMPORT_ID)
 
 
 def list_imports() -> List[str]:
@@ -74,4 +406,3 @@ def create_pure_data_import(raw_columns: list, column_mapping: dict, rows: list)
 
 def get_pure_data_import(import_id: str) -> Optional[PureDataImport]:
     return _pure_data_imports.get(import_id)
-
@@ -0,0 +1,126 @@
+"""
+Tests pour le chargement en masse (encodeur CSV COPY + chemin SQLite).
+"""
+from sqlalchemy import create_engine, text
+
+from app.services.bulk_load import CsvStream, bulk_load, encode_csv_line, pg_swap_reload, swap_reload
+
+
+def test_encode_csv_line_empty_string_is_null():
+    """None et chaîne vide = champ vide non quoté (NULL pour COPY CSV)"""
+    assert encode_csv_line([None, "", "abc"]) == '\t\tabc\n'
+
+
+def test_encode_csv_line_quotes_special_characters():
+    assert encode_csv_line(['a"b', "x\ty", 1, 2.5]) == '"a""b"\t"x\ty"\t1\t2.5\n'
+
+
+def test_csv_stream_reads_in_chunks():
+    rows = [(i, f"client {i}") for i in range(100)]
+    stream = CsvStream(rows)
+    chunks = []
+    while True:
+        chunk = stream.read(37)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    expected = "".join(encode_csv_line(r) for r in rows)
+    assert "".join(chunks) == expected
+    assert stream.count == 100
+
+
+def test_bulk_load_sqlite_truncate_and_insert():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE "t" ("code" TEXT, "ca" REAL)'))
+        conn.execute(text("INSERT INTO \"t\" VALUES ('OLD', 1.0)"))
+
+    n = bulk_load("t", ["code", "ca"], ((f"M{i:04d}", float(i)) for i in range(10)), truncate=True, engine=engine)
+
+    assert n == 10
+    with engine.connect() as conn:
+        rows = conn.execute(text('SELECT "code", "ca" FROM "t" ORDER BY "code"')).fetchall()
+    assert len(rows) == 10
+    assert rows[0] == ("M0000", 0.0)
+
+
+def test_swap_reload_sqlite_replaces_content():
+    """Hors PostgreSQL : DELETE + INSERT dans une seule transaction"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE "t" ("code" TEXT, "ca" REAL)'))
+        conn.execute(text("INSERT INTO \"t\" VALUES ('OLD', 1.0)"))
+
+    n = swap_reload("t", ["code", "ca"], [("NEW", 2.0)], engine=engine)
+
+    assert n == 1
+    with engine.connect() as conn:
+        rows = conn.execute(text('SELECT "code", "ca" FROM "t"')).fetchall()
+    assert rows == [("NEW", 2.0)]
+
+
+class _FakePgCursor:
+    """Curseur psycopg2 factice : journalise les requêtes, répond aux requêtes catalogue."""
+
+    def __init__(self, dependents=False):
+        self.sql, self._dependents, self._result = [], dependents, []
+
+    def execute(self, sql, params=None):
+        self.sql.append(" ".join(sql.split()))
+        if "EXISTS" in sql:
+            self._result = [(self._dependents,)]
+        elif "pg_get_indexdef" in sql:
+            self._result = [
+                ("idx_pure_data_annee", "CREATE INDEX idx_pure_data_annee ON public.pure_data USING btree (annee)", None),
+                ("pure_data_pkey", "CREATE UNIQUE INDEX pure_data_pkey ON public.pure_data USING btree (id)", "PRIMARY KEY (id)"),
+            ]
+        else:
+            self._result = []
+
+    def copy_expert(self, sql, stream):
+        self.sql.append(sql.split(" (")[0])
+        stream.read()
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0]
+
+    def close(self):
+        pass
+
+
+class _FakePgConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self._cursor.sql.append("COMMIT")
+
+    def rollback(self):
+        self._cursor.sql.append("ROLLBACK")
+
+
+def test_pg_swap_reload_builds_indexes_after_copy_under_canonical_names():
+    cur = _FakePgCursor()
+    assert pg_swap_reload(_FakePgConnection(cur), "pure_data", ["annee"], [(2025,), (2024,)]) == 2
+
+    sql = cur.sql
+    create = next(i for i, s in enumerate(sql) if s.startswith("CREATE TABLE"))
+    copy = next(i for i, s in enumerate(sql) if s.startswith("COPY"))
+    index = next(i for i, s in enumerate(sql) if s.startswith("CREATE INDEX"))
+    drop = sql.index('DROP TABLE "pure_data__old"')
+    assert "EXCLUDING INDEXES" in sql[create] and create < copy < index < drop
+    assert any("ADD CONSTRAINT" in s and s.endswith("PRIMARY KEY (id)") for s in sql[copy:drop])
+    renames = [s for s in sql[drop:] if "RENAME" in s]
+    assert renames[0].endswith('TO "idx_pure_data_annee"') and renames[1].endswith('TO "pure_data_pkey"')
+
+
+def test_pg_swap_reload_with_dependent_view_reloads_in_place():
+    cur = _FakePgCursor(dependents=True)
+    assert pg_swap_reload(_FakePgConnection(cur), "pure_data", ["annee"], [(2025,)]) == 1
+    assert 'DELETE FROM "pure_data"' in cur.sql and not any("RENAME" in s for s in cur.sql)
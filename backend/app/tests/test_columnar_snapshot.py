@@ -0,0 +1,53 @@
+"""
+Tests pour les instantanés en colonnes projetés (mmap) et leur publication entre workers.
+"""
+from app.services.columnar_snapshot import ColumnarRows, SharedSnapshot, encode_columnar, open_columnar
+from app.services.import_cache import PureDataDisk
+from app.storage import LIVE_IMPORT_ID, ImportData, PureDataImport
+
+ROWS = [
+    {"code_union": "M0001", "nom_client": "Garage Éric", "GLOBAL_ACR": 1000.0, "annee": 2025, "extra": [1, "a"]},
+    {"code_union": "M0002", "nom_client": None, "GLOBAL_ACR": 0, "annee": None, "extra": True},
+    {"code_union": "M0001", "nom_client": "Garage Éric", "GLOBAL_ACR": 2.5, "annee": 2024, "extra": None},
+]
+
+
+def test_round_trip_keeps_rows_types_and_aggregations(tmp_path):
+    import_data = ImportData("imp", ["Code Union"], {"code_union": "Code Union"}, ROWS)
+    import_data.by_client = {"M0001": {"grand_total": 1002.5}}
+    path = tmp_path / "imp.col"
+    path.write_bytes(encode_columnar(import_data, generation=7))
+
+    restored = open_columnar(str(path))
+    assert isinstance(restored.data, ColumnarRows) and restored.data.generation == 7
+    assert restored.data == ROWS and list(restored.data) == ROWS
+    assert restored.data[-1] == ROWS[2] and restored.data[1:2] == ROWS[1:2]
+    assert type(restored.data[0]["annee"]) is int and restored.data[0]["extra"] == [1, "a"]
+    assert restored.by_client == import_data.by_client and restored.created_at == import_data.created_at
+
+
+def test_pure_data_spill_reloads_as_mapped_rows(tmp_path):
+    disk = PureDataDisk(1 << 20, directory=str(tmp_path))
+    rows = [{"code_union": "M0001", "ca": 12.5, "year": 2025, "month": 3}]
+    assert disk.put("pd1", PureDataImport("pd1", ["CA"], {"ca": "CA"}, rows))
+
+    reloaded = disk.get("pd1")
+    assert isinstance(reloaded.rows, ColumnarRows) and reloaded.rows == rows
+    assert disk.put("pd1", reloaded)  # déjà sur disque : pas de réécriture
+    assert disk.get("absent") is None
+
+
+def test_workers_pick_up_new_generation(tmp_path):
+    writer, reader = SharedSnapshot("live", str(tmp_path)), SharedSnapshot("live", str(tmp_path))
+    first = writer.publish(ImportData(LIVE_IMPORT_ID, [], {}, ROWS[:1]), source_version="v1")
+    assert isinstance(first.data, ColumnarRows)
+
+    assert reader.refresh() is None  # pas encore de génération : le démarrage passe par adopt()
+    assert reader.adopt("v2") is None and reader.stats()["stale"] == 1
+    assert reader.adopt("v1").data == ROWS[:1]
+
+    second = writer.publish(ImportData(LIVE_IMPORT_ID, [], {}, ROWS))
+    assert second.data.generation > first.data.generation
+    assert reader.refresh().data == ROWS and reader.generation == second.data.generation
+    assert reader.refresh() is None
+    assert writer.publish(second) is second and len(list(tmp_path.glob("live.*.col"))) == 2
@@ -0,0 +1,29 @@
+"""
+Tests pour le détail RFA interne (dicts) et sa conversion Pydantic à la frontière API.
+"""
+from types import SimpleNamespace
+
+from app.services import compute
+from app.services.rfa_calculator import calculate_rfa
+from app.storage import ImportData
+
+
+def test_build_entity_detail_matches_pydantic_dump(monkeypatch):
+    monkeypatch.setattr(compute, "resolve_contract", lambda **kw: SimpleNamespace(id=7, name="Standard"))
+    monkeypatch.setattr(compute, "calculate_rfa", lambda recap_ca, **kw: calculate_rfa(recap_ca))
+
+    rows = [
+        {"code_union": "M0001", "nom_client": "Garage A", "groupe_client": "grp", "GLOBAL_ACR": 100000, "TRI_DCA_SBS": 30000},
+        {"code_union": "M0002", "nom_client": "", "groupe_client": "grp", "GLOBAL_ALLIANCE": 50000.0},
+    ]
+    import_data = ImportData("imp", [], {}, rows)
+    compute.compute_aggregations(import_data)
+
+    for mode, entity_id in (("client", "M0001"), ("client", "M0002"), ("group", "GRP")):
+        detail = compute.build_entity_detail(import_data, mode, entity_id)
+        model = compute.get_entity_detail_with_rfa(import_data, mode, entity_id)
+        assert detail == model.model_dump(by_alias=True, mode="json")
+        assert list(detail["rfa"]) == ["global", "tri", "marketing", "totals", "bonus_groups"]
+
+    detail["ca"]["global"]["GLOBAL_ACR"] = -1.0
+    assert import_data.by_group["GRP"]["global"]["GLOBAL_ACR"] == 100000
@@ -0,0 +1,56 @@
+"""
+Tests pour le cache disque LRU borné (app.services.disk_cache).
+"""
+import os
+import time
+
+from app.services.disk_cache import DiskCache
+
+
+def test_put_get_with_meta(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10_000)
+    assert cache.get("a") is None
+    cache.put("a", b"contenu", {"name": "rib.pdf"})
+    data, meta = cache.get("a")
+    assert data == b"contenu"
+    assert meta == {"name": "rib.pdf"}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=2_500)
+    cache.put("a", b"x" * 1000)
+    cache.put("b", b"y" * 1000)
+    # "a" plus ancien sur disque, puis relu : il devient le plus récent
+    old = time.time() - 100
+    os.utime(cache._path("a") + ".bin", (old, old))
+    os.utime(cache._path("b") + ".bin", (old + 1, old + 1))
+    cache.get("a")
+    cache.put("c", b"z" * 1000)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["bytes"] <= 2_500
+
+
+def test_oversized_entry_ignored(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    cache.put("big", b"x" * 1000)
+    assert cache.get("big") is None
+
+
+def test_pinned_entry_survives_eviction_until_unpinned(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=2_500)
+    cache.put("a", b"x" * 1000, pin=True)
+    cache.put("b", b"y" * 1000)
+    old = time.time() - 100
+    os.utime(cache._path("a") + ".bin", (old, old))
+    cache.put("c", b"z" * 1000)
+    assert cache.get("a") is not None and cache.get("b") is None
+    assert cache.stats()["pinned"] == 1
+
+    cache.unpin("a")
+    os.utime(cache._path("a") + ".bin", (old, old))
+    cache.put("d", b"w" * 1000)
+    assert cache.get("a") is None and cache.stats()["pinned"] == 0
@@ -0,0 +1,51 @@
+"""
+Tests pour les exports Excel en streaming (classeur write_only + styles nommés).
+"""
+from io import BytesIO
+
+import openpyxl
+import pytest
+
+from app.services.excel_export import MONEY_FMT, StreamingWorkbook
+
+
+def _build(book: StreamingWorkbook):
+    ws = book.add_sheet("Synthese", widths=[30, 18], merge="A1:B1")
+    book.append(ws, ["TITRE"], "title")
+    book.blank(ws)
+    book.append(ws, ["Fournisseur", "CA"], "header")
+    for i in range(2000):
+        book.append(ws, [f"F{i}", float(i)], ["text", "money"])
+    book.append(ws, ["TOTAL", 1999000.0], "subtotal_money")
+
+
+def test_stream_produces_valid_styled_workbook():
+    chunks = list(StreamingWorkbook().stream(_build, chunk_size=4096))
+    assert len(chunks) > 1
+
+    wb = openpyxl.load_workbook(BytesIO(b"".join(chunks)))
+    ws = wb["Synthese"]
+    assert ws["A1"].value == "TITRE"
+    assert ws["A1"].font.b
+    assert "A1:B1" in ws.merged_cells
+    assert ws.column_dimensions["A"].width == 30
+    assert ws["A3"].style == "header"
+    assert ws["B4"].number_format == MONEY_FMT
+    assert ws.max_row == 2004
+    assert ws["A2004"].value == "TOTAL"
+
+
+def test_stream_propagates_build_errors():
+    def _failing(book):
+        book.add_sheet("X")
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        list(StreamingWorkbook().stream(_failing))
+
+
+def test_stream_can_be_abandoned():
+    """Consommateur arrêté après le premier morceau : le producteur est libéré."""
+    gen = StreamingWorkbook().stream(_build, chunk_size=1024)
+    assert next(gen)
+    gen.close()
@@ -0,0 +1,58 @@
+"""
+Tests pour le cache des analyses Génie (LRU en octets, clés versionnées, niveau persistant compressé).
+"""
+from app.services.genie_cache import ByteLRU, decode_analysis, encode_analysis, import_fingerprint
+from app.storage import ImportData
+
+
+def test_byte_lru_evicts_least_recently_used():
+    lru = ByteLRU(max_bytes=100)
+    lru.put("a", 1, 40)
+    lru.put("b", 2, 40)
+    assert lru.get("a") == 1  # "b" devient le moins récent
+    lru.put("c", 3, 40)
+    lru.put("huge", 4, 500)  # plus grande que le cache : ignorée
+
+    assert lru.get("b") is None
+    assert lru.get("huge") is None
+    stats = lru.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 80
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["hit_rate"] == round(1 / 3, 4)
+
+
+def test_persistent_encoding_is_versioned():
+    analysis = {"summary": {"total_clients": 3}, "smart_plans": [{"entity_id": "M0001", "label": "Étape"}] * 2000}
+    value = encode_analysis("imp:abc:4", analysis)
+    assert len(value) < len(str(analysis)) / 10
+    assert decode_analysis("imp:abc:4", value) == analysis
+    assert decode_analysis("imp:abc:5", value) is None
+    assert decode_analysis("imp:abc:4", '{"summary": {}}') is None  # ancienne copie JSON brute
+
+
+def test_import_fingerprint_follows_aggregates():
+    rows = [{"code_union": "M0001", "groupe_client": "G", "GLOBAL_ACR": 10.0}]
+    first = ImportData("imp", [], {}, rows)
+    second = ImportData("imp", [], {}, list(rows))
+    for import_data in (first, second):
+        import_data.by_client = {"M0001": {"nom_client": None, "groupe_client": "G", "global": {"GLOBAL_ACR": 10.0}, "tri": {}}}
+    assert import_fingerprint(first) == import_fingerprint(second)
+
+    second.by_client = {"M0001": {"nom_client": None, "groupe_client": "G", "global": {"GLOBAL_ACR": 11.0}, "tri": {}}}
+    assert import_fingerprint(first) != import_fingerprint(second)
+
+
+def test_bump_contracts_version_always_changes_the_key():
+    from sqlalchemy.pool import StaticPool
+    from sqlmodel import Session, SQLModel, create_engine
+    from app.models import AppSettings
+    from app.services.genie_cache import bump_contracts_version, contracts_version
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine, tables=[AppSettings.__table__])
+    with Session(engine) as session:
+        assert contracts_version(session) == "0"
+        versions = [bump_contracts_version(session) for _ in range(3)]  # ligne créée puis mise à jour
+        assert len(set(versions)) == 3 and contracts_version(session) == versions[-1]
+        assert len(session.exec(AppSettings.__table__.select()).all()) == 1
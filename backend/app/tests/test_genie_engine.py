@@ -0,0 +1,89 @@
+"""
+Tests pour l'analyse Génie par entité (unités de travail, pool de processus).
+"""
+from contextlib import contextmanager
+
+import pytest
+
+from app.services import genie_engine
+from app.services.genie_cache import GenieCache
+
+
+class FakeContext:
+    built = 0
+
+    @contextmanager
+    def activate(self):
+        yield self
+
+    def to_payload(self):
+        return {"contracts": {}}
+
+    @classmethod
+    def from_payload(cls, payload):
+        cls.built += 1
+        return cls()
+
+
+def fake_detail(import_data, mode, entity_id):
+    if entity_id == "KO":
+        raise ValueError("Client KO non trouvé")
+    source = import_data.by_client if mode == "client" else import_data.by_group
+    assert list(source) == [entity_id]
+    return {"entity_id": entity_id}
+
+
+def fake_analyze(entity_dict, mode, entity_id):
+    return {"global_rows": [], "tri_rows": [], "rfa_by_key": {"GLOBAL_ACR": float(len(entity_id))}, "id": f"{mode}:{entity_id}"}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_analyze_entities_keeps_unit_order(monkeypatch, workers):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ThreadPoolExecutor(max_workers=1)  # même chemin que le pool de processus, dans ce processus
+    monkeypatch.setattr(genie_engine, "_get_analysis_pool", lambda: pool)
+    monkeypatch.setattr(genie_engine, "_worker_context", None)
+    monkeypatch.setattr("app.services.rfa_context.RfaContext", FakeContext)
+    monkeypatch.setattr(FakeContext, "built", 0)
+    monkeypatch.setattr(genie_engine, "GENIE_CHUNK_SIZE", 2)
+    monkeypatch.setattr(genie_engine, "build_entity_detail", fake_detail)
+    monkeypatch.setattr(genie_engine, "_analyze_entity", fake_analyze)
+
+    units = [("client", f"M{i:04d}", {"grand_total": i}) for i in range(5)]
+    units += [("client", "KO", {}), ("group", "GROUPE A", {"nb_comptes": 3})]
+    results = genie_engine.analyze_entities(FakeContext(), units, max_workers=workers)
+
+    assert [r and r["id"] for r in results] == [
+        "client:M0000", "client:M0001", "client:M0002", "client:M0003", "client:M0004", None, "group:GROUPE A",
+    ]
+    # Contexte reconstruit une fois par processus et par instantané, pas à chaque paquet
+    assert FakeContext.built == (1 if workers > 1 else 0)
+    pool.shutdown()
+
+
+def test_targeted_invalidation_keeps_unrelated_entities(monkeypatch):
+    analysis = lambda contract_id, groupe=None: {"rfa_by_key": {}, "contract_id": contract_id, "groupe_client": groupe}
+    cache = GenieCache(max_bytes=1 << 20, persist_max_bytes=1 << 20)
+    cache.put_memory("imp:f00d:3", {"summary": {}})
+    monkeypatch.setattr(genie_engine, "genie_cache", cache)
+    monkeypatch.setattr(genie_engine, "_entity_cache", {"imp": ("3", {
+        ("client", "M0001"): analysis(1, "GRP"),
+        ("client", "M0002"): analysis(1),
+        ("client", "M0003"): analysis(2),
+        ("client", "KO"): None,
+        ("group", "GRP"): analysis(1),
+        genie_engine.UNION_KEY: analysis(None),
+    })})
+    entities = genie_engine._entity_cache["imp"][1]
+
+    assert genie_engine.invalidate_genie_entities("GROUPE_CLIENT", " grp ") == 3
+    assert set(entities) == {("client", "M0002"), ("client", "M0003"), genie_engine.UNION_KEY}
+    assert cache.get_memory("imp:f00d:3") is None
+
+    assert genie_engine.invalidate_genie_contract(2, versions=("3", "4")) == 2
+    assert genie_engine._entity_cache["imp"] == ("4", {("client", "M0002"): analysis(1)})
+
+    # Version modifiée ailleurs (autre processus) : toutes les parties de l'import sont écartées
+    assert genie_engine.invalidate_genie_entities("CODE_UNION", "M0009", versions=("7", "8")) == 1
+    assert genie_engine._entity_cache == {}
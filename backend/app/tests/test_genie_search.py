@@ -0,0 +1,44 @@
+"""
+Tests pour l'index de recherche Génie (sans accents, classement).
+"""
+from app.services.genie_search import EntitySearchIndex, build_search_entries, normalize, search_index_for
+from app.storage import ImportData
+
+
+def make_import():
+    import_data = ImportData("imp", [], {}, [])
+    import_data.by_client = {
+        "M0001": {"nom_client": "Garage Éric", "groupe_client": "AUTO PLUS"},
+        "M0002": {"nom_client": "Éric Pneus", "groupe_client": ""},
+        "M0120": {"nom_client": "Carrosserie du Lac", "groupe_client": "AUTO PLUS"},
+    }
+    import_data.by_group = {
+        "AUTO PLUS": {"nb_comptes": 2, "codes_union": ["M0001", "M0120"]},
+        "M0002": {"nb_comptes": 1, "codes_union": ["M0002"]},
+    }
+    return import_data
+
+
+def test_normalize_strips_accents_and_punctuation():
+    assert normalize("  Garage-Éric  (Lyon) ") == "GARAGE ERIC LYON"
+
+
+def test_search_is_ranked_and_accent_insensitive():
+    index = EntitySearchIndex(build_search_entries(make_import()))
+
+    assert [m.entity_id for m in index.search("eric")] == ["M0002", "M0001"]
+    assert [(m.mode, m.entity_id) for m in index.search("m0002")] == [("client", "M0002"), ("group", "M0002")]
+    assert [m.entity_id for m in index.search("M012")] == ["M0120", "AUTO PLUS"]
+    assert index.best("lac").entity_label == "M0120 - Carrosserie du Lac"
+    assert index.search("zzz") == [] and index.search("  ") == []
+
+
+def test_filter_rows_and_rebuild_for_old_cache_entries():
+    analysis = {"smart_plans": [{"entity_id": "AUTO PLUS"}, {"entity_id": "M0001"}, {"entity_id": "M0002"}]}
+    index = search_index_for(analysis, make_import())
+    assert search_index_for(analysis) is index
+
+    rows = index.filter_rows("smart_plans", lambda: analysis["smart_plans"], "auto")
+    assert rows == [{"entity_id": "AUTO PLUS"}]
+    rows = index.filter_rows("smart_plans", lambda: analysis["smart_plans"], "M0001")
+    assert [r["entity_id"] for r in rows] == ["M0001", "AUTO PLUS"]
@@ -0,0 +1,43 @@
+"""
+Tests pour la fabrique partagée de clients Google API (aucun appel réseau).
+"""
+import datetime
+import threading
+
+from app.services import google_clients
+
+
+def _fresh_oauth_creds():
+    creds = google_clients.oauth_user_credentials("client-id", "secret", "refresh", ["scope-b", "scope-a"])
+    creds.token = "token"
+    creds.expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(hours=1)
+    return creds
+
+
+def test_credentials_cached_per_identity_and_scopes():
+    google_clients.clear_cache()
+    a = google_clients.oauth_user_credentials("client-id", "secret", "refresh", ["scope-a", "scope-b"])
+    b = google_clients.oauth_user_credentials("client-id", "secret", "refresh", ["scope-b", "scope-a"])
+    c = google_clients.oauth_user_credentials("client-id", "secret", "refresh", ["scope-a"])
+    assert a is b
+    assert a is not c
+
+
+def test_service_reused_within_thread_not_across_threads():
+    google_clients.clear_cache()
+    creds = _fresh_oauth_creds()
+    first = google_clients.get_service("sheets", "v4", creds)
+    assert google_clients.get_service("sheets", "v4", creds) is first
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(google_clients.get_service("sheets", "v4", creds)))
+    t.start()
+    t.join()
+    assert other[0] is not first
+
+
+def test_needs_refresh_near_expiry():
+    creds = _fresh_oauth_creds()
+    assert not google_clients._needs_refresh(creds)
+    creds.expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(minutes=1)
+    assert google_clients._needs_refresh(creds)
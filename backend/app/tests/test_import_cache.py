@@ -0,0 +1,99 @@
+"""
+Tests pour la hiérarchie de caches des imports (mémoire → disque → base → origine).
+"""
+import pytest
+
+from app import storage
+from app.services import columnar_snapshot
+from app.services.import_cache import DiskTier, ImportCache, MemoryTier, decode_snapshot, encode_snapshot
+
+
+ROWS = [
+    {"code_union": "M0001", "nom_client": "Garage Éric", "groupe_client": "GRP", "GLOBAL_ACR": 1000.0},
+    {"code_union": "M0002", "nom_client": "Pneus", "groupe_client": "GRP", "GLOBAL_DCA": 250.5},
+]
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = ImportCache([MemoryTier(), DiskTier(1 << 20, directory=str(tmp_path))])
+    # Budget minimal : tout import persisté autre que le dernier et sheets_live est retiré
+    store = storage.MemoryBudgetStore(
+        "imports", 1, pinned=[storage.LIVE_IMPORT_ID], spill=lambda key, obj: key in storage._persisted or cache.spill(obj)
+    )
+    monkeypatch.setattr(storage, "_imports", store)
+    monkeypatch.setattr(storage, "_persisted", set())
+    monkeypatch.setattr(
+        columnar_snapshot, "live_import_snapshot", columnar_snapshot.SharedSnapshot("live", str(tmp_path / "shared"))
+    )
+    return cache
+
+
+def test_snapshot_round_trip_keeps_aggregations():
+    import_data = storage.ImportData("imp", ["Code Union"], {"code_union": "Code Union"}, ROWS)
+    import_data.by_client = {"M0001": {"grand_total": 1000.0, "global": {"GLOBAL_ACR": 1000.0}}}
+    import_data.by_group = {"GRP": {"codes_union": ["M0001", "M0002"]}}
+
+    restored = decode_snapshot(encode_snapshot(import_data))
+    assert restored.data == ROWS and restored.created_at == import_data.created_at
+    assert restored.by_client == import_data.by_client and restored.by_group == import_data.by_group
+    assert decode_snapshot(b"corrompu") is None
+
+
+def test_uploads_spill_from_memory_and_reload_from_disk(cache):
+    first = storage.ImportData("up1", [], {}, ROWS)
+    cache.put(first)
+    cache.put(storage.ImportData("up2", [], {}, ROWS[:1]))
+    cache.put(storage.ImportData(storage.LIVE_IMPORT_ID, [], {}, ROWS))
+
+    assert list(storage._imports) == [storage.LIVE_IMPORT_ID]
+    reloaded = cache.get("up1")
+    assert reloaded is not first and reloaded.data == ROWS
+    assert list(storage._imports) == [storage.LIVE_IMPORT_ID, "up1"]
+
+    stats = cache.stats()
+    assert stats["memory"]["misses"] == 1 and stats["disk"]["hits"] == 1 and stats["disk"]["writes"] == 3
+    # Seule copie hors mémoire : instantanés épinglés (hors LRU), sans copie durable
+    assert stats["disk"]["pinned"] == 2 and storage._persisted == set()
+
+
+def test_origin_fills_every_tier_once(cache):
+    calls = []
+
+    def origin():
+        calls.append(1)
+        return ROWS, ["Code Union"], {"code_union": "Code Union"}
+
+    loaded = cache.get("live", origin=origin)
+    assert loaded.by_client["M0001"]["nom_client"] == "Garage Éric"
+    del storage._imports["live"]
+    assert cache.get("live", origin=origin).data == ROWS
+    assert calls == [1]
+    assert cache.get("absent", origin=lambda: None) is None
+    assert cache.stats()["origin"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_database_snapshots_keep_most_recent_rows(cache):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy.pool import StaticPool
+    from sqlmodel import Session, SQLModel, create_engine
+    from app.models import AppSettings
+    from app.services.import_cache import SNAPSHOT_KEY_PREFIX, DatabaseTier, _snapshot_rows
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine, tables=[AppSettings.__table__])
+    written = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    tier = DatabaseTier(1 << 20, max_rows=2, max_total_bytes=1 << 20)
+    with Session(engine) as session:
+        for n, import_id in enumerate(("up1", "up2", "up3", "big")):
+            value = "x" * (2 << 20 if import_id == "big" else 10)
+            session.add(AppSettings(key=SNAPSHOT_KEY_PREFIX + import_id, value=value, updated_at=written + timedelta(n)))
+            storage.mark_persisted(import_id)
+        session.commit()
+
+        tier._enforce_retention(session, keep="up1")  # keep : toujours gardé, même le plus ancien
+        assert [import_id for import_id, _ in _snapshot_rows(session)] == ["up3", "up1"]
+        assert tier.evicted == 2 and storage._persisted == {"up1", "up3"}
+
+        tier.delete("up3", session)
+        assert [import_id for import_id, _ in _snapshot_rows(session)] == ["up1"] and tier.deleted == 1
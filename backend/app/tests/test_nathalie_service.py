@@ -0,0 +1,134 @@
+"""
+Tests pour le service Nathalie : cache des feuilles (TTL, revalidation, invalidation)
+et envoi des demandes d'ouverture aux fournisseurs.
+"""
+import base64
+import email
+
+import pytest
+
+from app.services import nathalie_service as ns
+
+
+@pytest.fixture
+def fake_sheets(monkeypatch):
+    state = {"reads": 0, "modified": "t1"}
+    clients_header = ["ID", "CODE UNION", "NOM"]
+
+    def fake_read_sheet(sheet_name, max_col="Z"):
+        state["reads"] += 1
+        if sheet_name == ns.SHEET_CLIENTS:
+            return [clients_header, ["1", "M0001", "Garage A"], ["2", "M0002", "Garage B"]]
+        if sheet_name == ns.SHEET_SUPPLIERS:
+            return [["Entreprise", "Nom", "Mail"], ["Acr", "Dupont", "a@acr.fr"]]
+        return [["ID"], ["T1", "1", "M0001"], ["T2", "2", "M0002"]]
+
+    monkeypatch.setattr(ns, "_read_sheet", fake_read_sheet)
+    monkeypatch.setattr(ns, "_spreadsheet_modified_time", lambda: state["modified"])
+    ns.invalidate_cache()
+    yield state
+    ns.invalidate_cache()
+
+
+def test_indexes_and_single_read_within_ttl(fake_sheets):
+    assert ns.get_client_by_code("M0002")["nom_client"] == "Garage B"
+    assert ns.get_client_by_code("M9999") is None
+    assert len(ns.get_clients()) == 2
+    assert ns.get_supplier_index()["ACR"]["mail"] == "a@acr.fr"
+    assert [t["id_tache"] for t in ns.get_tasks("M0001")] == ["T1"]
+    assert fake_sheets["reads"] == 3
+
+
+def test_revalidation_by_modified_time(fake_sheets, monkeypatch):
+    ns.get_clients()
+    monkeypatch.setattr(ns, "CACHE_TTL_SECONDS", 0)
+    ns.get_clients()
+    assert fake_sheets["reads"] == 1  # modifiedTime inchangé : pas de relecture
+    fake_sheets["modified"] = "t2"
+    ns.get_clients()
+    assert fake_sheets["reads"] == 2
+
+
+def test_explicit_invalidation(fake_sheets):
+    ns.get_clients()
+    ns.invalidate_cache(ns.SHEET_CLIENTS)
+    ns.get_clients()
+    assert fake_sheets["reads"] == 2
+
+
+class _RateLimited(Exception):
+    class resp:
+        status = 429
+
+
+def test_send_emails_keeps_order_shape_and_retries(monkeypatch):
+    client = {"code_union": "M0001", "nom_client": "Garage A", "rib": "https://drive.google.com/file/d/RIB1/view"}
+    suppliers = {
+        "ACR": {"entreprise": "ACR", "mail": "a@acr.fr"},
+        "DCA": {"entreprise": "DCA", "mail": ""},
+        "ZZZ": {"entreprise": "ZZZ", "mail": "z@zzz.fr"},
+    }
+    sent = []
+    attempts = {"z@zzz.fr": 0}
+
+    def fake_send_raw(raw):
+        msg = email.message_from_bytes(base64.urlsafe_b64decode(raw))
+        to = msg["To"]
+        if to in attempts:
+            attempts[to] += 1
+            if attempts[to] == 1:
+                raise _RateLimited()
+        sent.append((to, [p.get_filename() for p in msg.walk() if p.get_filename()]))
+        return f"id-{to}"
+
+    monkeypatch.setattr(ns, "get_client_by_code", lambda code: client)
+    monkeypatch.setattr(ns, "get_supplier_index", lambda: suppliers)
+    monkeypatch.setattr(ns, "_download_drive_file", lambda fid: (b"%PDF", f"{fid}.pdf", "application/pdf"))
+    monkeypatch.setattr(ns, "_get_gmail_client", None)
+    monkeypatch.setattr(ns, "_send_raw_gmail", lambda raw: ns._with_backoff(lambda: fake_send_raw(raw), base_delay=0))
+
+    results = ns.send_emails_to_suppliers("M0001", ["ACR", "DCA", "INCONNU", "ZZZ"], cc_emails=[])
+
+    assert [r["fournisseur"] for r in results] == ["ACR", "DCA", "INCONNU", "ZZZ"]
+    assert [r["success"] for r in results] == [True, False, False, True]
+    assert results[0]["message_id"] == "id-a@acr.fr"
+    assert "error" in results[1] and "error" in results[2]
+    assert attempts["z@zzz.fr"] == 2
+    assert sorted(sent) == [("a@acr.fr", ["RIB1.pdf"]), ("z@zzz.fr", ["RIB1.pdf"])]
+
+
+class _ServerError(Exception):
+    class resp:
+        status = 503
+
+
+def test_send_is_not_replayed_after_server_error(monkeypatch):
+    """Un 5xx à l'envoi peut avoir délivré le mail : pas de nouvel essai (les quotas, si)."""
+    calls = []
+
+    class _Gmail:
+        def users(self):
+            return self
+
+        def messages(self):
+            return self
+
+        def send(self, userId, body):
+            return self
+
+        def execute(self):
+            calls.append(1)
+            if len(calls) == 1:
+                raise errors.pop(0)
+            return {"id": "m1"}
+
+    monkeypatch.setattr(ns, "_get_gmail_client", _Gmail)
+    monkeypatch.setattr(ns.time, "sleep", lambda s: None)
+    errors = [_ServerError()]
+    with pytest.raises(_ServerError):
+        ns._send_raw_gmail("raw")
+    assert len(calls) == 1
+
+    calls.clear()
+    errors = [_RateLimited()]
+    assert ns._send_raw_gmail("raw") == "m1" and len(calls) == 2
@@ -0,0 +1,182 @@
+"""
+Tests pour les caches de l'export PDF (logos d'en-tête).
+"""
+import pytest
+
+from app.services import pdf_export
+
+
+@pytest.fixture(autouse=True)
+def _clean_asset_cache():
+    pdf_export.invalidate_pdf_asset_cache()
+    yield
+    pdf_export.invalidate_pdf_asset_cache()
+
+
+def test_header_assets_cached_until_invalidated(monkeypatch):
+    calls = {"n": 0}
+
+    def fake_collect():
+        calls["n"] += 1
+        return {
+            "union_logo_data_uri": "data:image/png;base64,AAA",
+            "partner_logo_data_uris": ["data:image/png;base64,BBB"],
+            "supplier_logo_uri_by_key": {"ACR": "data:image/png;base64,CCC"},
+            "_complete": True,
+        }
+
+    monkeypatch.setattr(pdf_export, "_collect_pdf_header_assets_uncached", fake_collect)
+    first = pdf_export.collect_pdf_header_assets()
+    first["partner_logo_data_uris"].append("mutation locale")
+    second = pdf_export.collect_pdf_header_assets()
+    assert calls["n"] == 1
+    assert second["partner_logo_data_uris"] == ["data:image/png;base64,BBB"]
+    assert "_complete" not in second
+
+    pdf_export.invalidate_pdf_asset_cache()
+    pdf_export.collect_pdf_header_assets()
+    assert calls["n"] == 2
+
+
+def test_header_assets_with_failed_logo_use_short_ttl(monkeypatch):
+    calls = {"n": 0}
+    clock = {"t": 1000.0}
+
+    def fake_collect():
+        calls["n"] += 1
+        return {"union_logo_data_uri": None, "_complete": True, "_failed": ["https://cdn/logo.png"] if calls["n"] == 1 else []}
+
+    monkeypatch.setattr(pdf_export, "_collect_pdf_header_assets_uncached", fake_collect)
+    monkeypatch.setattr(pdf_export.time, "monotonic", lambda: clock["t"])
+    pdf_export.collect_pdf_header_assets()
+    clock["t"] += pdf_export._ASSET_RETRY_TTL + 1
+    pdf_export.collect_pdf_header_assets()
+    assert calls["n"] == 2  # logo en échec : nouvel essai après le TTL court
+    clock["t"] += pdf_export._ASSET_RETRY_TTL + 1
+    pdf_export.collect_pdf_header_assets()
+    assert calls["n"] == 2  # lot complet : TTL normal
+
+
+def test_pdf_cache_key_follows_refreshed_logos_and_date(monkeypatch):
+    from datetime import datetime
+
+    clock = {"t": 1000.0}
+    today = {"d": datetime(2026, 3, 1, 9, 0)}
+    logo = {"uri": "data:old"}
+
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return today["d"]
+
+    monkeypatch.setattr(pdf_export, "_header_assets_cache", {})
+    monkeypatch.setattr(
+        pdf_export, "_collect_pdf_header_assets_uncached",
+        lambda: {"union_logo_data_uri": logo["uri"], "_complete": True, "_failed": []},
+    )
+    monkeypatch.setattr(pdf_export.time, "monotonic", lambda: clock["t"])
+    monkeypatch.setattr(pdf_export, "datetime", FixedDatetime)
+    monkeypatch.setattr("app.services.genie_cache.analysis_key", lambda import_data, session: "imp:f00d:1")
+
+    first = pdf_export._pdf_cache_prefix(object(), None)
+    logo["uri"] = "data:new"  # annonce ouverte / logo modifié par un autre worker
+    assert pdf_export._pdf_cache_prefix(object(), None) == first  # lot encore valide
+    clock["t"] += pdf_export._ASSET_BUNDLE_TTL + 1
+    refreshed = pdf_export._pdf_cache_prefix(object(), None)
+    assert refreshed != first
+    today["d"] = datetime(2026, 3, 2, 9, 0)
+    assert pdf_export._pdf_cache_prefix(object(), None) not in (first, refreshed)
+
+
+def test_image_data_uri_cache_follows_local_version(monkeypatch):
+    version = {"v": "1:10"}
+    fetches = []
+    monkeypatch.setattr(pdf_export, "_asset_version", lambda ref: version["v"])
+    monkeypatch.setattr(pdf_export, "_fetch_image_as_data_uri", lambda ref: fetches.append(ref) or f"data:{version['v']}")
+
+    assert pdf_export._cached_image_data_uri("/api/uploads/logos/company_logo.png") == "data:1:10"
+    assert pdf_export._cached_image_data_uri("/api/uploads/logos/company_logo.png") == "data:1:10"
+    version["v"] = "2:12"
+    assert pdf_export._cached_image_data_uri("/api/uploads/logos/company_logo.png") == "data:2:12"
+    assert len(fetches) == 2
+
+
+def test_hero_banner_memoized_in_memory_and_on_disk(monkeypatch, tmp_path):
+    from app.services.disk_cache import DiskCache
+
+    renders = []
+    monkeypatch.setattr(pdf_export, "_hero_banner_cache", {})
+    monkeypatch.setattr(pdf_export, "_hero_banner_disk", DiskCache(str(tmp_path), 1024 * 1024))
+    monkeypatch.setattr(pdf_export, "_render_pdf_hero_banner", lambda logo: renders.append(logo) or f"data:{logo}")
+
+    assert pdf_export.build_pdf_hero_banner_data_uri("logo-a") == "data:logo-a"
+    assert pdf_export.build_pdf_hero_banner_data_uri("logo-a") == "data:logo-a"
+    pdf_export._hero_banner_cache.clear()  # nouveau processus : relu depuis le disque
+    assert pdf_export.build_pdf_hero_banner_data_uri("logo-a") == "data:logo-a"
+    assert pdf_export.build_pdf_hero_banner_data_uri("logo-b") == "data:logo-b"
+    assert renders == ["logo-a", "logo-b"]
+
+
+def test_jinja_environment_compiles_templates_once():
+    env = pdf_export._get_jinja_env()
+    assert env is pdf_export._get_jinja_env()
+    assert env.get_template("espace_client.html") is env.get_template("espace_client.html")
+    rendered = env.from_string("{{ 1234.5|format_amount }} / {{ format_percent(0.025) }}").render()
+    assert rendered == "1 234.50 € / 2.50%"
+
+
+def test_bulk_pdf_zip_streams_one_pdf_per_entity(monkeypatch):
+    import io
+    import zipfile
+    from contextlib import contextmanager
+
+    class FakeContext:
+        @contextmanager
+        def activate(self):
+            yield self
+
+    def fake_html(import_data, mode, entity_id, **kwargs):
+        if entity_id == "KO":
+            raise ValueError("Client KO non trouvé")
+        return f"<html><body><p>{mode} {entity_id} {kwargs.get('cotisation_amount')}</p></body></html>"
+
+    monkeypatch.setattr("app.services.rfa_context.RfaContext", FakeContext)
+    monkeypatch.setattr(pdf_export, "collect_pdf_header_assets", lambda: {})
+    monkeypatch.setattr(pdf_export, "build_entity_pdf_html", fake_html)
+    monkeypatch.setattr(pdf_export, "_PDF_CACHE_MB", 0)
+
+    jobs = [
+        {"mode": "client", "entity_id": "M0001", "cotisation_amount": 100.0},
+        {"mode": "client", "entity_id": "KO"},
+        {"mode": "group", "entity_id": "GROUPE A/B"},
+    ]
+    chunks = list(pdf_export.iter_bulk_pdf_zip(object(), jobs, max_workers=2))
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+    names = archive.namelist()
+    assert names == ["RFA_M0001_client.pdf", "RFA_GROUPE_A_B_group.pdf", "ERREURS.txt"]
+    assert archive.read("RFA_M0001_client.pdf").startswith(b"%PDF")
+    assert "KO" in archive.read("ERREURS.txt").decode("utf-8")
+
+
+def test_generate_pdf_report_served_from_output_cache(monkeypatch, tmp_path):
+    from app.services.disk_cache import DiskCache
+
+    renders = []
+    version = {"v": "imp:abc:1"}
+    monkeypatch.setattr(pdf_export, "_pdf_output_cache", DiskCache(str(tmp_path), 1024 * 1024))
+    monkeypatch.setattr(pdf_export, "_pdf_cache_prefix", lambda import_data, contract_id: f"pdf:{version['v']}:{contract_id}")
+    monkeypatch.setattr(
+        pdf_export, "build_entity_pdf_html",
+        lambda *a, **kw: renders.append(kw.get("cotisation_amount")) or f"<p>{kw.get('cotisation_amount')}</p>",
+    )
+    monkeypatch.setattr(pdf_export, "html_to_pdf_bytes", lambda html: b"%PDF-" + html.encode())
+
+    first = pdf_export.generate_pdf_report("imp", "client", "M0001", import_data=object(), cotisation_amount=10.0)
+    second = pdf_export.generate_pdf_report("imp", "client", "M0001", import_data=object(), cotisation_amount=10.0)
+    pdf_export.generate_pdf_report("imp", "client", "M0001", import_data=object(), cotisation_amount=20.0)
+    version["v"] = "imp:abc:2"  # contrat ou override modifié
+    pdf_export.generate_pdf_report("imp", "client", "M0001", import_data=object(), cotisation_amount=10.0)
+
+    assert first.getvalue() == second.getvalue() == b"%PDF-<p>10.0</p>"
+    assert renders == [10.0, 20.0, 10.0]  # cache consulté avant le calcul du détail et du HTML
@@ -0,0 +1,29 @@
+"""
+Tests pour la conversion des blocs Google Sheets (UNFORMATTED_VALUE) en lignes Pure Data.
+"""
+from app.services.pure_data_import import PURE_FIELD_DEFINITIONS
+from app.services.pure_data_sheets import _build_col_index, _convert_chunk
+
+
+def test_convert_chunk_typed_and_text_values():
+    headers = ["Mois", "Année", "Code Union", "Fournisseur", "CA"]
+    col_index, mapping = _build_col_index(headers)
+    keys = [key for key, _ in PURE_FIELD_DEFINITIONS]
+
+    values = [
+        [3, 2025, 1234.0, "ACR", 1500.5],          # valeurs typées
+        ["mars", "2025", "M0001", " ACR ", "1 200,50 €"],  # valeurs texte
+        ["", "", "", ""],                           # ligne vide ignorée
+        [13, 2025, "M0002"],                        # mois invalide, ligne courte
+    ]
+    rows = _convert_chunk(values, col_index, keys)
+
+    assert mapping["code_union"] == "Code Union"
+    assert len(rows) == 3
+    assert rows[0]["mois"] == 3 and rows[0]["annee"] == 2025
+    assert rows[0]["code_union"] == "1234"
+    assert rows[0]["ca"] == 1500.5
+    assert rows[1]["mois"] == 3 and rows[1]["fournisseur"] == "ACR"
+    assert rows[1]["ca"] == 1200.5
+    assert rows[2]["mois"] is None and rows[2]["ca"] is None
+    assert set(rows[0]) == set(keys)
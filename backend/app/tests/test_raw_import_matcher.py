@@ -0,0 +1,50 @@
+"""
+Tests pour le matcher compilé des règles tri-partites (import brut).
+"""
+import itertools
+
+from app.services.test_raw_import import RFA_RULES, CompiledRuleMatcher, calculate_rfa_from_raw, matches_rule
+
+
+FOURNISSEURS = ["ACR Industries", "DCA", "exadis", "Alliance Automotive", "D.C.A.", "Autre", ""]
+MARQUES = ["NK", "Mintex", "TEXT AR", "LUK", "ELRING", "nrf", "Delphi", "BREMBO", "SKF", "napa", ""]
+GROUPES_FRS = ["SCHAEFFLER GROUP", "Sogefi", ""]
+FAMILLES = ["Freins", "Embrayage", "Filtres", "Distribution", "Divers", ""]
+SOUS_FAMILLES = ["Kit de distribution", "KIT-DE-DISTRIBUTION", "Plaquettes", ""]
+
+
+def test_compiled_matcher_agrees_with_matches_rule():
+    matcher = CompiledRuleMatcher(RFA_RULES)
+    for frs, marque, groupe_frs, famille, sous_famille in itertools.product(
+        FOURNISSEURS, MARQUES, GROUPES_FRS, FAMILLES, SOUS_FAMILLES
+    ):
+        row = {
+            "fournisseur": frs,
+            "marque": marque,
+            "groupe_frs": groupe_frs,
+            "famille": famille,
+            "sous_famille": sous_famille,
+        }
+        expected = tuple(rule["key"] for rule in RFA_RULES if matches_rule(row, rule)[0])
+        assert matcher.match_keys(row) == expected, row
+
+
+def test_matching_runs_once_per_distinct_tuple():
+    rows = [
+        {"annee": "2025", "code_union": f"M{i % 7:04d}", "fournisseur": "DCA", "marque": "NK", "ca": 10.0}
+        for i in range(500)
+    ] + [
+        {"annee": "2025", "code_union": "M0001", "fournisseur": "ACR", "famille": "Freins", "ca": 5.0},
+    ]
+    result = calculate_rfa_from_raw(rows, 2025)
+
+    assert any("2 combinaisons distinctes" in line for line in result["debug_log"])
+    client = result["client_map"]["M0001"]
+    assert client["tri"]["TRI_ACR_FREINAGE"] == 5.0
+    assert result["rule_stats"]["TRI_DCA_SBS"]["matched"] == 500
+
+
+def test_explain_only_on_request():
+    matcher = CompiledRuleMatcher(RFA_RULES[:1])
+    traces = matcher.explain({"fournisseur": "DCA", "marque": "NK"})
+    assert traces["TRI_DCA_SBS"][-1].startswith("✅")
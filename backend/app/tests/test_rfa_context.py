@@ -0,0 +1,37 @@
+"""
+Tests pour le contexte RFA partagé (visible seulement dans le thread qui l'active).
+"""
+import threading
+
+from app.services import contract_resolver
+from app.services.rfa_context import RfaContext, current_context
+
+
+def make_context(contracts):
+    ctx = object.__new__(RfaContext)  # sans requêtes : instantané fourni directement
+    ctx._contracts = contracts
+    return ctx
+
+
+def test_activation_is_local_to_the_thread():
+    ctx = make_context({7: "contrat-7"})
+    activated, released = threading.Event(), threading.Event()
+    seen = {}
+
+    def other_request():
+        activated.wait()
+        seen["other"] = current_context()
+        released.set()
+
+    thread = threading.Thread(target=other_request)
+    thread.start()
+    with ctx.activate():
+        assert contract_resolver.get_contract_by_id(7) == "contrat-7"
+        with make_context({7: "imbriqué"}).activate():
+            assert contract_resolver.get_contract_by_id(7) == "imbriqué"
+        activated.set()
+        released.wait()
+        assert current_context() is ctx
+    thread.join()
+
+    assert seen["other"] is None and current_context() is None
@@ -0,0 +1,64 @@
+"""
+Tests pour la coalescence des calculs par clé (single-flight).
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+    started = threading.Event()
+
+    def slow(value):
+        calls.append(value)
+        started.set()
+        time.sleep(0.2)
+        return {"value": value}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow, 1)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow, 2))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    for t in [leader] + followers:
+        t.join()
+
+    assert calls == [1]
+    assert results == [{"value": 1}] * 4 and all(r is results[0] for r in results)
+    assert flight.stats() == {"name": "test", "executed": 1, "shared": 3, "in_flight": 0}
+    assert flight.do("k", slow, 3) == {"value": 3}
+
+
+def test_async_callers_share_result_and_errors():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        if key == "ko":
+            raise ValueError("échec")
+        return key.upper()
+
+    async def main():
+        ok = await asyncio.gather(*(flight.do_async("ok", compute, "ok") for _ in range(5)))
+        ko = await asyncio.gather(*(flight.do_async("ko", compute, "ko") for _ in range(3)), return_exceptions=True)
+        sync = await asyncio.gather(*(flight.do_async("sync", time.sleep, 0.05) for _ in range(3)))
+        return ok, ko, sync
+
+    ok, ko, sync = asyncio.run(main())
+    assert ok == ["OK"] * 5 and calls == ["ok", "ko"]
+    assert all(isinstance(e, ValueError) for e in ko)
+    assert sync == [None] * 3
+    assert flight.stats()["executed"] == 3 and flight.stats()["in_flight"] == 0
+
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do_async("ko", compute, "ko"))
@@ -0,0 +1,63 @@
+"""
+Tests pour le stockage en mémoire borné (budget, éviction LRU, épinglage, rechargement).
+"""
+from app.storage import ImportData, MemoryBudgetStore, PureDataImport, estimate_size
+
+
+def make_rows(n):
+    return [{"code_union": f"M{i:04d}", "nom_client": f"Client {i}", "GLOBAL_ACR": float(i)} for i in range(n)]
+
+
+def test_estimate_size_grows_with_rows_and_aggregations():
+    small, large = ImportData("a", [], {}, make_rows(10)), ImportData("b", [], {}, make_rows(1000))
+    assert 50 * estimate_size(small) < estimate_size(large) < 200 * estimate_size(small)
+    before = estimate_size(large)
+    large.by_client = {r["code_union"]: {"global": {"GLOBAL_ACR": r["GLOBAL_ACR"]}} for r in large.data}
+    assert estimate_size(large) > before
+
+
+def test_lru_eviction_spills_and_keeps_pinned_aliases():
+    spilled, disk = [], {}
+
+    def spill(key, obj):
+        spilled.append(key)
+        disk[key] = obj
+        return key != "refuse"
+
+    one = estimate_size(PureDataImport("x", [], {}, make_rows(100)))
+    store = MemoryBudgetStore("test", int(one * 2.5), pinned=["sheets_live"], spill=spill, reload=disk.get)
+    live = PureDataImport("live", [], {}, make_rows(100))
+    store["uuid-live"] = live
+    store["sheets_live"] = live
+    store["a"] = PureDataImport("a", [], {}, make_rows(100))
+    assert store.stats()["bytes"] < one * 2.5  # l'alias n'est compté qu'une fois
+
+    store["b"] = PureDataImport("b", [], {}, make_rows(100))
+    assert list(store) == ["uuid-live", "sheets_live", "b"] and spilled == ["a"]
+
+    store["refuse"] = PureDataImport("r", [], {}, make_rows(100))
+    store["c"] = PureDataImport("c", [], {}, make_rows(100))
+    assert "refuse" in store and "b" not in store
+    assert store.stats()["spill_failures"] == 1
+
+    assert store.get("a") is disk["a"] and store.stats()["reloads"] == 1
+    assert store.get("inconnu") is None
+
+
+def test_spill_runs_outside_the_store_lock():
+    import threading
+
+    one = estimate_size(PureDataImport("x", [], {}, make_rows(100)))
+    seen = []
+
+    def spill(key, obj):
+        # Un autre thread lit le store pendant l'écriture disque (bloqué si le verrou était tenu)
+        reader = threading.Thread(target=lambda: seen.append(store.stats()["entries"]))
+        reader.start()
+        reader.join(timeout=2)
+        return not reader.is_alive()
+
+    store = MemoryBudgetStore("test", int(one * 1.5), spill=spill)
+    store["a"] = PureDataImport("a", [], {}, make_rows(100))
+    store["b"] = PureDataImport("b", [], {}, make_rows(100))
+    assert list(store) == ["b"] and seen == [2] and store.stats()["evictions"] == 1
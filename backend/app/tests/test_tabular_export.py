@@ -0,0 +1,72 @@
+"""
+Tests pour les exports CSV / Parquet (recap et Pure Data).
+"""
+import csv
+import io
+
+import pytest
+
+from app.services.tabular_export import (
+    PURE_DATA_COLUMNS,
+    RECAP_CLIENT_COLUMNS,
+    flatten_breakdown,
+    iter_csv,
+    iter_parquet,
+    recap_client_rows,
+)
+
+
+def test_iter_csv_chunks_with_single_bom():
+    rows = [{"platform": f"P{i}", "ca": float(i), "ca_previous": None, "delta": 0.0, "delta_pct": None} for i in range(25)]
+    chunks = list(iter_csv(PURE_DATA_COLUMNS["platforms"], rows, chunk_rows=10))
+    assert len(chunks) == 3
+    data = b"".join(chunks)
+    assert data.startswith(b"\xef\xbb\xbf")
+    assert data.count(b"\xef\xbb\xbf") == 1
+
+    parsed = list(csv.reader(io.StringIO(data.decode("utf-8-sig"))))
+    assert parsed[0] == ["platform", "ca", "ca_previous", "delta", "delta_pct"]
+    assert parsed[1] == ["P0", "0.0", "", "0.0", ""]
+    assert len(parsed) == 26
+
+
+def test_recap_client_rows_tags_entity_type():
+    export_data = {
+        "independents": [{"code_union": "M0001", "montant_total_realise": 10.0}],
+        "groups": [{"code_union": "GRP", "nb_comptes": 3}],
+    }
+    rows = list(recap_client_rows(export_data))
+    assert [r["entity_type"] for r in rows] == ["INDEPENDANT", "GROUPE"]
+
+
+def test_flatten_breakdown_one_line_per_leaf():
+    tree = [{
+        "fournisseur": "ACR", "ca": 30.0, "ca_previous": 0.0, "delta": 30.0, "delta_pct": None,
+        "children": [
+            {"marque": "A", "ca": 10.0, "ca_previous": 5.0, "delta": 5.0, "delta_pct": 100.0},
+            {"marque": "B", "ca": 20.0, "ca_previous": 0.0, "delta": 20.0, "delta_pct": None},
+        ],
+    }]
+    rows = list(flatten_breakdown(tree))
+    assert rows == [
+        {"fournisseur": "ACR", "marque": "A", "ca": 10.0, "ca_previous": 5.0, "delta": 5.0, "delta_pct": 100.0},
+        {"fournisseur": "ACR", "marque": "B", "ca": 20.0, "ca_previous": 0.0, "delta": 20.0, "delta_pct": None},
+    ]
+
+
+def test_iter_parquet_row_groups_round_trip():
+    pq = pytest.importorskip("pyarrow.parquet")
+    rows = [
+        {"entity_type": "INDEPENDANT", "code_union": f"M{i:04d}", "nb_comptes": "", "montant_total_realise": i * 1.5}
+        for i in range(120)
+    ]
+    chunks = list(iter_parquet(RECAP_CLIENT_COLUMNS, rows, row_group_rows=50))
+    assert len(chunks) > 1
+
+    parquet_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet_file.metadata.num_row_groups == 3
+    table = parquet_file.read()
+    assert table.num_rows == 120
+    assert table.column("code_union")[5].as_py() == "M0005"
+    assert table.column("nb_comptes")[0].as_py() is None
+    assert table.column("montant_total_realise")[2].as_py() == 3.0
@@ -15,6 +15,10 @@ import unicodedata
 import psycopg2
 from datetime import datetime
 
+# Réutilise l'encodeur COPY partagé avec l'API (backend/app/services/bulk_load.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from app.services.bulk_load import pg_swap_reload  # noqa: E402
+
 # ── Config ────────────────────────────────────────────────────────────────────
 
 SPREADSHEET_ID = "16Hog9Dc43vwj_JmjRBLlIPaYoHoxLKVB7eSrBVXOLM0"
@@ -180,48 +184,22 @@ def write_to_supabase(rows):
     """
     Utilise PostgreSQL COPY FROM STDIN — 1 seul aller-retour réseau
     quel que soit le nombre de lignes. 89 000 lignes en ~30 secondes.
+    Chargement dans une table fantôme puis bascule par renommage (bulk_load.pg_swap_reload) :
+    l'application voit toujours un jeu de données complet, et aucun DELETE ne laisse de tuples morts.
     """
-    import io
-    import csv
-
-    print(f"💾 Ecriture dans Supabase ({len(rows)} lignes) via COPY...")
-    col_list = ", ".join(f'"{c}"' for c in COLUMNS)
-
-    # Préparer les données en CSV en mémoire (séparateur tab, NULL = chaîne vide)
-    buf = io.StringIO()
-    writer = csv.writer(buf, delimiter='\t', quotechar='"',
-                        quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-    for row in rows:
-        line = []
-        for col in COLUMNS:
-            val = row.get(col)
-            if val is None:
-                line.append('')           # NULL en mode COPY
-            elif col == "ca":
-                line.append(str(float(val)))
-            else:
-                line.append(str(val))
-        writer.writerow(line)
-    buf.seek(0)
+    print(f"💾 Ecriture dans Supabase ({len(rows)} lignes) via COPY + bascule...")
 
     conn = pg_connect()
-    cur  = conn.cursor()
-
-    # Vider la table
-    cur.execute('DELETE FROM "pure_data"')
-    print("  Table videe")
-
-    # COPY en un seul envoi — ultra-rapide
-    copy_sql = (
-        f'COPY "pure_data" ({col_list}) FROM STDIN '
-        f"WITH (FORMAT CSV, DELIMITER E'\\t', NULL '', QUOTE '\"')"
-    )
-    cur.copy_expert(copy_sql, buf)
-
-    conn.commit()
-    cur.close()
-    conn.close()
-    print(f"  ✅ {len(rows)} lignes dans Supabase")
+    try:
+        n = pg_swap_reload(
+            conn,
+            "pure_data",
+            COLUMNS,
+            (tuple(row.get(col) for col in COLUMNS) for row in rows),
+        )
+    finally:
+        conn.close()
+    print(f"  ✅ {n} lignes dans Supabase")
 
 
 # ── Main ──────────────────────────────────────────────────────────────────────